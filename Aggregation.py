@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 19:21:36 2026
+
+This module aggregates simulation results into hourly and daily totals as they are produced, so the full resolution
+results do not need to be saved and read back, as Process_Output.py does, just to resample them.
+
+An Aggregator keeps one running total per hour. Pass it each simulated data frame, or each chunk of a streamed
+simulation, with add. Every row is assigned to the hour its timestep starts in, like resample('h'), and adds to:
+
+    - the sum of each column in Sum_Columns, such as energy and water volumes
+    - the time-weighted sum of each column in Mean_Columns, such as temperatures, which hourly and daily divide by
+    the minutes simulated in the hour or day to give the time-weighted mean
+    - the minutes simulated
+
+Only these running totals are kept, so memory depends on the number of hours, not on the number of timesteps.
+A chunk ending part way through an hour gives the same totals, and once Start is known chunks can be added in any
+order. When Prices is given, as a dictionary of $/kWh keyed by the hour of the day as an int or a string like the
+prices in Process_Output.py, hourly and daily also report the time-of-use cost of the electricity consumed, and
+time_of_use totals the electricity and cost at each price.
+"""
+
+import numpy as np
+import pandas as pd
+
+#Columns aggregated by default, when they are in the results
+Default_Sum_Columns = ['Electricity Consumed (kWh)', 'Energy Added Heat Pump (kWh)', 'Energy Added Backup (kWh)',
+                       'Energy Withdrawn (kWh)', 'Jacket Losses (kWh)', 'Hot Water Draw Volume (L)']
+Default_Mean_Columns = ['Set Temperature (deg C)', 'Tank Temperature (deg C)', 'Ambient Temperature (deg C)',
+                        'Inlet Water Temperature (deg C)']
+Column_Electricity = 'Electricity Consumed (kWh)' #Column priced by the time-of-use rates
+
+class Aggregator:
+    #Start is the time of 'Time (min)' = 0, and is only needed for results without a 'Timestamp' column. Otherwise it
+    #defaults to the first timestamp added, and results before it cannot be added. Sum_Columns and Mean_Columns
+    #default to the columns of Default_Sum_Columns and Default_Mean_Columns found in the first results added
+    def __init__(self, Start = None, Prices = None, Sum_Columns = None, Mean_Columns = None):
+        self.Start = None if Start is None else pd.Timestamp(Start)
+        self.Prices = None
+        if Prices is not None: #Keys may be ints or strings, as in Process_Output.py
+            self.Prices = {int(Hour): float(Price) for Hour, Price in Prices.items()}
+            Missing = sorted(set(range(24)) - set(self.Prices))
+            if Missing:
+                raise ValueError('Prices has no price for hours {}'.format(Missing))
+        self.Sum_Columns = Sum_Columns
+        self.Mean_Columns = Mean_Columns
+        self.Hours = 0 #Number of hours with running totals, counted from the hour holding Start
+        self._Minutes = np.zeros(0)
+        self._Sums = {}
+        self._Weighted = {}
+
+    def _get_hours(self, Model):
+        #Index of the hour each row starts in, counted from the hour holding Start
+        if 'Timestamp' in Model:
+            Timestamp = pd.DatetimeIndex(Model['Timestamp'])
+            if self.Start is None:
+                self.Start = Timestamp[0]
+            Elapsed = (Timestamp - self.Start.floor('h')).to_numpy()
+        else:
+            if self.Start is None:
+                raise ValueError("Start must be given to aggregate results without a 'Timestamp' column")
+            Elapsed = pd.to_timedelta(np.asarray(Model['Time (min)'], dtype = np.float64), unit = 'm').to_numpy() + \
+                (self.Start - self.Start.floor('h')).to_timedelta64()
+        Hours = Elapsed // np.timedelta64(1, 'h')
+        if len(Hours) > 0 and Hours.min() < 0:
+            raise ValueError('Results start before {}'.format(self.Start))
+        return Hours.astype(np.int64)
+
+    def add(self, Model):
+        #Adds a data frame, or dictionary of arrays, of simulation results to the running totals. It needs
+        #'Timestep (min)', 'Timestamp' or 'Time (min)', and the aggregated columns
+        if self.Sum_Columns is None:
+            self.Sum_Columns = [column for column in Default_Sum_Columns if column in Model]
+        if self.Mean_Columns is None:
+            self.Mean_Columns = [column for column in Default_Mean_Columns if column in Model]
+        Hours = self._get_hours(Model)
+        if len(Hours) == 0:
+            return self
+        Count = int(Hours.max()) + 1
+        if Count > len(self._Minutes): #Grow the totals, doubling so long runs are not copied every time
+            Size = max(Count, 2 * len(self._Minutes))
+            self._Minutes = np.pad(self._Minutes, (0, Size - len(self._Minutes)))
+            for Totals in [self._Sums, self._Weighted]:
+                for column in Totals:
+                    Totals[column] = np.pad(Totals[column], (0, Size - len(Totals[column])))
+        self.Hours = max(self.Hours, Count)
+
+        Timestep = np.asarray(Model['Timestep (min)'], dtype = np.float64)
+        self._Minutes[:Count] += np.bincount(Hours, weights = Timestep, minlength = Count)
+        for column in self.Sum_Columns:
+            self._Sums.setdefault(column, np.zeros(len(self._Minutes)))[:Count] += np.bincount(Hours,
+                weights = np.asarray(Model[column], dtype = np.float64), minlength = Count)
+        for column in self.Mean_Columns:
+            self._Weighted.setdefault(column, np.zeros(len(self._Minutes)))[:Count] += np.bincount(Hours,
+                weights = np.asarray(Model[column], dtype = np.float64) * Timestep, minlength = Count)
+        return self
+
+    def _table(self, Frequency):
+        #Builds the table of totals at Frequency, 'h' or 'D', from the hourly running totals
+        if self.Start is None:
+            return pd.DataFrame()
+        Index = pd.date_range(self.Start.floor('h'), periods = self.Hours, freq = 'h', name = 'Timestamp')
+        Totals = pd.DataFrame({column: self._Sums.get(column, np.zeros(self.Hours))[:self.Hours]
+                               for column in self.Sum_Columns}, index = Index)
+        Weighted = pd.DataFrame({column: self._Weighted.get(column, np.zeros(self.Hours))[:self.Hours]
+                                 for column in self.Mean_Columns}, index = Index)
+        Totals['Minutes Simulated'] = self._Minutes[:self.Hours]
+        if self.Prices is not None and Column_Electricity in Totals:
+            Totals['Electricity Price ($/kWh)'] = Index.hour.map(self.Prices).to_numpy(dtype = np.float64)
+            Totals['Electricity Cost ($)'] = Totals[Column_Electricity] * Totals['Electricity Price ($/kWh)']
+        if Frequency != 'h':
+            Price = Totals.pop('Electricity Price ($/kWh)') if 'Electricity Price ($/kWh)' in Totals else None
+            Totals = Totals.resample(Frequency).sum()
+            Weighted = Weighted.resample(Frequency).sum()
+            if Price is not None: #The average price paid over the period
+                Totals['Electricity Price ($/kWh)'] = Totals['Electricity Cost ($)'] / Totals[Column_Electricity]
+        with np.errstate(divide = 'ignore', invalid = 'ignore'): #Periods without any timesteps are NaN
+            for column in self.Mean_Columns:
+                Totals[column] = Weighted[column] / Totals['Minutes Simulated']
+        return Totals
+
+    def hourly(self):
+        #Returns a data frame indexed by the start of each hour with the sums, the time-weighted means, the minutes
+        #simulated and, when Prices is given, the price and cost of the electricity consumed
+        return self._table('h')
+
+    def daily(self):
+        #Same as hourly, for each day. 'Electricity Price ($/kWh)' is the average price paid over the day
+        return self._table('D')
+
+    def time_of_use(self):
+        #Returns the hours, electricity consumed and cost at each price in Prices
+        if self.Prices is None:
+            raise ValueError('time_of_use needs Prices')
+        Hourly = self.hourly()
+        Hourly['Hours'] = 1
+        return Hourly.groupby('Electricity Price ($/kWh)')[['Hours', Column_Electricity, 'Electricity Cost ($)']].sum()
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 17:26:04 2026
+
+This script benchmarks each phase of the simulation pipeline, replacing the time.time() deltas printed by the
+simulation scripts with repeatable measurements that can be compared between versions of the code.
+
+Synthetic input files are generated in the same format as the real inputs:
+
+    - CBECC-Res draw profiles, with one row per draw giving the day, start time, duration, flow rate and mains
+    temperature. About 20 draws per day
+    - Creekside monitored data, with one row per logger reading, indexed by timestamp. About 1% of the readings are
+    missing, so the forward fills are exercised
+
+The files are generated from a fixed seed and saved in Folder_Data, so every run of the benchmark reads identical
+inputs and the files are only written once. Each phase runs Repeats times on fresh copies of its inputs and the
+fastest runtime is reported, since slower repeats measure interference from other processes rather than the code.
+The kernels are compiled, when numba is installed, before anything is timed.
+
+The draw profile pipeline times:
+    'Read Draw Profile', 'Bin Draw Profile', 'Prepare Draw Profile' - the steps of Draw_Profiles.get_draw_profile
+    'Installation Temperatures' - Installation_Configuration.get_temperatures
+    'Set Temperature Mapping' - Model_Initialization.map_set_temperature
+    'Initialize Model' - all of Model_Initialization.initialize_model, including the two phases above
+    'Simulate' - HPWH_Model.Model_HPWH_MixedTank
+    'Save Output (<format>)' - Output_Files.save_output, for each entry in Output_Formats
+The monitored data pipeline times 'Read Monitored Data', 'Prepare Monitored Data' (see Monitored_Data) and
+'Simulate'.
+
+Every row of the results file gives the runtime of one phase for one size and timestep, and the throughput in
+simulated timesteps per second. The commit, date and package versions are saved alongside, and
+compare_benchmarks lines up two results files to show the speedup of each phase.
+"""
+
+#%%--------------------------IMPORT STATEMENTS--------------------------------
+
+import numpy as np
+import pandas as pd
+import os
+import sys
+import time
+import tempfile
+import platform
+import subprocess
+from datetime import datetime
+import HPWH_Model as HPWH
+from Draw_Profiles import bin_draw_profile, prepare_draw_profile
+from Installation_Configuration import get_temperatures
+from Model_Initialization import initialize_model, map_set_temperature
+from Set_Temperature_Profiles import get_profile
+from Monitored_Data import prepare_monitored_data
+from Output_Files import save_output
+from Scenario_Sweep import Default_Settings, get_parameters
+
+#%%--------------------------INPUTS-------------------------------------------
+
+Days = [1, 30, 365, 3650] #Lengths of the synthetic draw profiles, in days
+Days_Monitored = [1, 30, 365] #Lengths of the synthetic monitored data files, in days. 3650 days of 1 minute readings is a 700 MB file
+Timesteps = [1, 5, 15] #min
+Repeats = 3 #Number of times each phase is run. The fastest is reported
+Backend = 'auto' #Backend used by HPWH_Model.Model_HPWH_MixedTank. See HPWH_Model for the options
+Integrator = 'euler' #Integrator used by HPWH_Model.Model_HPWH_MixedTank
+Output_Formats = ['.csv', ''] #Formats timed by 'Save Output'. See Output_Files
+Set_Temperature_Profile = '8A-4P LoadShift, 48.9 & 60 deg C'
+Installation_Configuration = 'Ducted_Exhaust'
+Temperature_MixingValve_Set = 48.9 #deg C, used when preparing the monitored data
+Seed = 0 #Seed of the random numbers used to generate the synthetic files
+Folder_Data = os.path.dirname(os.path.abspath(__file__)) + os.sep + 'Output' + os.sep + 'Benchmarks' + os.sep + 'Data'
+Folder_Output = os.path.dirname(os.path.abspath(__file__)) + os.sep + 'Output' + os.sep + 'Benchmarks'
+
+#%%--------------------------FUNCTIONS----------------------------------------
+
+def make_draw_profile(Days, Seed = 0):
+    #Returns a synthetic CBECC-Res draw profile covering Days days. Every day has at least one draw and every draw
+    #ends before midnight, so the binned profile covers exactly Days days
+    rng = np.random.default_rng(Seed)
+    Count = np.maximum(rng.poisson(20, Days), 1)
+    Day = np.repeat(np.arange(1, Days + 1), Count)
+    Draws = len(Day)
+    Draw_Profile = pd.DataFrame({'Day of Year (Day)': Day,
+                                 'Start time (hr)': rng.uniform(0, 23.5, Draws),
+                                 'Duration (min)': np.clip(rng.exponential(2, Draws), 0.1, 20),
+                                 'Hot Water Flow Rate (gpm)': rng.uniform(0.5, 2.5, Draws),
+                                 'Mains Temperature (deg F)': 58 + 8 * np.sin(2 * np.pi * Day / 365)})
+    return Draw_Profile.sort_values(['Day of Year (Day)', 'Start time (hr)'], ignore_index = True)
+
+def make_monitored_data(Days, Timestep, Seed = 0):
+    #Returns synthetic Creekside monitored data with one reading every Timestep minutes for Days days, indexed by
+    #timestamp like the logger files
+    rng = np.random.default_rng(Seed)
+    Length = int(Days * 24 * 60 / Timestep)
+    Time = np.arange(Length) * Timestep #min
+    Flow_Rate = np.where(rng.random(Length) < min(1, 0.03 * Timestep), rng.uniform(0.5, 2.5, Length), 0) #gpm
+    Power = np.where(rng.random(Length) < 0.3, rng.uniform(300, 500, Length), 18) #W
+    Draw_Profile = pd.DataFrame({'Power_PowerSum_W': Power,
+                                 'Power_EnergySum_kWh': 100 + np.cumsum(Power * Timestep / 60000),
+                                 'Water_FlowRate_gpm': Flow_Rate,
+                                 'Water_FlowTotal_gal': np.cumsum(Flow_Rate * Timestep),
+                                 'Water_FlowTemp_F': 120 + rng.normal(0, 1, Length),
+                                 'Water_RemoteTemp_F': 58 + 8 * np.sin(2 * np.pi * Time / (365 * 24 * 60)),
+                                 'T_Setpoint_F': 125.,
+                                 'T_Ambient_EcoNet_F': 65 + 6 * np.sin(2 * np.pi * Time / (24 * 60)),
+                                 'T_Cabinet_F': 62 + 6 * np.sin(2 * np.pi * Time / (24 * 60)),
+                                 'T_TankUpper_F': 124 + rng.normal(0, 1, Length),
+                                 'T_TankLower_F': 110 + rng.normal(0, 4, Length)},
+                                index = pd.Timestamp(2020, 1, 1) + pd.to_timedelta(Time, unit = 'm'))
+    Missing = rng.random(Draw_Profile.shape) < 0.01
+    Missing[0] = False #The first reading is complete, as in the logger files
+    return Draw_Profile.mask(Missing)
+
+def get_input_file(Name, Index, function, *args):
+    #Returns the path to the synthetic file Name in Folder_Data, creating it with function(*args) if it does not exist.
+    #Index is True to save the index of the data frame as the first column
+    Path = os.path.join(Folder_Data, Name)
+    if not os.path.exists(Path):
+        os.makedirs(Folder_Data, exist_ok = True)
+        function(*args).to_csv(Path + '.tmp', index = Index)
+        os.replace(Path + '.tmp', Path)
+    return Path
+
+def time_phase(function, *args, **kwargs):
+    #Runs function Repeats times, each time on fresh copies of any data frames in args, and returns the result of the
+    #last run and the fastest runtime
+    Runtimes = []
+    for Repeat in range(Repeats):
+        Arguments = [value.copy() if isinstance(value, pd.DataFrame) else value for value in args]
+        Start = time.perf_counter()
+        Result = function(*Arguments, **kwargs)
+        Runtimes.append(time.perf_counter() - Start)
+    return Result, min(Runtimes)
+
+def benchmark_draw_profile(Days, Timestep, Parameters, Regression_COP, Regression_COP_Adjust_Tamb, Folder_Temporary):
+    #Times every phase of the draw profile pipeline for one size and timestep. Returns a list of result rows
+    Path = get_input_file('DrawProfile_{}d_Seed{}.csv'.format(Days, Seed), False, make_draw_profile, Days, Seed)
+    Settings = Default_Settings
+    Runtimes = {}
+    Draw_Profile, Runtimes['Read Draw Profile'] = time_phase(pd.read_csv, Path)
+    Model, Runtimes['Bin Draw Profile'] = time_phase(bin_draw_profile, Draw_Profile, Timestep)
+    Model, Runtimes['Prepare Draw Profile'] = time_phase(prepare_draw_profile, Model, Settings['vary_inlet_temp'],
+                                                         Settings['Temperature_Water_Inlet'])
+    Temperatures = Model.assign(**{'Ambient Temperature (deg C)': Settings['Temperature_Ambient']})
+    Temperatures, Runtimes['Installation Temperatures'] = time_phase(get_temperatures, Temperatures,
+                                                                     Installation_Configuration)
+    Temperature_Tank_Set = get_profile(Set_Temperature_Profile)
+    Model, Runtimes['Initialize Model'] = time_phase(initialize_model, Model, Timestep, Settings['Simulation_Start'],
+        Temperature_Tank_Set, Settings['Temperature_Ambient'], Installation_Configuration,
+        Settings['Temperature_Tank_Initial'], Settings['Threshold_Activation_Backup'], Settings['Shift_On_Weekends'])
+    Model, Runtimes['Set Temperature Mapping'] = time_phase(map_set_temperature, Model, Temperature_Tank_Set,
+                                                            Settings['Shift_On_Weekends'])
+    Model, Runtimes['Simulate'] = time_phase(HPWH.Model_HPWH_MixedTank, Model, Parameters, Regression_COP,
+                                             Regression_COP_Adjust_Tamb, backend = Backend, integrator = Integrator)
+    for Output_Format in Output_Formats:
+        Path_Output = os.path.join(Folder_Temporary, 'Output' + Output_Format)
+        Runtimes['Save Output ({})'.format(Output_Format or '.npy')] = time_phase(save_output, Model, Path_Output)[1]
+    return [{'Pipeline': 'Draw Profile', 'Phase': Phase, 'Days': Days, 'Timestep (min)': Timestep,
+             'Timesteps': len(Model), 'Runtime (s)': Runtime} for Phase, Runtime in Runtimes.items()]
+
+def benchmark_monitored_data(Days, Timestep, Parameters, Regression_COP, Regression_COP_Adjust_Tamb):
+    #Times every phase of the monitored data pipeline for one size and timestep. Returns a list of result rows
+    Path = get_input_file('MonitoredData_{}d_{}min_Seed{}.csv'.format(Days, Timestep, Seed), True,
+                          make_monitored_data, Days, Timestep, Seed)
+    Settings = Default_Settings
+    Runtimes = {}
+    Draw_Profile, Runtimes['Read Monitored Data'] = time_phase(pd.read_csv, Path, index_col = 0)
+    Model, Runtimes['Prepare Monitored Data'] = time_phase(lambda Draw_Profile: prepare_monitored_data(Draw_Profile,
+        {}, Settings['Temperature_Tank_Initial'], Settings['Threshold_Activation_Backup'], Installation_Configuration,
+        Temperature_MixingValve_Set), Draw_Profile)
+    Model, Runtimes['Simulate'] = time_phase(HPWH.Model_HPWH_MixedTank, Model, Parameters, Regression_COP,
+                                             Regression_COP_Adjust_Tamb, backend = Backend, integrator = Integrator)
+    return [{'Pipeline': 'Monitored Data', 'Phase': Phase, 'Days': Days, 'Timestep (min)': Timestep,
+             'Timesteps': len(Model), 'Runtime (s)': Runtime} for Phase, Runtime in Runtimes.items()]
+
+def get_version_info():
+    #Describes the code and environment being benchmarked, saved with every row of the results
+    try:
+        Commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True,
+                                cwd = os.path.dirname(os.path.abspath(__file__)), check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        Commit = 'unknown'
+    try:
+        import numba
+        Version_Numba = numba.__version__
+    except ImportError:
+        Version_Numba = 'not installed'
+    return {'Commit': Commit, 'Date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'Python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'numba': Version_Numba, 'Backend': Backend, 'Integrator': Integrator}
+
+def run_benchmarks(Path_Output = None):
+    #Runs every benchmark and returns the results table, saving it to Path_Output. By default the file is named after
+    #the commit and date so results from different versions sit side by side in Folder_Output
+    Parameters, Regression_COP, Regression_COP_Adjust_Tamb = get_parameters(Default_Settings)
+    Version = get_version_info()
+    if Path_Output is None:
+        Path_Output = os.path.join(Folder_Output, 'Benchmark_{}_{}.csv'.format(Version['Commit'],
+                                   datetime.now().strftime('%Y%m%d_%H%M%S')))
+
+    Warm_Up = make_draw_profile(1, Seed) #Compiles the kernels before anything is timed
+    Warm_Up = initialize_model(prepare_draw_profile(bin_draw_profile(Warm_Up, 60)), 60, datetime(2021, 1, 1),
+                               get_profile(Set_Temperature_Profile), 20, Installation_Configuration, 50.5, 15)
+    HPWH.Model_HPWH_MixedTank(Warm_Up, Parameters, Regression_COP, Regression_COP_Adjust_Tamb, backend = Backend,
+                              integrator = Integrator)
+
+    Results = []
+    with tempfile.TemporaryDirectory() as Folder_Temporary:
+        for Size in Days:
+            for Timestep in Timesteps:
+                Results += benchmark_draw_profile(Size, Timestep, Parameters, Regression_COP,
+                                                  Regression_COP_Adjust_Tamb, Folder_Temporary)
+                print('Benchmarked the draw profile pipeline for {} days at {} min'.format(Size, Timestep))
+    for Size in Days_Monitored:
+        for Timestep in Timesteps:
+            Results += benchmark_monitored_data(Size, Timestep, Parameters, Regression_COP, Regression_COP_Adjust_Tamb)
+            print('Benchmarked the monitored data pipeline for {} days at {} min'.format(Size, Timestep))
+
+    Results = pd.DataFrame(Results)
+    Results['Timesteps per Second'] = Results['Timesteps'] / Results['Runtime (s)']
+    for key, value in Version.items():
+        Results[key] = value
+    os.makedirs(os.path.dirname(Path_Output), exist_ok = True)
+    Results.to_csv(Path_Output, index = False)
+    print('Results saved to {}'.format(Path_Output))
+    return Results
+
+def compare_benchmarks(Path_Baseline, Path_Current):
+    #Lines up two results files saved by run_benchmarks. 'Speedup' is the baseline runtime divided by the current
+    #runtime, so values above 1 mean the current version is faster. Phases only in one file are dropped
+    Keys = ['Pipeline', 'Phase', 'Days', 'Timestep (min)']
+    Baseline = pd.read_csv(Path_Baseline)
+    Current = pd.read_csv(Path_Current)
+    Comparison = Baseline[Keys + ['Timesteps', 'Runtime (s)']].merge(Current[Keys + ['Runtime (s)']], on = Keys,
+                                                                     suffixes = (' Baseline', ' Current'))
+    Comparison['Speedup'] = Comparison['Runtime (s) Baseline'] / Comparison['Runtime (s) Current']
+    return Comparison
+
+#%%--------------------------BENCHMARK----------------------------------------
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3: #python Benchmark_Pipeline.py Baseline.csv Current.csv compares two earlier runs
+        print(compare_benchmarks(sys.argv[1], sys.argv[2]).to_string(index = False))
+    else:
+        Results = run_benchmarks()
+        print(Results[['Pipeline', 'Phase', 'Days', 'Timestep (min)', 'Runtime (s)',
+                       'Timesteps per Second']].to_string(index = False))
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 11:20:31 2026
+
+This script benchmarks HPWH_Model_StratifiedTank.Model_HPWH_StratifiedTank against the mixed tank model. It builds
+a synthetic input data frame with the columns the models read, covering Days days at a Timestep minute resolution,
+runs the mixed tank model once and the stratified model once for each entry in Node_Counts, and prints the runtime of
+each along with the ratio to the mixed tank runtime. The results are also saved to Path_Output.
+
+Each model is run once before timing so that, when numba is installed, compilation is not included in the results.
+"""
+
+#%%--------------------------IMPORT STATEMENTS--------------------------------
+
+import numpy as np
+import pandas as pd
+import os
+import time
+import HPWH_Model as HPWH
+from HPWH_Model_StratifiedTank import Model_HPWH_StratifiedTank
+
+#%%--------------------------INPUTS-------------------------------------------
+
+Days = 365 #Number of days simulated in each run
+Timestep = 1 #min
+Node_Counts = [1, 6, 12, 24, 50] #Number of nodes to benchmark the stratified model with
+Backend = 'auto' #Backend used by both models. See HPWH_Model for the options
+Path_Output = os.path.dirname(os.path.abspath(__file__)) + os.sep + 'Output' + os.sep + 'Benchmark_StratifiedTank.csv'
+
+#Parameters describing the HPWH, matching the defaults in HPWH_Model_MixedTank_Simulation.py
+Parameters = [2.8, #0 Coefficient_JacketLoss, W/K
+              3800, #1 Power_Backup, W
+              1230.9, #2 HeatAddition_HeatPump, W
+              3.5, #3 Temperature_Tank_Set_Deadband, deg C
+              290 * 1000 * 4.190, #4 ThermalMass_Tank, J/K
+              0, #5 CO2_Production_Rate_Electricity, not used
+              19.7222, #6 COP_Adjust_Reference_Temperature, deg C
+              2.8] #7 Cutoff_Temperature, deg C
+Regression_COP = np.poly1d([0, -0.037, 7.67])
+Regression_COP_Derate_Tamb = np.poly1d([0.000055, -0.0077, 0.2874])
+
+#%%--------------------------FUNCTIONS----------------------------------------
+
+def make_benchmark_inputs(Days, Timestep, Seed = 0):
+    #Creates a data frame with the columns read by the models. Draws happen in about 3% of minutes, averaging 250 L/day
+    rng = np.random.default_rng(Seed)
+    Length = int(Days * 24 * 60 / Timestep)
+    Model = pd.DataFrame(index = range(Length))
+    Model['Time (min)'] = Model.index * Timestep
+    Draw = rng.random(Length) < min(1, 0.03 * Timestep)
+    Model['Hot Water Draw Volume (L)'] = np.where(Draw, rng.exponential(6 * Timestep, Length), 0)
+    Model['Inlet Water Temperature (deg C)'] = 12 + 4 * np.sin(2 * np.pi * Model['Time (min)'] / (365 * 24 * 60))
+    Model['Ambient Temperature (deg C)'] = 18 + 6 * np.sin(2 * np.pi * Model['Time (min)'] / (24 * 60))
+    Model['Air Inlet Temperature (deg C)'] = Model['Ambient Temperature (deg C)']
+    Model['Set Temperature (deg C)'] = np.where((Model['Time (min)'] % (24 * 60)) // 60 < 16, 60, 48.9)
+    Model['Temperature Activation Backup (deg C)'] = Model['Set Temperature (deg C)'] - 15
+    Model['Tank Temperature (deg C)'] = 50.5
+    for column in ['Jacket Losses (J)', 'Energy Withdrawn (J)', 'Energy Added Backup (J)',
+                   'Energy Added Heat Pump (J)', 'Energy Added Total (J)', 'COP', 'COP Adjust Tamb',
+                   'Total Energy Change (J)']:
+        Model[column] = 0.
+    Model['Timestep (min)'] = Timestep
+    return Model
+
+def time_run(function, *args, **kwargs):
+    Start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - Start
+
+#%%--------------------------BENCHMARK----------------------------------------
+
+if __name__ == '__main__':
+    Model = make_benchmark_inputs(Days, Timestep)
+    Warm_Up = Model.iloc[:10] #Compiles the kernels, when numba is installed, before anything is timed
+    HPWH.Model_HPWH_MixedTank(Warm_Up.copy(), Parameters, Regression_COP, Regression_COP_Derate_Tamb,
+                              backend = Backend)
+    Model_HPWH_StratifiedTank(Warm_Up, Parameters, Regression_COP, Regression_COP_Derate_Tamb, Nodes = 2,
+                              backend = Backend)
+
+    Results = [{'Model': 'Mixed', 'Nodes': 1, 'Timesteps': len(Model),
+                'Runtime (s)': time_run(HPWH.Model_HPWH_MixedTank, Model.copy(), Parameters, Regression_COP,
+                                        Regression_COP_Derate_Tamb, backend = Backend)}]
+    for Nodes in Node_Counts:
+        Results.append({'Model': 'Stratified', 'Nodes': Nodes, 'Timesteps': len(Model),
+                        'Runtime (s)': time_run(Model_HPWH_StratifiedTank, Model, Parameters, Regression_COP,
+                                                Regression_COP_Derate_Tamb, Nodes = Nodes, backend = Backend)})
+    Results = pd.DataFrame(Results)
+    Results['Relative to Mixed'] = Results['Runtime (s)'] / Results.loc[0, 'Runtime (s)']
+    Results['Timesteps per Second'] = Results['Timesteps'] / Results['Runtime (s)']
+    print(Results.to_string(index = False))
+
+    os.makedirs(os.path.dirname(Path_Output), exist_ok = True)
+    Results.to_csv(Path_Output, index = False)
+    print('Results saved to {}'.format(Path_Output))
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 13:31:08 2026
+
+This module calibrates the HPWH parameters that HPWH_Model_MixedTank_Simulation_MonitoredData.py describes as
+"Adjusted to match monitored data": Coefficient_JacketLoss, HeatAddition_HeatPump and Threshold_Activation_Backup.
+It searches for the values minimizing the error between the model and the Creekside measurements.
+
+The objective combines two errors:
+    -The error in total electricity consumption, in %, against the final value of 'Power_EnergySum_kWh'
+    -The root mean square error between the modeled tank temperature and the average of 'T_Tank_Upper_C' and
+    'T_Tank_Lower_C', in deg C, multiplied by Weight_Temperature
+
+The thermostat switches the heat pump and backup element on and off, so small parameter changes shift when the
+heating cycles happen and the objective is not smooth. The search therefore samples candidates instead of following
+gradients. The first generation is the starting point plus a uniform sample of the bounds, and every later generation
+samples a normal distribution fitted to the best candidates found so far. All candidates in a generation are simulated
+together as vectors using the same timestep update as HPWH_Model.Model_HPWH_MixedTank_Ensemble. Only the current
+state of each candidate is kept, not its full time series. Every Check_Interval timesteps a lower bound on each
+candidate's objective is calculated. Candidates that can no longer reach the best candidates found so far are
+dropped, so the rest of the data set is only simulated for candidates that are still competitive.
+"""
+
+import numpy as np
+import pandas as pd
+import HPWH_Model as HPWH
+
+#Parameters adjusted by the calibration, in the order used in the candidate arrays, and the default search bounds
+Calibrated_Parameters = ['Coefficient_JacketLoss', 'HeatAddition_HeatPump', 'Threshold_Activation_Backup']
+Default_Bounds = {'Coefficient_JacketLoss': (1., 6.), #W/K
+                  'HeatAddition_HeatPump': (800., 1800.), #W
+                  'Threshold_Activation_Backup': (5., 25.)} #deg C
+
+def evaluate_candidates(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, Candidates,
+                        Best_Objective = np.inf, Weight_Temperature = 1., Check_Interval = 1440):
+    #Simulates every candidate, one row per candidate with columns in the order of Calibrated_Parameters, against the
+    #prepared monitored data in Model. Candidates whose objective can no longer be lower than Best_Objective are
+    #dropped. Returns a data frame with the objective, energy error and temperature error of each candidate. Dropped
+    #candidates have an objective of NaN and 'Pruned At' gives the row at which they were dropped
+    Candidates = np.atleast_2d(np.asarray(Candidates, dtype = np.float64))
+    Count = len(Candidates)
+    Temperature_Ambient, Timestep, Volume_Draw, Temperature_Inlet, Temperature_Set = \
+        [Model[column].to_numpy(dtype = np.float64) for column in HPWH.Kernel_Inputs]
+    Temperature_Air_Inlet = Model['Air Inlet Temperature (deg C)'].to_numpy(dtype = np.float64)
+    Temperature_Measured = 0.5 * (Model['T_Tank_Upper_C'].to_numpy(dtype = np.float64) +
+                                  Model['T_Tank_Lower_C'].to_numpy(dtype = np.float64))
+    Energy_Measured = float(Model['Power_EnergySum_kWh'].iloc[-1])
+    Length = len(Model)
+
+    #The state of the candidates still being simulated. Alive holds their index in Candidates. When candidates are
+    #dropped every array is compressed, so each timestep only works on the remaining candidates
+    Alive = np.arange(Count)
+    Coefficient_JacketLoss = Candidates[:, 0].copy()
+    HeatAddition_HeatPump = Candidates[:, 1].copy()
+    Threshold_Activation_Backup = Candidates[:, 2].copy()
+    Temperature_Tank = np.full(Count, float(Model['Tank Temperature (deg C)'].iloc[0]))
+    Energy_Added_Backup = np.full(Count, float(Model['Energy Added Backup (J)'].iloc[0]))
+    Energy_Added_HeatPump = np.full(Count, float(Model['Energy Added Heat Pump (J)'].iloc[0]))
+    Electricity = np.zeros(Count) #kWh
+    Squared_Error = np.zeros(Count) #deg C^2
+    Pruned_At = np.full(Count, -1)
+
+    for i in range(1, Length):
+        Squared_Error += (Temperature_Tank - Temperature_Measured[i]) ** 2
+        Temperature_Activation_Backup, Jacket_Losses, Energy_Added_Backup, Energy_Withdrawn, Energy_Added_HeatPump, \
+            Total_Energy_Change, Temperature_Tank_Next = HPWH._ensemble_step(Temperature_Tank, Energy_Added_Backup,
+            Energy_Added_HeatPump, Temperature_Set[i] - Threshold_Activation_Backup, Temperature_Ambient[i],
+            Timestep[i], Volume_Draw[i], Temperature_Inlet[i], Temperature_Set[i], Coefficient_JacketLoss,
+            Parameters[1], HeatAddition_HeatPump, Parameters[3], Parameters[4], Parameters[7])
+        if Timestep[i] > 0: #Same electricity calculation as HPWH_Model._calculate_outputs
+            COP = Regression_COP(1.8 * Temperature_Tank + 32) + Regression_COP_Derate_Tamb(Temperature_Tank) * \
+                (Temperature_Air_Inlet[i] - Parameters[6])
+            Electricity += (Energy_Added_HeatPump / COP + Energy_Added_Backup) * HPWH.kWh_In_J
+        Temperature_Tank = Temperature_Tank_Next
+
+        if np.isfinite(Best_Objective) and i % Check_Interval == 0:
+            #Electricity only accumulates, and so does the squared temperature error. Whatever happens in the rest of
+            #the data set, the final objective cannot be lower than this bound
+            Lower_Bound = np.maximum(Electricity - Energy_Measured, 0) / Energy_Measured * 100 + \
+                Weight_Temperature * np.sqrt(Squared_Error / (Length - 1))
+            Keep = Lower_Bound <= Best_Objective
+            if not Keep.all():
+                Pruned_At[Alive[~Keep]] = i
+                Alive, Coefficient_JacketLoss, HeatAddition_HeatPump, Threshold_Activation_Backup, Temperature_Tank, \
+                    Energy_Added_Backup, Energy_Added_HeatPump, Electricity, Squared_Error = [values[Keep] for values
+                    in [Alive, Coefficient_JacketLoss, HeatAddition_HeatPump, Threshold_Activation_Backup,
+                    Temperature_Tank, Energy_Added_Backup, Energy_Added_HeatPump, Electricity, Squared_Error]]
+                if len(Alive) == 0:
+                    break
+
+    Objective = np.full(Count, np.nan)
+    Energy_Error = np.full(Count, np.nan)
+    Temperature_Error = np.full(Count, np.nan)
+    Energy_Error[Alive] = (Electricity - Energy_Measured) / Energy_Measured * 100
+    Temperature_Error[Alive] = np.sqrt(Squared_Error / (Length - 1))
+    Objective[Alive] = np.abs(Energy_Error[Alive]) + Weight_Temperature * Temperature_Error[Alive]
+    Results = pd.DataFrame(Candidates, columns = Calibrated_Parameters)
+    Results['Objective'] = Objective
+    Results['Energy Error (%)'] = Energy_Error
+    Results['Temperature RMSE (deg C)'] = Temperature_Error
+    Results['Pruned At'] = Pruned_At
+    return Results
+
+def calibrate_parameters(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, Threshold_Activation_Backup,
+                         Bounds = None, Candidates = 64, Generations = 8, Elite = 8, Weight_Temperature = 1.,
+                         Check_Interval = 1440, Seed = 0):
+    #Model is the prepared monitored data, ready to be passed to HPWH_Model.Model_HPWH_MixedTank. Parameters and
+    #Threshold_Activation_Backup are the starting values. Bounds is a dictionary of (lower, upper) limits for each
+    #entry in Calibrated_Parameters, defaulting to Default_Bounds. Each generation after the first samples a normal
+    #distribution fitted to the Elite best candidates found so far. Candidates that cannot beat the worst of those are
+    #dropped early, since they could not change the distribution. Returns a dictionary with the best 'Parameters'
+    #found, their 'Objective', 'Energy Error (%)' and 'Temperature RMSE (deg C)', and the 'History' of every candidate
+    Bounds = dict(Default_Bounds, **(Bounds or {}))
+    Lower = np.array([Bounds[name][0] for name in Calibrated_Parameters], dtype = np.float64)
+    Upper = np.array([Bounds[name][1] for name in Calibrated_Parameters], dtype = np.float64)
+    rng = np.random.default_rng(Seed)
+    Start = np.clip([Parameters[0], Parameters[2], Threshold_Activation_Backup], Lower, Upper)
+    History = pd.DataFrame()
+
+    for Generation in range(Generations):
+        Completed = History[History['Objective'].notna()].nsmallest(Elite, 'Objective') if len(History) else History
+        if len(Completed) < 2: #The starting point plus a uniform sample of the bounds
+            Sample = np.vstack([Start, Lower + rng.random((Candidates - 1, len(Lower))) * (Upper - Lower)])
+        else:
+            Elites = Completed[Calibrated_Parameters].to_numpy(dtype = np.float64)
+            Spread = np.maximum(Elites.std(axis = 0), 1e-3 * (Upper - Lower))
+            Sample = np.clip(rng.normal(Elites.mean(axis = 0), Spread, (Candidates, len(Lower))), Lower, Upper)
+        Threshold = Completed['Objective'].iloc[-1] if len(Completed) == Elite else np.inf
+        Results = evaluate_candidates(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, Sample,
+                                      Best_Objective = Threshold, Weight_Temperature = Weight_Temperature,
+                                      Check_Interval = Check_Interval)
+        Results['Generation'] = Generation
+        History = pd.concat([History, Results], ignore_index = True)
+
+    if History['Objective'].isna().all():
+        raise ValueError('No candidate produced a finite objective. Check the monitored data for missing values')
+    Best = History.loc[History['Objective'].idxmin()]
+    return {'Parameters': dict(zip(Calibrated_Parameters, Best[Calibrated_Parameters].astype(float))),
+            'Objective': Best['Objective'],
+            'Energy Error (%)': Best['Energy Error (%)'],
+            'Temperature RMSE (deg C)': Best['Temperature RMSE (deg C)'],
+            'History': History}
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 16:48:33 2026
+
+This script measures how the annual electricity consumption predicted by the mixed tank model depends on the
+timestep, for each way of advancing the tank temperature:
+
+    'euler' - the original update in HPWH_Model.Model_HPWH_MixedTank. The jacket losses and draws are calculated
+    from the tank temperature at the start of each timestep, so the error grows quickly with the timestep
+    'exponential' - the same control decisions, with the jacket losses and draws integrated exactly over each
+    timestep
+    'event' - HPWH_Model.Model_HPWH_MixedTank_EventDriven, which also switches the heat pump and backup element at
+    the exact moment the tank crosses a thermostat threshold
+
+One scenario is simulated at every combination of timestep and integrator and compared against a reference run,
+by default the event-driven model at a 1 minute timestep. The results table gives the annual electricity
+consumption, its error against the reference and the runtime of each simulation, which shows the coarsest timestep
+meeting a given accuracy. The scenario uses the settings of Scenario_Sweep.
+"""
+
+#%%--------------------------IMPORT STATEMENTS--------------------------------
+
+import pandas as pd
+import os
+import time
+from Scenario_Sweep import Default_Settings, load_draw_profile, simulate_scenario, summarize_scenario
+
+#%%--------------------------FUNCTIONS----------------------------------------
+
+def simulate_timestep(Path_DrawProfile, Timestep, Integrator, Set_Temperature_Profile, Installation_Configuration,
+                      Settings):
+    #Simulates the scenario at one timestep with one integrator. Returns the annual summary from
+    #Scenario_Sweep.summarize_scenario plus the runtime of the simulation alone, excluding reading the draw profile
+    Settings = dict(Settings, Timestep = Timestep, Integrator = Integrator)
+    Draw_Volume, Inlet_Temperature = load_draw_profile(Path_DrawProfile, Settings)
+    Start = time.time()
+    Model = simulate_scenario(Draw_Volume, Inlet_Temperature, Set_Temperature_Profile, Installation_Configuration,
+                              Settings)
+    Results = {'Runtime (s)': time.time() - Start}
+    Results.update(summarize_scenario(Model, Settings))
+    return Results
+
+def run_convergence_study(Path_DrawProfile, Timesteps = [1, 2, 5, 10, 15, 30, 60],
+                          Integrators = ['euler', 'exponential', 'event'], Reference_Timestep = 1,
+                          Reference_Integrator = 'event', Set_Temperature_Profile = 'Static_60',
+                          Installation_Configuration = 'Ducted_Exhaust', Path_Output = None, Settings = None):
+    #Simulates the draw profile at every timestep, in minutes, with every integrator. Returns a table with one row
+    #per simulation giving the annual electricity consumption and its error, in %, against the simulation at
+    #Reference_Timestep with Reference_Integrator. Saves the table to Path_Output if given. Settings overrides
+    #Scenario_Sweep.Default_Settings. Draw profiles are binned once per timestep, so set 'Folder_Cache_DrawProfiles' to
+    #reuse them between studies
+    Settings = dict(Default_Settings, **(Settings or {}))
+    Reference = simulate_timestep(Path_DrawProfile, Reference_Timestep, Reference_Integrator, Set_Temperature_Profile,
+                                  Installation_Configuration, Settings)
+    Electricity_Reference = Reference['Electricity Consumed (kWh)']
+
+    Results = []
+    for Timestep in Timesteps:
+        for Integrator in Integrators:
+            Summary = simulate_timestep(Path_DrawProfile, Timestep, Integrator, Set_Temperature_Profile,
+                                        Installation_Configuration, Settings)
+            Electricity = Summary.pop('Electricity Consumed (kWh)')
+            Row = {'Integrator': Integrator, 'Timestep (min)': Timestep, 'Electricity Consumed (kWh)': Electricity,
+                   'Electricity Error (%)': (Electricity - Electricity_Reference) / Electricity_Reference * 100}
+            Row.update(Summary)
+            Results.append(Row)
+
+    Results = pd.DataFrame(Results)
+    if Path_Output is not None:
+        Results.to_csv(Path_Output, index = False)
+    return Results
+
+#%%--------------------------USER INPUTS------------------------------------------
+
+if __name__ == '__main__':
+    Path_DrawProfile = r'C:\Users\Peter Grant\Dropbox (Beyond Efficiency)\Peter\Python Scripts\GasHPWH_Model_git\Data\Draw_Profiles\Bldg=Single_CZ=1_Wat=Hot_Prof=1_SDLM=Yes_CFA=800_Inc=FSCDB_Ver=2019.csv'
+    Path_Output = os.path.dirname(os.path.abspath(__file__)) + os.sep + 'Output' + os.sep + 'Convergence_Study.csv'
+
+    Results = run_convergence_study(Path_DrawProfile, Path_Output = Path_Output)
+    print(Results.pivot(index = 'Timestep (min)', columns = 'Integrator', values = 'Electricity Error (%)').to_string())
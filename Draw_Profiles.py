@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 09:12:04 2026
+
+This module converts event-based CBECC-Res draw profiles into the timestep-based
+format used by the simulation models. Each draw in the CBECC file has a start
+time, a duration and a flow rate, and the simulation needs the volume of hot
+water drawn, and the inlet water temperature, during each timestep bin.
+
+The conversion was originally a Python loop over every draw in
+HPWH_Model_MixedTank_Simulation.py. bin_draw_profile performs the same
+calculations on all draws at once, repeating the loop's floating point
+operations in the same order so the output matches it exactly.
+
+get_draw_profile reads, bins and prepares a draw profile, and can keep the
+result in an on-disk cache. The cache is keyed on a hash of the contents of
+the draw profile file and the binning settings, so editing or replacing the
+file automatically creates a new entry. The oldest entries are deleted when
+the cache grows beyond Size_Cache bytes.
+"""
+
+import numpy as np
+import pandas as pd
+import os
+import hashlib
+
+Hours_In_Day = 24 #The number of hours in a day
+Minutes_In_Hour = 60 #The number of minutes in an hour
+Version_Cache = 1 #Part of every cache key. Increase it when bin_draw_profile or prepare_draw_profile change results
+
+def bin_draw_profile(Draw_Profile, Timestep):
+    #Draw_Profile is the CBECC-Res draw profile as read from the .csv file. Timestep is the model timestep in minutes.
+    #Returns a data frame with 1 row per timestep bin containing 'Time (min)', 'Hot Water Draw Volume (gal)' and
+    #'Inlet Water Temperature (deg F)'. Bins without a draw have an inlet temperature of 0, to be filled by the caller
+    Day = Draw_Profile['Day of Year (Day)'].to_numpy().astype(int) #make sure the days are in integer format, not float
+    First_Day = Day[0] #Identifies the day (In integer relative to 365 form, not date form) of the first day of the draw profile
+    Days = Day.max() + 1 - Day.min() #The full time coverage of the data (full days), including days without draws
+    Index_Model = int(Days * Hours_In_Day * Minutes_In_Hour / Timestep) #Identifies the number of timestep bins covered in the draw profile
+
+    Start_Time = Draw_Profile['Start time (hr)'].to_numpy(dtype = np.float64) * Minutes_In_Hour + (Day - First_Day) * \
+        Hours_In_Day * Minutes_In_Hour #Identifies the starting time of each hot water draw relative to first day of draw used
+    Flow_Rate = Draw_Profile['Hot Water Flow Rate (gpm)'].to_numpy(dtype = np.float64)
+    Duration = Draw_Profile['Duration (min)'].to_numpy(dtype = np.float64)
+    Water_Quantity = Flow_Rate * Duration #total draw volume is flowrate times duration
+
+    Bin_Start = np.floor(Start_Time / Timestep).astype(int) #finds the model timestep bin when the draw starts, 0 indexed
+    Time_First_Bin = (Bin_Start + 1) * Timestep - Start_Time #first pass at flow time of draw in first bin
+    Time_First_Bin = np.where(Time_First_Bin > Duration, Duration, Time_First_Bin) #if the draw only occurs in one bin, the time at the given flow rate is limited to the total draw time
+
+    #Every draw dumps its water into consecutive bins. Instead of looping over the draws, loop over the bins covered
+    #by a draw (the first bin, then each following bin) and handle every draw that still has water left at once.
+    #The subtraction is repeated one bin at a time so the remaining water matches the original loop to the last bit
+    Draw = np.arange(len(Draw_Profile))
+    Active = Water_Quantity > 0
+    Water_Dumped = Flow_Rate * Time_First_Bin
+    Draws, Bins, Volumes, Orders = [Draw[Active]], [Bin_Start[Active]], [Water_Dumped[Active]], [np.zeros(Active.sum(), dtype = int)]
+    Water_Quantity = np.where(Active, Water_Quantity - Water_Dumped, 0)
+    Active = Water_Quantity > 0
+    bin_count = 1
+    while Active.any(): #dump out water until every draw is used up
+        Full_Bin = Flow_Rate[Active] * Timestep
+        Water_Dumped = np.where(Water_Quantity[Active] >= Full_Bin, Full_Bin, Water_Quantity[Active]) #a whole bin if there is enough water left, otherwise the remainder
+        Draws.append(Draw[Active])
+        Bins.append(Bin_Start[Active] + bin_count)
+        Volumes.append(Water_Dumped)
+        Orders.append(np.full(Active.sum(), bin_count))
+        Water_Quantity[Active] -= Water_Dumped #keep track of water remaining
+        Active = Water_Quantity > 0
+        bin_count += 1
+
+    #Put the bins back in the order the original loop visited them (draw by draw) so the sums are accumulated in the same order
+    Draws, Bins, Volumes, Orders = np.concatenate(Draws), np.concatenate(Bins), np.concatenate(Volumes), np.concatenate(Orders)
+    Order = np.lexsort((Orders, Draws))
+    Draws, Bins, Volumes = Draws[Order], Bins[Order], Volumes[Order]
+    if len(Bins) > 0 and (Bins.min() < 0 or Bins.max() >= Index_Model):
+        raise IndexError('A draw extends beyond the {} timestep bins covered by the draw profile'.format(Index_Model))
+
+    Model = pd.DataFrame(index = range(Index_Model)) #Creates a data frame with 1 row for each bin in the draw profile
+    Model['Time (min)'] = Model.index * Timestep #Create a column in the data frame giving the time at the beginning of each timestep bin
+    Model['Hot Water Draw Volume (gal)'] = np.bincount(Bins, weights = Volumes, minlength = Index_Model)
+
+    #Each bin covered by a draw takes that draw's mains temperature. When draws overlap the later draw wins, so keep
+    #the last occurrence of each bin
+    Inlet_Temperature = np.zeros(Index_Model)
+    Last_Bins, Last = np.unique(Bins[::-1], return_index = True)
+    Mains_Temperature = Draw_Profile['Mains Temperature (deg F)'].to_numpy(dtype = np.float64)
+    Inlet_Temperature[Last_Bins] = Mains_Temperature[Draws[::-1][Last]]
+    Model['Inlet Water Temperature (deg F)'] = Inlet_Temperature
+
+    return Model
+
+def prepare_draw_profile(Model, vary_inlet_temp = True, Temperature_Water_Inlet = 4.4):
+    #Fills the inlet temperature in bins without a draw and converts the output of bin_draw_profile to the SI units
+    #read by the simulation models. If vary_inlet_temp is False every bin uses Temperature_Water_Inlet (deg F)
+    #instead of the mains temperature in the draw profile
+    if vary_inlet_temp == True:
+        Model['Inlet Water Temperature (deg F)'] = Model['Inlet Water Temperature (deg F)'].replace(to_replace=0, \
+              method='ffill') #forward fill method - uses closed previous non-zero value
+        Model['Inlet Water Temperature (deg F)'] = Model['Inlet Water Temperature (deg F)'].replace(to_replace=0, \
+              method='bfill') #backward fill method - uses closest subsequent non-zero value
+    else: #(vary_inlet_temp == False)
+        Model['Inlet Water Temperature (deg F)'] = Temperature_Water_Inlet #Sets the inlet temperature in the model equal to the value specified in INPUTS. This value could be replaced with a series of value
+
+    Model['Inlet Water Temperature (deg C)'] = (Model['Inlet Water Temperature (deg F)'] - 32)/1.8 #Convert inlet water temperature to deg C
+    del Model['Inlet Water Temperature (deg F)']
+
+    Model['Hot Water Draw Volume (L)'] = Model['Hot Water Draw Volume (gal)'] * 3.87541 #Convert hot water draw volume data from gal to L
+    del Model['Hot Water Draw Volume (gal)']
+    return Model
+
+def get_draw_profile(Path_DrawProfile, Timestep, vary_inlet_temp = True, Temperature_Water_Inlet = 4.4,
+                     Folder_Cache = None, Size_Cache = 500e6):
+    #Returns the prepared draw profile, as returned by prepare_draw_profile, for the CBECC-Res file at
+    #Path_DrawProfile. If Folder_Cache is given the result is read from, or saved to, the cache in that folder.
+    #Size_Cache is the largest total size of the cache files, in bytes
+    if Folder_Cache is None:
+        Model = bin_draw_profile(pd.read_csv(Path_DrawProfile), Timestep)
+        return prepare_draw_profile(Model, vary_inlet_temp, Temperature_Water_Inlet)
+
+    Hash = hashlib.sha256()
+    with open(Path_DrawProfile, 'rb') as File:
+        for Block in iter(lambda: File.read(2**20), b''):
+            Hash.update(Block)
+    Hash.update(repr((Version_Cache, Timestep, vary_inlet_temp,
+                      None if vary_inlet_temp == True else Temperature_Water_Inlet)).encode())
+    Path_Cache = os.path.join(Folder_Cache, Hash.hexdigest() + '.npz')
+
+    if os.path.exists(Path_Cache):
+        try:
+            with np.load(Path_Cache) as Cache:
+                Model = pd.DataFrame({'Time (min)': Cache['Time'],
+                                      'Inlet Water Temperature (deg C)': Cache['Inlet'],
+                                      'Hot Water Draw Volume (L)': Cache['Volume']})
+            os.utime(Path_Cache) #Marks the entry as recently used
+            return Model
+        except (OSError, ValueError, KeyError): #A damaged entry is replaced below
+            pass
+
+    Model = bin_draw_profile(pd.read_csv(Path_DrawProfile), Timestep)
+    Model = prepare_draw_profile(Model, vary_inlet_temp, Temperature_Water_Inlet)
+    os.makedirs(Folder_Cache, exist_ok = True)
+    Path_Temporary = '{}.{}.tmp.npz'.format(Path_Cache[:-4], os.getpid()) #Written under a temporary name first so
+    np.savez(Path_Temporary, Time = Model['Time (min)'].to_numpy(), #parallel runs never read a partial file
+             Inlet = Model['Inlet Water Temperature (deg C)'].to_numpy(dtype = np.float64),
+             Volume = Model['Hot Water Draw Volume (L)'].to_numpy(dtype = np.float64))
+    os.replace(Path_Temporary, Path_Cache)
+    _evict_cache(Folder_Cache, Size_Cache)
+    return Model
+
+def _evict_cache(Folder_Cache, Size_Cache):
+    #Deletes the least recently used entries until the cache fits in Size_Cache bytes
+    Entries = []
+    for Name in os.listdir(Folder_Cache):
+        if Name.endswith('.npz') and not Name.endswith('.tmp.npz'):
+            try:
+                Status = os.stat(os.path.join(Folder_Cache, Name))
+            except OSError: #Deleted by another process
+                continue
+            Entries.append((Status.st_mtime, Status.st_size, Name))
+    Size = sum(Entry[1] for Entry in Entries)
+    for Time_Used, Size_Entry, Name in sorted(Entries):
+        if Size <= Size_Cache:
+            break
+        try:
+            os.remove(os.path.join(Folder_Cache, Name))
+        except OSError:
+            pass
+        Size -= Size_Entry
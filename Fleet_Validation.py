@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 23:12:09 2026
+
+This script validates HPWH_Model.Model_HPWH_MixedTank against every monitored site in a folder, instead of editing
+and executing HPWH_Model_MixedTank_Simulation_MonitoredData.py once per site. It performs the following:
+
+    1. Finds every site file, in the Creekside monitored data format, in the input folder
+    2. Prepares and simulates the sites on a pool of worker processes. Each worker streams its site through
+    Monitored_Data.simulate_monitored_data_chunked, Chunk_Size rows at a time, and reduces every simulated chunk to the
+    site's totals and 15 minute load shape as soon as it is produced. No full resolution data frame leaves the worker
+    3. Adds each site's load shape to the fleet load shape as the sites finish, so only the fleet totals and one
+    site's load shape are ever held in this process
+    4. Saves one summary row per site, with the simulated and measured electricity, PercentError and the error in the
+    peak period electricity, and the fleet load shape
+
+The HPWH parameters default to the values in HPWH_Model_MixedTank_Simulation_MonitoredData.py. Override any of them
+by passing a Settings dictionary using the same names.
+"""
+
+#%%--------------------------IMPORT STATEMENTS--------------------------------
+
+import pandas as pd
+import numpy as np
+import os
+import sys
+import glob
+import time
+import multiprocessing
+from Monitored_Data import simulate_monitored_data_chunked, Gap_Threshold
+from Scenario_Sweep import get_parameters
+
+#%%--------------------------HPWH PARAMETERS------------------------------
+
+#Defaults for every site. These match HPWH_Model_MixedTank_Simulation_MonitoredData.py, see that script for
+#descriptions
+Default_Settings = {'Temperature_Tank_Initial': 50.5, #deg C
+                    'Temperature_Tank_Set_Deadband': 3.5, #deg C
+                    'Volume_Tank': 290, #L
+                    'Coefficient_JacketLoss': 2.8, #W/K
+                    'Power_Backup': 3800, #W
+                    'Threshold_Activation_Backup': 16, #deg C
+                    'Cutoff_Temperature': 2.8, #deg C
+                    'HeatAddition_HeatPump': 1230.9, #W
+                    'Coefficient_2ndOrder_COP': 0,
+                    'Coefficient_1stOrder_COP': -0.037,
+                    'Constant_COP': 7.67,
+                    'Coefficient_2ndOrder_COP_Adjust_Tamb': 0.000055,
+                    'Coefficient_1stOrder_COP_Adjust_Tamb': -0.0077,
+                    'Constant_COP_Adjust_Tamb': 0.2874,
+                    'COP_Adjust_Reference_Temperature': 19.7222, #deg C
+                    'Temperature_MixingValve_Set': 48.9, #deg C
+                    'Installation_Configuration': 'Open_Area',
+                    'Set_Temperature_Profile': None, #None reads the set temperature from the monitored data. Otherwise a profile in Set_Temperature_Profiles
+                    'Shift_On_Weekends': True,
+                    'Time_Filter': None, #Optional (Start_Time, End_Time) tuple, in hours, applied to every site
+                    'Gap_Threshold': Gap_Threshold, #min, see Monitored_Data.prepare_monitored_data
+                    'Peak_Start': 12 + 4, #hr
+                    'Peak_End': 12 + 9, #hr
+                    'Chunk_Size': 100000, #Rows of monitored data read and simulated at a time in each worker
+                    'Load_Shape_Resolution': '15min', #Interval of the load shapes, as a pandas frequency
+                    'Model_Backend': 'auto'}
+
+#%%--------------------------FUNCTIONS----------------------------------------
+
+class SiteReducer:
+    #Reduces the simulated chunks of one site to its totals and load shape as they are produced. It is passed to
+    #Monitored_Data.simulate_monitored_data_chunked as its Aggregator. Each row covers the timestep ending at its
+    #timestamp, for both the simulated electricity and the change in the measured 'Power_EnergySum_kWh'. Rows are in
+    #the peak period when the hour of their timestamp is in [Peak_Start, Peak_End)
+    def __init__(self, Peak_Start = 16, Peak_End = 21, Resolution = '15min'):
+        self.Peak_Start = Peak_Start
+        self.Peak_End = Peak_End
+        self.Resolution = Resolution
+        self.Totals = dict.fromkeys(['Simulated (kWh)', 'Measured (kWh)', 'Simulated Peak (kWh)',
+                                     'Measured Peak (kWh)'], np.float64(0))
+        self.Load_Shape = None
+        self._Measured_Last = 0. #'Power_EnergySum_kWh' starts at 0 on the first row of the site
+
+    def add(self, Model):
+        Timestamp = pd.DatetimeIndex(Model['Timestamp'])
+        Simulated = Model['Electricity Consumed (kWh)'].to_numpy(dtype = np.float64)
+        Measured = np.diff(Model['Power_EnergySum_kWh'].to_numpy(dtype = np.float64), prepend = self._Measured_Last)
+        self._Measured_Last = float(Model['Power_EnergySum_kWh'].iloc[-1])
+        Peak = (Timestamp.hour >= self.Peak_Start) & (Timestamp.hour < self.Peak_End)
+        self.Totals['Simulated (kWh)'] += Simulated.sum()
+        self.Totals['Measured (kWh)'] += Measured.sum()
+        self.Totals['Simulated Peak (kWh)'] += Simulated[Peak].sum()
+        self.Totals['Measured Peak (kWh)'] += Measured[Peak].sum()
+        Shape = pd.DataFrame({'Simulated (kWh)': Simulated, 'Measured (kWh)': Measured},
+                             index = Timestamp.floor(self.Resolution)).groupby(level = 0).sum()
+        #A chunk ending part way through an interval adds to the interval started by the previous chunk
+        self.Load_Shape = Shape if self.Load_Shape is None else self.Load_Shape.add(Shape, fill_value = 0)
+        return self
+
+def find_site_files(Folder, Pattern = '*.csv'):
+    #Returns the sorted paths of every site file in Folder matching Pattern
+    return sorted(glob.glob(os.path.join(Folder, Pattern)))
+
+def simulate_site(Path, Settings):
+    #Prepares and simulates one site. Returns its summary row, as a dictionary, and its load shape
+    Start = time.time()
+    Parameters, Regression_COP, Regression_COP_Adjust_Tamb = get_parameters(Settings)
+    Reducer = SiteReducer(Settings['Peak_Start'], Settings['Peak_End'], Settings['Load_Shape_Resolution'])
+    Summary = simulate_monitored_data_chunked(Path, None, Settings['Chunk_Size'], Parameters, Regression_COP,
+                                              Regression_COP_Adjust_Tamb, Settings['Temperature_Tank_Initial'],
+                                              Settings['Threshold_Activation_Backup'],
+                                              Settings['Installation_Configuration'],
+                                              Settings['Temperature_MixingValve_Set'],
+                                              Settings['Set_Temperature_Profile'], Settings['Shift_On_Weekends'],
+                                              Settings['Time_Filter'], Settings['Model_Backend'],
+                                              Aggregator = Reducer, Gap_Threshold = Settings['Gap_Threshold'])
+    Totals = Reducer.Totals
+    Results = {'Site': os.path.splitext(os.path.basename(Path))[0], 'Rows': Summary['Rows']}
+    Results.update(Totals)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        Results['PercentError'] = (Totals['Simulated (kWh)'] - Totals['Measured (kWh)']) / Totals['Measured (kWh)'] * 100
+        Results['Peak PercentError'] = (Totals['Simulated Peak (kWh)'] - Totals['Measured Peak (kWh)']) / \
+            Totals['Measured Peak (kWh)'] * 100
+    Results['Runtime (s)'] = time.time() - Start
+    return Results, Reducer.Load_Shape
+
+def _run_site(Task):
+    #Worker for run_fleet. A site that fails is reported in the 'Error' column instead of stopping the whole fleet
+    Path, Settings = Task
+    try:
+        return simulate_site(Path, Settings)
+    except Exception as Error:
+        return {'Site': os.path.splitext(os.path.basename(Path))[0], 'Error': repr(Error)}, None
+
+def run_fleet(Folder_Input, Path_Output = None, Path_LoadShape = None, Processes = None, Settings = None,
+              Pattern = '*.csv'):
+    #Simulates every site file in Folder_Input matching Pattern. Processes is the number of worker processes,
+    #defaulting to the number of CPUs. Returns the summary table, one row per site in file order, and the fleet load
+    #shape, the simulated and measured electricity of all sites in each interval and the number of sites with data in
+    #it. Saves them to Path_Output and Path_LoadShape if given
+    Settings = dict(Default_Settings, **(Settings or {}))
+    Paths = find_site_files(Folder_Input, Pattern)
+    Tasks = [(Path, Settings) for Path in Paths]
+
+    Summaries = []
+    Load_Shape = None
+    def reduce_site(Result): #Streaming reduction, adding each site to the fleet as soon as it finishes
+        nonlocal Load_Shape
+        Summary, Site_Shape = Result
+        Summaries.append(Summary)
+        if Site_Shape is not None:
+            Site_Shape['Sites'] = 1
+            Load_Shape = Site_Shape if Load_Shape is None else Load_Shape.add(Site_Shape, fill_value = 0)
+
+    if Processes == 1: #Run in this process. Useful for debugging
+        for Task in Tasks:
+            reduce_site(_run_site(Task))
+    elif len(Tasks) > 0:
+        with multiprocessing.Pool(min(Processes or multiprocessing.cpu_count(), len(Tasks))) as Pool:
+            for Result in Pool.imap_unordered(_run_site, Tasks, chunksize = 1):
+                reduce_site(Result)
+
+    Order = {os.path.splitext(os.path.basename(Path))[0]: Index for Index, Path in enumerate(Paths)}
+    Summary = pd.DataFrame(sorted(Summaries, key = lambda Row: Order[Row['Site']]))
+    if 'Error' in Summary: #Failed sites are listed at the end of their row
+        Summary = Summary[[column for column in Summary if column != 'Error'] + ['Error']]
+    if Load_Shape is None:
+        Load_Shape = pd.DataFrame(columns = ['Simulated (kWh)', 'Measured (kWh)', 'Sites'])
+    Load_Shape['Sites'] = Load_Shape['Sites'].astype(np.int64)
+    Load_Shape.index.name = 'Timestamp'
+    if Path_Output is not None:
+        Summary.to_csv(Path_Output, index = False)
+    if Path_LoadShape is not None:
+        Load_Shape.to_csv(Path_LoadShape)
+    return Summary, Load_Shape
+
+#%%--------------------------USER INPUTS------------------------------------------
+
+if __name__ == '__main__':
+    ST = time.time()
+    Folder = os.path.dirname(os.path.abspath(__file__))
+    Folder_Input = Folder + os.sep + 'Input' #Folder holding one Creekside data file per site
+    Path_Output = Folder + os.sep + 'Output' + os.sep + 'Fleet_Validation.csv'
+    Path_LoadShape = Folder + os.sep + 'Output' + os.sep + 'Fleet_Load_Shape.csv'
+
+    Summary, Load_Shape = run_fleet(Folder_Input, Path_Output, Path_LoadShape)
+    if 'Simulated (kWh)' not in Summary: #Every site failed, or none were found
+        print(Summary.to_string(index = False) if len(Summary) > 0 else 'No site files found in {}'.format(Folder_Input))
+        sys.exit('No site was simulated')
+    print(Summary.to_string(index = False))
+    print('Fleet PercentError is {}'.format((Summary['Simulated (kWh)'].sum() - Summary['Measured (kWh)'].sum()) /
+                                            Summary['Measured (kWh)'].sum() * 100))
+    print('Simulating {} sites took {} seconds'.format(len(Summary), time.time() - ST))
@@ -8,17 +8,23 @@ be referenced in both the simulation and validation scripts as needed.
 Currently this module holds only Model_HPWH_MixedTank, representing a 1-node model with a fully mixed tank. The plan is to later add additional functions
 for different assumptions as needed, creating a library of relevant simulation models.
 
-This model has now been modified to include an occupant behavior learning algorithm. As currently implemented it tracks the electricity consumption
-of the HPWH during the full day, peak period, and off peak period. It gradually builds an understanding of how the water heater consumes electricity
-enabling the development of load shifting controls tailored to each specific site. To use this algorithm the input data must have timesteps
-at midnight (Not close to midnight, AT midnight)
+The occupant behavior learning algorithm is in Occupant_Behavior.py. It tracks the electricity consumption of the HPWH during the full day,
+peak period, and off peak period. It gradually builds an understanding of how the water heater consumes electricity enabling the development
+of load shifting controls tailored to each specific site. It is updated one timestep at a time, so it can run alongside a simulation, and the
+timesteps do not need to land on midnight
 
 @author: Peter Grant
 """
 
+import math
 import numpy as np
 import pandas as pd
 
+try: #numba is optional. When it is installed the timestep kernel below is compiled, otherwise it runs as plain Python
+    from numba import njit
+except ImportError:
+    njit = None
+
 Minutes_In_Hour = 60 #Conversion between hours and minutes
 Seconds_In_Minute = 60 #Conversion between minutes and seconds
 Watts_In_kiloWatt = 1000 #Conversion between W and kW
@@ -27,16 +33,37 @@ Density_Water = 1000 #g/L
 kWh_In_Wh = 1/1000 #Conversion from Wh to kWh
 kWh_In_J = 2.7777777777e-7
 
-def Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb):
+def Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, backend = 'legacy',
+                         integrator = 'euler', counters = None):
+    #backend selects how the timestep loop is executed. All options give identical results:
+    #   'legacy' - the original loop over the Model.to_numpy() array, indexed through col_indx
+    #   'python' - the typed kernel in _mixed_tank_kernel, run as plain Python over one float64 array per column
+    #   'numba' - the same kernel compiled with numba. Raises an ImportError if numba is not installed
+    #   'auto' - 'numba' if numba is installed, otherwise 'python'
+    #integrator selects how the tank temperature is advanced over each timestep:
+    #   'euler' - the original update, with the jacket losses and draws calculated from the temperature at the start
+    #   of the timestep
+    #   'exponential' - the same control decisions, with the jacket losses and draws integrated exactly over the
+    #   timestep. See _mixed_tank_kernel_exponential. The legacy loop only implements 'euler', so 'legacy' runs the
+    #   'python' kernel instead
+    #counters is an optional dictionary. The kernels count heat pump cycles, backup element activations, hours below
+    #the cutoff temperature and timesteps below the deadband as they run, see Counter_Names, and add them to it along
+    #with the number of 'Timesteps' simulated. The legacy loop does not count, so 'legacy' runs the 'python' kernel
     Coefficient_JacketLoss = Parameters[0]
     Power_Backup = Parameters[1]
     HeatAddition_HeatPump = Parameters[2]
     Temperature_Tank_Set_Deadband = Parameters[3]
     ThermalMass_Tank = Parameters[4]
-    CO2_Production_Rate_Electricity = Parameters[5] #Temporarily not used. Keep as placeholder for adding CO2 calculations
+    CO2_Production_Rate_Electricity = Parameters[5] #Not used by the model. CO2 is calculated from the results with Hourly_Rates.HourlyRates
     COP_Adjust_Reference_Temperature = Parameters[6]
     Cutoff_Temperature = Parameters[7]
 
+    if (integrator != 'euler' or counters is not None) and backend == 'legacy':
+        backend = 'python'
+    if backend != 'legacy':
+        Model = _simulate_kernel(Model, Parameters, backend, integrator = integrator, counters = counters)
+        return _calculate_outputs(Model, Regression_COP, Regression_COP_Derate_Tamb, COP_Adjust_Reference_Temperature)
+
     data = Model.to_numpy() #convert the dataframe to a numpy array for EXTREME SPEED!!!! (numpy opperates in C)
     col_indx = dict(zip(Model.columns, list(range(0,len(Model.columns))))) #create a dictionary to provide column index references while using numpy in following loop
 
@@ -45,7 +72,7 @@ def Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Derat
         #The monitoring setup sometimes experiences data outages. We don't know the ambient temperature or hot water conusmption
         #during those outages. As a result, the model can't correctly predict what happens during those outages. To get the model
         #back on track we re-initialize the model to match the average of the tank thermostat measurements when data collection
-        #returns
+        #returns. Monitored_Data.simulate_segments applies this rule, simulating the segments between outages in parallel
 #        if data[i, col_indx['Timestep (min)']] > 5: #If the time since the last recording is > 5 minutes we assume there was a data collection outage
 #            data[i, col_indx['Tank Temperature (deg C)']] = 0.5 * (data[i, col_indx['T_Tank_Upper_C']] + data[i, col_indx['T_Tank_Lower_C']]) #When data collection resumes we re-initialize the tank at current conditions by setting the water temperature equal to the average of the thermostat measurements
         # 1 - Calculate the jacket losses from the water in the tank to the ambient air
@@ -93,9 +120,15 @@ def Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Derat
             
     Model = pd.DataFrame(data=data[0:,0:],index=Model.index,columns=Model.columns) #convert Numpy Array back to a Dataframe to make it more user friendly
     
-    Model['COP Adjust Tamb'] = Regression_COP_Derate_Tamb(Model['Tank Temperature (deg C)']) * \
+    return _calculate_outputs(Model, Regression_COP, Regression_COP_Derate_Tamb, COP_Adjust_Reference_Temperature)
+
+def _calculate_outputs(Model, Regression_COP, Regression_COP_Derate_Tamb, COP_Adjust_Reference_Temperature,
+                       Temperature_COP = 'Tank Temperature (deg C)'):
+    #Calculates the COP, electricity consumption and unit conversions once the tank states are known. Shared by every backend of Model_HPWH_MixedTank
+    #Temperature_COP is the column holding the water temperature seen by the heat pump. The mixed tank uses the tank temperature
+    Model['COP Adjust Tamb'] = Regression_COP_Derate_Tamb(Model[Temperature_COP]) * \
         (Model['Air Inlet Temperature (deg C)'] - COP_Adjust_Reference_Temperature)
-    Model['COP'] = Regression_COP(1.8 * Model['Tank Temperature (deg C)'] + 32) + Model['COP Adjust Tamb']
+    Model['COP'] = Regression_COP(1.8 * Model[Temperature_COP] + 32) + Model['COP Adjust Tamb']
     Model['Electric Power (W)'] = np.where(Model['Timestep (min)'] > 0, (Model['Energy Added Heat Pump (J)']) / \
          (Model['Timestep (min)'] * Seconds_In_Minute), 0)/Model['COP'] + np.where(Model['Timestep (min)'] > 0, \
          Model['Energy Added Backup (J)']/(Model['Timestep (min)'] * Seconds_In_Minute), 0)
@@ -116,4 +149,458 @@ def Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Derat
                                   'Energy Withdrawn (J)': 'Energy Withdrawn (kWh)',
                                   'Total Energy Change (J)': 'Total Energy Change (kWh)'})
     
-    return Model    
\ No newline at end of file
+    return Model
+
+#Columns read by the timestep kernel, in the order they are passed to it
+Kernel_Inputs = ['Ambient Temperature (deg C)', 'Timestep (min)', 'Hot Water Draw Volume (L)',
+                 'Inlet Water Temperature (deg C)', 'Set Temperature (deg C)']
+#Columns written by the timestep kernel, in the order they are passed to it. Row 0 keeps whatever value the wrapper initialized
+Kernel_States = ['Tank Temperature (deg C)', 'Temperature Activation Backup (deg C)', 'Jacket Losses (J)',
+                 'Energy Added Backup (J)', 'Energy Withdrawn (J)', 'Energy Added Heat Pump (J)', 'Total Energy Change (J)']
+
+def _mixed_tank_kernel(Temperature_Ambient, Timestep, Volume_Draw, Temperature_Inlet, Temperature_Set,
+                       Temperature_Tank, Temperature_Activation_Backup, Jacket_Losses, Energy_Added_Backup,
+                       Energy_Withdrawn, Energy_Added_HeatPump, Total_Energy_Change, Coefficient_JacketLoss,
+                       Power_Backup, HeatAddition_HeatPump, Temperature_Tank_Set_Deadband, ThermalMass_Tank,
+                       Cutoff_Temperature, Counters):
+    #Same calculations, in the same order, as the legacy loop in Model_HPWH_MixedTank so the floating point results
+    #match exactly. Every argument is a contiguous float64 array or a float, which is what lets numba compile it.
+    #Counters is a float64 array, one entry per Counter_Names, that the loop adds the operating counters to
+    for i in range(1, len(Temperature_Tank)):
+        Duration = Timestep[i] * Seconds_In_Minute
+        # 1 - Jacket losses from the water in the tank to the ambient air
+        Jacket_Losses[i] = -Coefficient_JacketLoss * (Temperature_Tank[i] - Temperature_Ambient[i]) * Duration
+        # 2 - Energy added by the backup element. Below the cutoff temperature it engages at the heat pump set point
+        if Temperature_Ambient[i] < Cutoff_Temperature:
+            Temperature_Activation_Backup[i] = Temperature_Set[i] - Temperature_Tank_Set_Deadband
+        if Energy_Added_Backup[i-1] == 0:
+            Energy_Added_Backup[i] = Power_Backup * int(Temperature_Tank[i] < Temperature_Activation_Backup[i]) * \
+                Duration
+        else:
+            Energy_Added_Backup[i] = Power_Backup * int(Temperature_Tank[i] < int(Temperature_Set[i])) * Duration
+        # 3 - Energy withdrawn by the occupants using hot water
+        Energy_Withdrawn[i] = -Volume_Draw[i] * Density_Water * SpecificHeat_Water * (Temperature_Tank[i] - \
+            Temperature_Inlet[i])
+        # 4 - Energy added by the heat pump
+        if Temperature_Ambient[i] < Cutoff_Temperature:
+            Energy_Added_HeatPump[i] = 0
+        else:
+            Energy_Added_HeatPump[i] = HeatAddition_HeatPump * int(Temperature_Tank[i] < (Temperature_Set[i] - \
+                Temperature_Tank_Set_Deadband) or Energy_Added_HeatPump[i-1] > 0 and Temperature_Tank[i] < \
+                Temperature_Set[i]) * Duration
+        # 5 - Energy change in the tank
+        Total_Energy_Change[i] = Jacket_Losses[i] + Energy_Withdrawn[i] + Energy_Added_Backup[i] + \
+            Energy_Added_HeatPump[i]
+        # 6 - Tank temperature at the start of the next timestep
+        if i < len(Temperature_Tank) - 1:
+            Temperature_Tank[i + 1] = Total_Energy_Change[i] / ThermalMass_Tank + Temperature_Tank[i]
+        # 7 - Operating counters, see Counter_Names
+        if Energy_Added_HeatPump[i] > 0 and not Energy_Added_HeatPump[i-1] > 0:
+            Counters[0] += 1
+        if Energy_Added_Backup[i] != 0 and Energy_Added_Backup[i-1] == 0:
+            Counters[1] += 1
+        if Temperature_Ambient[i] < Cutoff_Temperature:
+            Counters[2] += Duration
+        if Temperature_Tank[i] < Temperature_Set[i] - Temperature_Tank_Set_Deadband:
+            Counters[3] += 1
+
+def _mixed_tank_kernel_exponential(Temperature_Ambient, Timestep, Volume_Draw, Temperature_Inlet, Temperature_Set,
+                                   Temperature_Tank, Temperature_Activation_Backup, Jacket_Losses, Energy_Added_Backup,
+                                   Energy_Withdrawn, Energy_Added_HeatPump, Total_Energy_Change,
+                                   Coefficient_JacketLoss, Power_Backup, HeatAddition_HeatPump,
+                                   Temperature_Tank_Set_Deadband, ThermalMass_Tank, Cutoff_Temperature, Counters):
+    #Same control decisions as _mixed_tank_kernel, made with the tank temperature at the start of each timestep, but
+    #the jacket losses and the mixing of inlet water during draws are integrated exactly over the timestep instead of
+    #being evaluated at its start. With the heat pump and backup element states fixed, the tank follows
+    #   ThermalMass_Tank * dT/dt = Heat_Added - Coefficient_JacketLoss * (T - T_Ambient) - Conductance_Draw * (T - T_Inlet)
+    #where the draw is spread evenly over the timestep. The tank decays exponentially towards the equilibrium
+    #temperature, so it never overshoots it however long the timestep or large the draw
+    for i in range(1, len(Temperature_Tank)):
+        Duration = Timestep[i] * Seconds_In_Minute
+        # 1 - Heat pump and backup element states, exactly as in _mixed_tank_kernel
+        if Temperature_Ambient[i] < Cutoff_Temperature:
+            Temperature_Activation_Backup[i] = Temperature_Set[i] - Temperature_Tank_Set_Deadband
+        if Energy_Added_Backup[i-1] == 0:
+            Energy_Added_Backup[i] = Power_Backup * int(Temperature_Tank[i] < Temperature_Activation_Backup[i]) * \
+                Duration
+        else:
+            Energy_Added_Backup[i] = Power_Backup * int(Temperature_Tank[i] < int(Temperature_Set[i])) * Duration
+        if Temperature_Ambient[i] < Cutoff_Temperature:
+            Energy_Added_HeatPump[i] = 0
+        else:
+            Energy_Added_HeatPump[i] = HeatAddition_HeatPump * int(Temperature_Tank[i] < (Temperature_Set[i] - \
+                Temperature_Tank_Set_Deadband) or Energy_Added_HeatPump[i-1] > 0 and Temperature_Tank[i] < \
+                Temperature_Set[i]) * Duration
+        # 2 - Integral of the tank temperature over the timestep
+        if Duration > 0:
+            Conductance_Draw = Volume_Draw[i] * Density_Water * SpecificHeat_Water / Duration
+            Heat_Added = (Energy_Added_Backup[i] + Energy_Added_HeatPump[i]) / Duration
+        else:
+            Conductance_Draw = 0.
+            Heat_Added = 0.
+        Conductance = Coefficient_JacketLoss + Conductance_Draw
+        if Conductance > 0:
+            Temperature_Equilibrium = (Heat_Added + Coefficient_JacketLoss * Temperature_Ambient[i] + \
+                Conductance_Draw * Temperature_Inlet[i]) / Conductance
+            Time_Constant = ThermalMass_Tank / Conductance
+            Integral = Temperature_Equilibrium * Duration - (Temperature_Tank[i] - Temperature_Equilibrium) * \
+                Time_Constant * math.expm1(-Duration / Time_Constant)
+        else:
+            Integral = Temperature_Tank[i] * Duration + Heat_Added * Duration ** 2 / (2 * ThermalMass_Tank)
+        # 3 - Jacket losses and energy withdrawn, integrated over the timestep
+        Jacket_Losses[i] = -Coefficient_JacketLoss * (Integral - Temperature_Ambient[i] * Duration)
+        Energy_Withdrawn[i] = -Conductance_Draw * (Integral - Temperature_Inlet[i] * Duration)
+        # 4 - Energy change in the tank and tank temperature at the start of the next timestep
+        Total_Energy_Change[i] = Jacket_Losses[i] + Energy_Withdrawn[i] + Energy_Added_Backup[i] + \
+            Energy_Added_HeatPump[i]
+        if i < len(Temperature_Tank) - 1:
+            Temperature_Tank[i + 1] = Total_Energy_Change[i] / ThermalMass_Tank + Temperature_Tank[i]
+        # 5 - Operating counters, see Counter_Names
+        if Energy_Added_HeatPump[i] > 0 and not Energy_Added_HeatPump[i-1] > 0:
+            Counters[0] += 1
+        if Energy_Added_Backup[i] != 0 and Energy_Added_Backup[i-1] == 0:
+            Counters[1] += 1
+        if Temperature_Ambient[i] < Cutoff_Temperature:
+            Counters[2] += Duration
+        if Temperature_Tank[i] < Temperature_Set[i] - Temperature_Tank_Set_Deadband:
+            Counters[3] += 1
+
+#Operating counters added up by the timestep kernels. 'Hours Below Cutoff' is accumulated in seconds by the kernels
+#and converted by _add_counters. 'Heat Pump Cycles' and 'Backup Activations' count the timesteps in which the heat pump
+#or backup element turns on, and 'Steps Below Deadband' the timesteps starting with the tank below the set temperature
+#minus the deadband
+Counter_Names = ['Heat Pump Cycles', 'Backup Activations', 'Hours Below Cutoff', 'Steps Below Deadband']
+
+def _add_counters(counters, Counters, Timesteps):
+    #Adds the Counters array filled by a kernel, and the number of Timesteps simulated, to the counters dictionary
+    Values = dict(zip(Counter_Names, Counters.tolist()))
+    Values['Hours Below Cutoff'] /= Seconds_In_Minute * Minutes_In_Hour
+    Values['Timesteps'] = Timesteps
+    for name, value in Values.items():
+        counters[name] = counters.get(name, 0) + (value if name == 'Hours Below Cutoff' else int(value))
+
+#Timestep kernels for each integrator, as (plain Python, compiled with numba or None)
+Integrators = {'euler': _mixed_tank_kernel, 'exponential': _mixed_tank_kernel_exponential}
+_kernels = {name: (kernel, njit(cache = True)(kernel) if njit is not None else None)
+            for name, kernel in Integrators.items()}
+
+def _get_kernel(backend, integrator = 'euler'):
+    if integrator not in _kernels:
+        raise ValueError('Unknown integrator {}. Use {}'.format(integrator, ' or '.join(_kernels)))
+    kernel, kernel_compiled = _kernels[integrator]
+    if backend == 'python':
+        return kernel
+    elif backend == 'numba':
+        if kernel_compiled is None:
+            raise ImportError("backend = 'numba' requires numba to be installed")
+        return kernel_compiled
+    elif backend == 'auto':
+        return kernel_compiled if kernel_compiled is not None else kernel
+    raise ValueError('Unknown backend {}. Use legacy, python, numba or auto'.format(backend))
+
+def _simulate_kernel(Model, Parameters, backend, State = None, integrator = 'euler', counters = None):
+    #Runs the timestep loop with one contiguous float64 array per column instead of the 2-D object array
+    #State optionally continues a previous simulation, see Model_HPWH_MixedTank_Chunk. The arrays then get one extra
+    #leading element standing in for the last timestep of the previous chunk, so every row of Model is calculated.
+    #If counters is a dictionary the operating counters of this run are added to it
+    kernel = _get_kernel(backend, integrator)
+    Lead = 0 if State is None else 1
+    inputs = [np.ascontiguousarray(np.concatenate([np.zeros(Lead), Model[column].to_numpy(dtype = np.float64)]))
+              for column in Kernel_Inputs]
+    states = [np.concatenate([np.zeros(Lead), Model[column].to_numpy(dtype = np.float64)])
+              for column in Kernel_States]
+    if State is not None and len(Model) > 0:
+        states[0][1] = State['Tank Temperature (deg C)']
+        states[3][0] = State['Energy Added Backup (J)']
+        states[5][0] = State['Energy Added Heat Pump (J)']
+    Counters = np.zeros(len(Counter_Names))
+    kernel(*inputs, *states, float(Parameters[0]), float(Parameters[1]), float(Parameters[2]), float(Parameters[3]),
+           float(Parameters[4]), float(Parameters[7]), Counters)
+    if counters is not None:
+        _add_counters(counters, Counters, max(len(Model) - 1 + Lead, 0))
+    Model = Model.copy()
+    for column, values in zip(Kernel_States, states):
+        Model[column] = values[Lead:]
+    return Model
+
+def Model_HPWH_MixedTank_Chunk(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, State = None,
+                               backend = 'auto', integrator = 'euler', counters = None):
+    #Simulates one chunk of a data set too long to hold in memory at once. Returns the simulated chunk, with the same
+    #columns as Model_HPWH_MixedTank, and the State to pass with the next chunk. State is None for the first chunk,
+    #which is simulated exactly like Model_HPWH_MixedTank. Later chunks start from the tank temperature and the heat
+    #pump and backup element states at the end of the previous chunk, so running a data set chunk by chunk gives the
+    #same results as running it all at once. The legacy loop cannot start from a State, so backend = 'legacy' runs
+    #the 'python' kernel instead, which gives identical results. integrator and counters are the same as in
+    #Model_HPWH_MixedTank. Pass the same counters dictionary with every chunk to add up the whole data set
+    if backend == 'legacy':
+        backend = 'python'
+    if len(Model) == 0:
+        return Model, State
+    Model = _simulate_kernel(Model, Parameters, backend, State, integrator, counters)
+    #The kernel does not calculate the tank temperature after the last timestep. Calculate it the same way so the next
+    #chunk continues exactly where this one ends
+    State = {'Tank Temperature (deg C)': Model['Total Energy Change (J)'].iloc[-1] / float(Parameters[4]) + \
+                 Model['Tank Temperature (deg C)'].iloc[-1],
+             'Energy Added Backup (J)': Model['Energy Added Backup (J)'].iloc[-1],
+             'Energy Added Heat Pump (J)': Model['Energy Added Heat Pump (J)'].iloc[-1]}
+    return _calculate_outputs(Model, Regression_COP, Regression_COP_Derate_Tamb, Parameters[6]), State
+
+def Model_HPWH_MixedTank_Ensemble(Model, Parameters_Matrix, Regression_COP, Regression_COP_Derate_Tamb,
+                                  output = 'array', Thresholds_Activation_Backup = None):
+    #Simulates N tanks that share the input time series in Model but each have their own parameters. Parameters_Matrix
+    #has one row per scenario and one column per entry of the Parameters list used by Model_HPWH_MixedTank, in the
+    #same order. Column 5 (CO2) is not used and may be NaN. Every timestep advances all N tanks at once as vectors, so
+    #a parameter sweep costs one Python loop over time instead of N. Each scenario matches Model_HPWH_MixedTank exactly.
+    #output = 'array' returns a dictionary of (timesteps x scenarios) arrays, keyed by the output column names of
+    #Model_HPWH_MixedTank. output = 'long' returns the same values as a DataFrame indexed by (Scenario, Model index)
+    #Thresholds_Activation_Backup optionally gives each scenario its own Threshold_Activation_Backup. When it is given
+    #'Temperature Activation Backup (deg C)' is recalculated as the set temperature minus each scenario's threshold
+    Parameters_Matrix = np.atleast_2d(np.asarray(Parameters_Matrix, dtype = np.float64))
+    Coefficient_JacketLoss = Parameters_Matrix[:, 0]
+    Power_Backup = Parameters_Matrix[:, 1]
+    HeatAddition_HeatPump = Parameters_Matrix[:, 2]
+    Temperature_Tank_Set_Deadband = Parameters_Matrix[:, 3]
+    ThermalMass_Tank = Parameters_Matrix[:, 4]
+    COP_Adjust_Reference_Temperature = Parameters_Matrix[:, 6]
+    Cutoff_Temperature = Parameters_Matrix[:, 7]
+    Scenarios = len(Parameters_Matrix)
+
+    Temperature_Ambient, Timestep, Volume_Draw, Temperature_Inlet, Temperature_Set = \
+        [Model[column].to_numpy(dtype = np.float64) for column in Kernel_Inputs]
+    #Each state is a (timesteps x scenarios) array starting from the values the wrapper initialized in Model
+    Temperature_Tank, Temperature_Activation_Backup, Jacket_Losses, Energy_Added_Backup, Energy_Withdrawn, \
+        Energy_Added_HeatPump, Total_Energy_Change = [np.repeat(Model[column].to_numpy(dtype = np.float64)[:, None],
+        Scenarios, axis = 1) for column in Kernel_States]
+    if Thresholds_Activation_Backup is not None:
+        Temperature_Activation_Backup = Temperature_Set[:, None] - np.asarray(Thresholds_Activation_Backup,
+                                                                              dtype = np.float64)[None, :]
+
+    for i in range(1, len(Temperature_Tank)):
+        Temperature_Activation_Backup[i], Jacket_Losses[i], Energy_Added_Backup[i], Energy_Withdrawn[i], \
+            Energy_Added_HeatPump[i], Total_Energy_Change[i], Temperature_Tank_Next = _ensemble_step(
+            Temperature_Tank[i], Energy_Added_Backup[i-1], Energy_Added_HeatPump[i-1],
+            Temperature_Activation_Backup[i], Temperature_Ambient[i], Timestep[i], Volume_Draw[i],
+            Temperature_Inlet[i], Temperature_Set[i], Coefficient_JacketLoss, Power_Backup, HeatAddition_HeatPump,
+            Temperature_Tank_Set_Deadband, ThermalMass_Tank, Cutoff_Temperature)
+        if i < len(Temperature_Tank) - 1:
+            Temperature_Tank[i + 1] = Temperature_Tank_Next
+
+    Temperature_Air_Inlet = Model['Air Inlet Temperature (deg C)'].to_numpy(dtype = np.float64)[:, None]
+    Timestep = Timestep[:, None]
+    COP_Adjust_Tamb = Regression_COP_Derate_Tamb(Temperature_Tank) * (Temperature_Air_Inlet - \
+        COP_Adjust_Reference_Temperature)
+    COP = Regression_COP(1.8 * Temperature_Tank + 32) + COP_Adjust_Tamb
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        Electric_Power = np.where(Timestep > 0, Energy_Added_HeatPump / (Timestep * Seconds_In_Minute), 0) / COP + \
+            np.where(Timestep > 0, Energy_Added_Backup / (Timestep * Seconds_In_Minute), 0)
+    Results = {'Tank Temperature (deg C)': Temperature_Tank,
+               'Temperature Activation Backup (deg C)': Temperature_Activation_Backup,
+               'Jacket Losses (kWh)': Jacket_Losses * kWh_In_J,
+               'Energy Withdrawn (kWh)': Energy_Withdrawn * kWh_In_J,
+               'Energy Added Backup (kWh)': Energy_Added_Backup * kWh_In_J,
+               'Energy Added Heat Pump (kWh)': Energy_Added_HeatPump * kWh_In_J,
+               'Energy Added Total (kWh)': (Energy_Added_HeatPump + Energy_Added_Backup) * kWh_In_J,
+               'Total Energy Change (kWh)': Total_Energy_Change * kWh_In_J,
+               'COP Adjust Tamb': COP_Adjust_Tamb,
+               'COP': COP,
+               'Electric Power (W)': Electric_Power,
+               'Electricity Consumed (kWh)': (Electric_Power * Timestep) / (Watts_In_kiloWatt * Minutes_In_Hour)}
+
+    if output == 'array':
+        return Results
+    elif output == 'long':
+        Index = pd.MultiIndex.from_product([range(Scenarios), Model.index], names = ['Scenario',
+                                           Model.index.name if Model.index.name is not None else 'Index'])
+        return pd.DataFrame({column: values.T.ravel() for column, values in Results.items()}, index = Index)
+    raise ValueError('Unknown output {}. Use array or long'.format(output))
+
+def _ensemble_step(Temperature_Tank, Energy_Added_Backup_Previous, Energy_Added_HeatPump_Previous,
+                   Temperature_Activation_Backup, Temperature_Ambient, Timestep, Volume_Draw, Temperature_Inlet,
+                   Temperature_Set, Coefficient_JacketLoss, Power_Backup, HeatAddition_HeatPump,
+                   Temperature_Tank_Set_Deadband, ThermalMass_Tank, Cutoff_Temperature):
+    #Advances a vector of tanks by one timestep. The states and parameters are arrays with one entry per tank, the
+    #inputs are the values for this timestep. Same steps as _mixed_tank_kernel, applied to every tank at once.
+    #Returns the activation temperature of the backup element, the energy terms (J), and the tank temperature at the
+    #start of the next timestep
+    Duration = Timestep * Seconds_In_Minute
+    Jacket_Losses = -Coefficient_JacketLoss * (Temperature_Tank - Temperature_Ambient) * Duration
+    Below_Cutoff = Temperature_Ambient < Cutoff_Temperature
+    Temperature_Activation_Backup = np.where(Below_Cutoff, Temperature_Set - Temperature_Tank_Set_Deadband,
+                                             Temperature_Activation_Backup)
+    Threshold_Backup = np.where(Energy_Added_Backup_Previous == 0, Temperature_Activation_Backup,
+                                np.trunc(Temperature_Set))
+    Energy_Added_Backup = Power_Backup * (Temperature_Tank < Threshold_Backup) * Duration
+    Energy_Withdrawn = -Volume_Draw * Density_Water * SpecificHeat_Water * (Temperature_Tank - Temperature_Inlet)
+    HeatPump_Active = (Temperature_Tank < (Temperature_Set - Temperature_Tank_Set_Deadband)) | \
+        ((Energy_Added_HeatPump_Previous > 0) & (Temperature_Tank < Temperature_Set))
+    Energy_Added_HeatPump = np.where(Below_Cutoff, 0, HeatAddition_HeatPump * HeatPump_Active * Duration)
+    Total_Energy_Change = Jacket_Losses + Energy_Withdrawn + Energy_Added_Backup + Energy_Added_HeatPump
+    Temperature_Tank_Next = Total_Energy_Change / ThermalMass_Tank + Temperature_Tank
+    return Temperature_Activation_Backup, Jacket_Losses, Energy_Added_Backup, Energy_Withdrawn, \
+        Energy_Added_HeatPump, Total_Energy_Change, Temperature_Tank_Next
+
+def Model_HPWH_MixedTank_EventDriven(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb):
+    #Event-driven version of Model_HPWH_MixedTank. Reads and returns the same columns, but instead of applying each
+    #timestep's energy balance at the temperature at the start of the timestep it solves the tank temperature exactly.
+    #While the inputs and the heat pump and backup states are constant the tank follows
+    #   ThermalMass_Tank * dT/dt = Heat_Added - Coefficient_JacketLoss * (T - T_Ambient) - FlowRate * c * (T - T_Inlet)
+    #which has the closed form solution T = Temperature_Equilibrium + (T_Start - Temperature_Equilibrium) * exp(-Rate * t).
+    #Consecutive timesteps without draws and with the same ambient, set and backup activation temperatures are advanced
+    #as one block, and each draw is treated as a constant flow over its timestep. Within a block the time at which the
+    #tank crosses the next thermostat threshold is solved exactly and the heat pump or backup element switches at that
+    #moment, instead of at the start of the next timestep. The thresholds are the same as Model_HPWH_MixedTank: the heat
+    #pump turns on below the set temperature minus the deadband and off at the set temperature, and the backup element
+    #turns on below the activation temperature and off at the set temperature truncated to a whole degree.
+    #The results are reported on the input timesteps: the tank temperature at the start of each timestep and the
+    #energy terms integrated over it. Because switching is not tied to the timesteps, a coarse timestep gives nearly the
+    #accuracy of a much finer one. Row 0 keeps its initialized values, as in Model_HPWH_MixedTank
+    Coefficient_JacketLoss = float(Parameters[0])
+    Power_Backup = float(Parameters[1])
+    HeatAddition_HeatPump = float(Parameters[2])
+    Temperature_Tank_Set_Deadband = float(Parameters[3])
+    ThermalMass_Tank = float(Parameters[4])
+    Cutoff_Temperature = float(Parameters[7])
+
+    Temperature_Ambient, Timestep, Volume_Draw, Temperature_Inlet, Temperature_Set = \
+        [Model[column].to_numpy(dtype = np.float64) for column in Kernel_Inputs]
+    Temperature_Tank, Temperature_Activation_Backup, Jacket_Losses, Energy_Added_Backup, Energy_Withdrawn, \
+        Energy_Added_HeatPump, Total_Energy_Change = [Model[column].to_numpy(dtype = np.float64, copy = True)
+        for column in Kernel_States]
+    Length = len(Temperature_Tank)
+    if Length < 2:
+        return _calculate_outputs(Model.copy(), Regression_COP, Regression_COP_Derate_Tamb, Parameters[6])
+
+    Below_Cutoff = Temperature_Ambient < Cutoff_Temperature
+    Temperature_Activation_Backup[1:] = np.where(Below_Cutoff[1:], Temperature_Set[1:] - Temperature_Tank_Set_Deadband,
+                                                 Temperature_Activation_Backup[1:])
+    Duration = Timestep * Seconds_In_Minute
+    Time_Start = np.zeros(Length) #Time at the start of each timestep, in seconds after the start of row 1
+    Time_Start[2:] = np.cumsum(Duration[1:-1])
+    Time_End = Time_Start + Duration
+    Draw = Volume_Draw != 0
+    with np.errstate(divide = 'ignore', invalid = 'ignore'): #Heat capacity flow rate of the draw, W/K
+        Conductance_Draw = np.where(Draw & (Duration > 0), Volume_Draw * Density_Water * SpecificHeat_Water / Duration, 0)
+
+    #A new block starts whenever an input changes, including the start and end of each draw and changes in its flow rate
+    Change = np.ones(Length, dtype = bool)
+    Change[2:] = (Conductance_Draw[2:] != Conductance_Draw[1:-1]) | (Draw[2:] & \
+        (Temperature_Inlet[2:] != Temperature_Inlet[1:-1])) | (Temperature_Ambient[2:] != Temperature_Ambient[1:-1]) | \
+        (Temperature_Set[2:] != Temperature_Set[1:-1]) | \
+        (Temperature_Activation_Backup[2:] != Temperature_Activation_Backup[1:-1])
+    Block_Starts = np.flatnonzero(Change[1:]) + 1
+    Block_Ends = np.append(Block_Starts[1:], Length)
+
+    for column in [Jacket_Losses, Energy_Added_Backup, Energy_Withdrawn, Energy_Added_HeatPump]:
+        column[1:] = 0
+    Temperature = float(Temperature_Tank[1])
+    HeatPump_On = bool(Energy_Added_HeatPump[0] > 0)
+    Backup_On = bool(Energy_Added_Backup[0] != 0)
+
+    #The loop below mostly does scalar math, which is much faster on Python floats than on numpy scalars
+    Ambient_Rows, Set_Rows, Activation_Rows, Conductance_Draw_Rows, Inlet_Rows, Below_Cutoff_Rows, Time_Start_Rows, \
+        Time_End_Rows = [values.tolist() for values in [Temperature_Ambient, Temperature_Set,
+        Temperature_Activation_Backup, Conductance_Draw, np.where(Draw, Temperature_Inlet, 0.), Below_Cutoff,
+        Time_Start, Time_End]]
+
+    for Start, End in zip(Block_Starts.tolist(), Block_Ends.tolist()):
+        Ambient = Ambient_Rows[Start]
+        Set = Set_Rows[Start]
+        Activation = Activation_Rows[Start]
+        Flow = Conductance_Draw_Rows[Start]
+        Conductance = Coefficient_JacketLoss + Flow
+        Inlet = Inlet_Rows[Start]
+        Cutoff = Below_Cutoff_Rows[Start]
+        #Same control decisions as Model_HPWH_MixedTank at the start of the block
+        HeatPump_On = not Cutoff and (Temperature < Set - Temperature_Tank_Set_Deadband or HeatPump_On and \
+            Temperature < Set)
+        Backup_On = Temperature < (math.trunc(Set) if Backup_On else Activation)
+        Time, Time_Block_End = Time_Start_Rows[Start], Time_End_Rows[End - 1]
+        Stalled_Phases = 0 #Consecutive phases of zero length, which only happen if the thermostats chatter
+        while True: #Each phase ends at a thermostat crossing or at the end of the block
+            Heat_Added = HeatAddition_HeatPump * HeatPump_On + Power_Backup * Backup_On
+            Rate = Conductance / ThermalMass_Tank
+            Temperature_Equilibrium = (Heat_Added + Coefficient_JacketLoss * Ambient + Flow * \
+                Inlet) / Conductance if Conductance > 0 else np.inf
+            Slope = Heat_Added / ThermalMass_Tank #Only used when Conductance is 0
+            if HeatPump_On:
+                Time_HeatPump = _crossing_time(Temperature, Temperature_Equilibrium, Rate, Slope, Set, True)
+            elif not Cutoff:
+                Time_HeatPump = _crossing_time(Temperature, Temperature_Equilibrium, Rate, Slope,
+                                               Set - Temperature_Tank_Set_Deadband, False)
+            else:
+                Time_HeatPump = np.inf
+            Time_Backup = _crossing_time(Temperature, Temperature_Equilibrium, Rate, Slope,
+                                         math.trunc(Set) if Backup_On else Activation, Backup_On)
+            Time_Switch = min(Time_HeatPump, Time_Backup)
+            Time_Phase_End = min(Time + Time_Switch, Time_Block_End)
+
+            #Integrate the phase over every timestep it overlaps
+            if End - Start == 1:
+                First, Last = Start, End
+            else:
+                First = Start + int(np.searchsorted(Time_End[Start:End], Time, side = 'left'))
+                Last = Start + int(np.searchsorted(Time_Start[Start:End], Time_Phase_End, side = 'right'))
+            if Last - First == 1: #Most phases are within one timestep, where scalar math is much faster
+                Lower = min(max(Time_Start_Rows[First], Time), Time_Phase_End) - Time
+                Upper = min(max(Time_End_Rows[First], Time), Time_Phase_End) - Time
+                Record = Time <= Time_Start_Rows[First] < Time_Phase_End
+            else:
+                Lower = np.clip(Time_Start[First:Last], Time, Time_Phase_End) - Time
+                Upper = np.clip(Time_End[First:Last], Time, Time_Phase_End) - Time
+                Record = (Time_Start[First:Last] >= Time) & (Time_Start[First:Last] < Time_Phase_End)
+            exp, expm1 = (math.exp, math.expm1) if Last - First == 1 else (np.exp, np.expm1)
+            if Conductance > 0:
+                Decay_Lower = exp(-Rate * Lower)
+                Temperature_Start = Temperature_Equilibrium + (Temperature - Temperature_Equilibrium) * Decay_Lower
+                Integral = (Temperature - Temperature_Equilibrium) * -Decay_Lower * expm1(-Rate * (Upper - Lower)) / \
+                    Rate + Temperature_Equilibrium * (Upper - Lower) #Integral of the tank temperature over each overlap
+                Temperature_Phase_End = Temperature_Equilibrium + (Temperature - Temperature_Equilibrium) * \
+                    math.exp(-Rate * (Time_Phase_End - Time))
+            else:
+                Temperature_Start = Temperature + Slope * Lower
+                Integral = Temperature * (Upper - Lower) + Slope * (Upper**2 - Lower**2) / 2
+                Temperature_Phase_End = Temperature + Slope * (Time_Phase_End - Time)
+            if Last - First == 1:
+                if Record:
+                    Temperature_Tank[First] = Temperature_Start
+            else:
+                Temperature_Tank[First:Last] = np.where(Record, Temperature_Start, Temperature_Tank[First:Last])
+            Rows = First if Last - First == 1 else slice(First, Last)
+            Jacket_Losses[Rows] -= Coefficient_JacketLoss * (Integral - Ambient * (Upper - Lower))
+            Energy_Withdrawn[Rows] -= Flow * (Integral - Inlet * (Upper - Lower))
+            Energy_Added_HeatPump[Rows] += HeatAddition_HeatPump * HeatPump_On * (Upper - Lower)
+            Energy_Added_Backup[Rows] += Power_Backup * Backup_On * (Upper - Lower)
+            Temperature = Temperature_Phase_End
+
+            if Time + Time_Switch >= Time_Block_End:
+                break
+            Stalled_Phases = Stalled_Phases + 1 if Time_Phase_End == Time else 0
+            if Stalled_Phases > 10:
+                raise RuntimeError('The thermostats switch without the tank temperature changing at row {}. Check '
+                                   'that the deadband is positive'.format(First))
+            Time = Time_Phase_End
+            if Time_HeatPump == Time_Switch:
+                HeatPump_On = not HeatPump_On
+            if Time_Backup == Time_Switch:
+                Backup_On = not Backup_On
+
+    Total_Energy_Change[1:] = Jacket_Losses[1:] + Energy_Withdrawn[1:] + Energy_Added_Backup[1:] + \
+        Energy_Added_HeatPump[1:]
+    Model = Model.copy()
+    for column, values in zip(Kernel_States, [Temperature_Tank, Temperature_Activation_Backup, Jacket_Losses,
+                              Energy_Added_Backup, Energy_Withdrawn, Energy_Added_HeatPump, Total_Energy_Change]):
+        Model[column] = values
+    return _calculate_outputs(Model, Regression_COP, Regression_COP_Derate_Tamb, Parameters[6])
+
+def _crossing_time(Temperature, Temperature_Equilibrium, Rate, Slope, Threshold, Rising):
+    #Time, in seconds, until the tank temperature reaches Threshold while approaching Temperature_Equilibrium at Rate
+    #(1/s). Rate = 0 means the temperature changes linearly at Slope (K/s). Rising is True for a threshold reached from
+    #below, which switches a heater off, and False for one reached from above. Returns inf if it is not reached
+    if Rate > 0:
+        if Rising and not Temperature <= Threshold < Temperature_Equilibrium or \
+            not Rising and not Temperature >= Threshold > Temperature_Equilibrium:
+            return np.inf
+        return math.log((Temperature - Temperature_Equilibrium) / (Threshold - Temperature_Equilibrium)) / Rate
+    if Rising and Slope > 0 and Temperature <= Threshold or not Rising and Slope < 0 and Temperature >= Threshold:
+        return (Threshold - Temperature) / Slope
+    return np.inf
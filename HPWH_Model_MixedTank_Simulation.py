@@ -6,16 +6,19 @@ Created on Mon Apr 01 12:53:33 2019
 """
 #%%--------------------------IMPORT STATEMENTS--------------------------------
 
-import pandas as pd
 import numpy as np
 import os
-import time
 from datetime import datetime
 import HPWH_Model as HPWH
 from Set_Temperature_Profiles import get_profile
-from Installation_Configuration import get_temperatures
+from Draw_Profiles import get_draw_profile
+from Model_Initialization import initialize_model
+from Output_Files import save_output
+from Instrumentation import Instrumentation, print_phase
+from Hourly_Rates import HourlyRates, read_co2_factors
+from Occupant_Behavior import learn
 
-ST = time.time() #begin to time the script
+Run = Instrumentation(Callback = print_phase, Trace_Memory = False) #Times each phase of the script and collects the model counters. Trace_Memory = True also measures the peak memory of each phase, but slows the script down. See Instrumentation
 
 #%%--------------------------HPWH PARAMETERS------------------------------
 
@@ -60,24 +63,29 @@ ClimateZone = 1 #CA climate zone to use in the simulation
 #Version = 2019 #States the version of the T24 draw profile data set to use. Currently, available options are 2016 and 2019
 
 Simulation_Start = datetime(2021, 1, 1, 0, 0) #Set the start time of the simulation. Default is 2021/Jan/1 at Midnight (00:00)
-Timestep = 5 #Timestep to use in the draw profile and simulation, in minutes. The finer the timestep, the better the model, but the longer the model takes to run
+Timestep = 5 #Timestep to use in the draw profile and simulation, in minutes. The finer the timestep, the better the model, but the longer the model takes to run. With Integrator = 'exponential' or 'event' coarse timesteps stay much more accurate, see Convergence_Study.py
 Peak_Start = 12 + 4 #hr, represents the start time of the peak period. The default value is 12 + 4 representing 4 PM
 Peak_End = 12 + 9 #hr, represents the start time of the peak period. The default value is 12 + 9 representing 9 PM
 
 vary_inlet_temp = True # enter False to fix inlet water temperature constant, and True to take the inlet water temperature from the draw profile file (to make it vary by climate zone)
 Vary_CO2_Elec = False #Enter True is reading the CO2 multipliers from a data file, enter False if using the CO2 multiplier specified above
 Shift_On_Weekends = True # True if applying load shifting controls on the weekends, False if only applying load shifting on week days
+Learn_Occupant_Behavior = False #True adds the daily, peak and off peak electricity consumption learned by Occupant_Behavior up to each timestep to the results
+Model_Backend = 'auto' #Backend used for the timestep loop in HPWH_Model.Model_HPWH_MixedTank. 'auto' uses the numba-compiled kernel when numba is installed. See HPWH_Model for the options
+Integrator = 'euler' #How the tank temperature is advanced. 'euler' is the original timestep update. 'exponential' integrates the jacket losses and draws exactly over each timestep, which stays accurate at much longer timesteps. 'event' uses HPWH_Model.Model_HPWH_MixedTank_EventDriven, which also switches the heat pump and backup element at the exact thermostat crossings. Convergence_Study.py compares them
 
 Path_DrawProfile = r'C:\Users\Peter Grant\Dropbox (Beyond Efficiency)\Peter\Python Scripts\GasHPWH_Model_git\Data\Draw_Profiles\Bldg=Single_CZ=1_Wat=Hot_Prof=1_SDLM=Yes_CFA=800_Inc=FSCDB_Ver=2019.csv'
 Filename = Path_DrawProfile.split('Draw_Profiles\\')[1]
-Path_Output = os.path.dirname(__file__) + os.sep + 'Output' + os.sep + 'Output_' + Filename
+Folder_Cache_DrawProfiles = os.path.dirname(__file__) + os.sep + 'Cache' + os.sep + 'Draw_Profiles' #Folder caching binned draw profiles between runs. None disables the cache
+Output_Format = '.csv' #Format of the results file: '.csv', '.npz', '.parquet', '.feather' or '' for a folder of .npy files. The binary formats are much faster to write and read. See Output_Files for details
+Output_Columns = None #List of columns to save. None saves every column
+Output_Downcast = False #True saves float columns as float32, halving the file size
+Path_Output = os.path.splitext(os.path.dirname(__file__) + os.sep + 'Output' + os.sep + 'Output_' + Filename)[0] + Output_Format
+Path_Instrumentation = None #.json file to save the phase timings and model counters to. None only prints them
 
-if Vary_CO2_Elec == True: #If the user has elected to use time-varying CO2 multipliers this code will read the data set, identify the desired data, create a new data series containing the hourly multipliers for this simulation
-    Folder_CO2_Elec = r'C:\Users\Peter Grant\Dropbox (Beyond Efficiency)\Peter\Python Scripts\GasHPWH_Model_git\Data\CO2' #Specify the folder where the electric CO2 data is located
-    File_CO2_Elec = r'CA2019CarbonOnly-Elec.csv' #Specify the file containing the CO2 data
-    CO2_Elec = pd.read_csv(Folder_CO2_Elec + os.sep +  File_CO2_Elec, header = 2) #Read the specified data file. The header declaration is specific to the current file, and may need to be changed when using different files
-    CO2_Column = 'CZ' + str(ClimateZone) + ' Electricity Long-Run Carbon Emission Factors (ton/MWh)' #Find the column name of CO2 cmultipliers for the currently used climate zone. This line will likely need to be changed if using a different file
-    CO2_Output_Electricity = CO2_Elec[CO2_Column] #Create a new series holding the data for use
+Folder_CO2_Elec = r'C:\Users\Peter Grant\Dropbox (Beyond Efficiency)\Peter\Python Scripts\GasHPWH_Model_git\Data\CO2' #Specify the folder where the electric CO2 data is located
+File_CO2_Elec = r'CA2019CarbonOnly-Elec.csv' #Specify the file containing the CO2 data. Only read if Vary_CO2_Elec = True
+Prices = None #Electricity prices in $/kWh keyed by the hour of the day, as in Process_Output.py. When given, the cost of the electricity consumed in each timestep is added to the results
 
 #%%---------------CONSTANT DECLARATIONS AND CALCULATIONS-----------------------
 #COP regression calculations
@@ -104,15 +112,16 @@ Pounds_In_Ton = 2000 #Pounds in a US ton
 kWh_In_MWh = 1000 #kWh in MWh
 
 #Calculating the CO2 produced (lbs/kWh) by electricity consumption
-#Note that this object becomes a float if Vary_C02_Elec == False but is a dataframe series if it is
-CO2_Production_Rate_Electricity = CO2_Output_Electricity * Pounds_In_Ton / kWh_In_MWh
+#This is a float if Vary_CO2_Elec == False and an array of the 8760 hourly factors for ClimateZone if it is
 if Vary_CO2_Elec == True:
-    CO2_Production_Rate_Electricity = CO2_Production_Rate_Electricity.rename_axis('CZ' + str(ClimateZone) + \
-    'Electricity Long-Run Carbon Emission Factors (lb/kWh)')
+    CO2_Production_Rate_Electricity = read_co2_factors(Folder_CO2_Elec + os.sep + File_CO2_Elec, [ClimateZone])[ClimateZone]
 else:
-    CO2_Production_Rate_Electricity = pd.Series(data = CO2_Production_Rate_Electricity)
-    CO2_Production_Rate_Electricity.repeat(8760)
-    CO2_Production_Rate_Electricity.reset_index(inplace = True, drop = True)
+    CO2_Production_Rate_Electricity = CO2_Output_Electricity * Pounds_In_Ton / kWh_In_MWh
+
+#The CO2 and cost rates applied to the electricity consumed in each hour of the year. See Hourly_Rates
+Rates = HourlyRates({'CO2 Produced (lb)': CO2_Production_Rate_Electricity}, Start = Simulation_Start)
+if Prices is not None:
+    Rates.add('Electricity Cost ($)', Prices)
 
 #Calculating the thermal mass of the water in the storage tank
 ThermalMass_Tank = Volume_Tank * Density_Water * SpecificHeat_Water
@@ -133,130 +142,42 @@ Parameters = [Coefficient_JacketLoss, #0
 #The first step is putting the draw profile data into the right format (E.g. If it's CBECC data,
 # we need to convert from event-based to timestep-based)
 
-end_inputs = time.time()
-print('Reading inputs took {} seconds.'.format(end_inputs - ST))
-
-Draw_Profile = pd.read_csv(Path_DrawProfile) #Create a data frame called Draw_Profile containing the CBECC-Res information
-
-Draw_Profile['Day of Year (Day)'] = Draw_Profile['Day of Year (Day)'].astype(int) #make sure the days are in integer format, not float, as a sanity check on work below
-Unique_Days = Draw_Profile['Day of Year (Day)'].unique() #Identifies the number of unique days included in the draw profile
-Continuous_Index_Range_of_Days = range(Draw_Profile['Day of Year (Day)'].min(), \
-    Draw_Profile['Day of Year (Day)'].max() + 1) #outlines the full time coveraeofthe data (full days)
-Missing_Days = [x for x in range(Draw_Profile['Day of Year (Day)'].min(), \
-                Draw_Profile['Day of Year (Day)'].max() + 1) if x not in Unique_Days] #identifies the specific days missing
-
-#This code creates a dataframe covering the full continuous range of draw profiles with whatever timesteps are specified and converts the CBECC-Res draw profiles into that format
-Index_Model= int(len(Continuous_Index_Range_of_Days) * Hours_In_Day * Minutes_In_Hour / Timestep) #Identifies the number of timestep bins covered in the draw profile
-Model = pd.DataFrame(index = range(Index_Model)) #Creates a data frame with 1 row for each bin in the draw profile
-Model['Time (min)'] = Model.index * Timestep #Create a column in the data frame giving the time at the beginning of each timestep bin
-
-Model['Hot Water Draw Volume (gal)'] = 0 #Set the default data for hot water draw volume in each time step to 0. This value will later be edited as specific flow volumes for each time step are calculated
-Model['Inlet Water Temperature (deg F)'] = 0 #initialize the inlet temperature column with all 0's, to be filled in below
-First_Day = Draw_Profile.loc[0, 'Day of Year (Day)'] #Identifies the day (In integer relative to 365 form, not date form) of the first day of the draw profile
-Draw_Profile['Start Time of Profile (min)'] = Draw_Profile['Start time (hr)'] * Minutes_In_Hour + \
-    (Draw_Profile['Day of Year (Day)'] - First_Day) * Hours_In_Day * Minutes_In_Hour #Identifies the starting time of each hot water draw in Draw_Profile relative to first day of draw used
-Draw_Profile['End Time of Profile (min)'] = Draw_Profile['Start time (hr)'] * Minutes_In_Hour + \
-    Draw_Profile['Duration (min)'] + (Draw_Profile['Day of Year (Day)'] - First_Day) * Hours_In_Day * \
-    Minutes_In_Hour #Identifies the ending time of each hot water draw in Draw_Profile relative to first day of draw used
-
-for i in Draw_Profile.index: #Iterates through each draw in Draw_Profile
-    Start_Time = Draw_Profile.loc[i, 'Start Time of Profile (min)'] #Reads the time when the draw starts
-    End_Time = Draw_Profile.loc[i, 'End Time of Profile (min)'] #Reads the time when the draw ends
-    Flow_Rate = Draw_Profile.loc[i, 'Hot Water Flow Rate (gpm)'] #Reads the hot water flow rate of the draw and stores it in the variable Flow_Rate
-    Duration = Draw_Profile.loc[i, 'Duration (min)'] #Reads the duration of the draw and stores it in the variable Duration
-    Water_Quantity = Flow_Rate * Duration #total draw volume is flowrate times duration
-
-    Bin_Start = int(np.floor(Start_Time/Timestep)) #finds the model timestep bin when the draw starts, 0 indexed
-    Time_First_Bin = (Bin_Start+1) * Timestep - Start_Time #first pass at flow time of draw in first bin
-    if Time_First_Bin > Duration:
-        Time_First_Bin = Duration #if the draw only occurs in one bin, the time at the given flow rate is limited to the total draw time.
-
-    bin_count = 0
-    while Water_Quantity > 0: #dump out water until the draw is used up
-        if bin_count == 0:
-            Water_Dumped = Flow_Rate * Time_First_Bin
-            Model.loc[Bin_Start, 'Hot Water Draw Volume (gal)'] += Water_Dumped  #Add the volume within the first covered bin
-            Water_Quantity -= Water_Dumped #keep track of water remaining
-            bin_count += 1 #keep track of correct bin to put water in
-        else:
-            if Water_Quantity >= Flow_Rate * Timestep: #if there is enough water left to flow for more than a whole timestep bin
-                Water_Dumped = Flow_Rate * Timestep
-                Model.loc[Bin_Start + bin_count, 'Hot Water Draw Volume (gal)'] += Water_Dumped  #Add the volume to the next bin
-            else:
-                Water_Dumped = Water_Quantity
-                Model.loc[Bin_Start + bin_count, 'Hot Water Draw Volume (gal)'] += Water_Dumped  #dump the remainder of the water into the final bin
-            bin_count += 1 #keep track of correct bin to put water in
-            Water_Quantity -= Water_Dumped #keep track of water remaining
-
-    if vary_inlet_temp == True:
-        This_Inlet_Temperature = Draw_Profile.loc[i, 'Mains Temperature (deg F)'] #get inlet water temperature from profile
-        for i in range(bin_count):
-            Model.loc[Bin_Start+i, 'Inlet Water Temperature (deg F)'] = This_Inlet_Temperature
-
-end_profile = time.time()
-print('Draw profile creation took {} seconds.'.format(end_profile - end_inputs))
-
-#fill in remaining values for mains temperature:
-if vary_inlet_temp == True:
-    Model['Inlet Water Temperature (deg F)'] = Model['Inlet Water Temperature (deg F)'].replace(to_replace=0, \
-          method='ffill') #forward fill method - uses closed previous non-zero value
-    Model['Inlet Water Temperature (deg F)'] = Model['Inlet Water Temperature (deg F)'].replace(to_replace=0, \
-          method='bfill') #backward fill method - uses closest subsequent non-zero value
-else: #(vary_inlet_temp == False)
-    Model['Inlet Water Temperature (deg F)'] = Temperature_Water_Inlet #Sets the inlet temperature in the model equal to the value specified in INPUTS. This value could be replaced with a series of value
-
-Model['Inlet Water Temperature (deg C)'] = (Model['Inlet Water Temperature (deg F)'] - 32)/1.8 #Convert inlet water temperature to deg C
-del Model['Inlet Water Temperature (deg F)']
-
-Model['Hot Water Draw Volume (L)'] = Model['Hot Water Draw Volume (gal)'] * 3.87541 #Convert hot water draw volume data from gal to L
-del Model['Hot Water Draw Volume (gal)']
-
-end_inlet = time.time()
-print('Calculating the varying inlet temperature took {} seconds.'.format(end_inlet - end_profile))
-
-Model['Ambient Temperature (deg C)'] = Temperature_Ambient #Sets the ambient temperature in the model equal to the value specified in INPUTS. This value could be replaced with a series of values
-Model = get_temperatures(Model, Installation_Configuration)
-
-# Initializes a bunch of values at either 0 or initial temperature. They will be overwritten later as needed
-Model['Tank Temperature (deg C)'] = 0
-Model.loc[0, 'Tank Temperature (deg C)'] = Temperature_Tank_Initial
-Model.loc[1, 'Tank Temperature (deg C)'] = Temperature_Tank_Initial
-Model['Jacket Losses (J)'] = 0
-Model['Energy Withdrawn (J)'] = 0
-Model['Energy Added Backup (J)'] = 0
-Model['Energy Added Heat Pump (J)'] = 0
-Model['Energy Added Total (J)'] = 0
-Model['COP'] = 0
-Model['COP Adjust Tamb'] = 0 # Adjustment for the COP based on how T_Amb differs from 67.5 deg C
-Model['Total Energy Change (J)'] = 0
-Model['Timestep (min)'] = Timestep
-Model['Hour of Year (hr)'] = (Model['Time (min)']/60).astype(int)
-Model['Electricity CO2 Multiplier (lb/kWh)'] = 0
-
-Model['Time Elapsed (timedelta)'] = pd.to_timedelta(Model['Time (min)'], unit = 'm')
-Model['Timestamp'] = Model['Time Elapsed (timedelta)'] + Simulation_Start
-Model['Hour'] = pd.DatetimeIndex(Model['Timestamp']).hour
-Model['Weekday?'] = Model['Timestamp'].dt.weekday
-Model['Weekday?'] = Model['Weekday?'] < 5
-
-Model['Hour'] = Model['Hour'].astype(str)
-Model['Set Temperature (deg C)'] = Model['Hour'].map(Temperature_Tank_Set)
-if Shift_On_Weekends == False:
-    Model.loc[Model['Weekday?'] == False, 'Set Temperature (deg C)'] = Temperature_Tank_Set['0']
-
-Model['Temperature Activation Backup (deg C)'] = Model['Set Temperature (deg C)'] - Threshold_Activation_Backup #Set the activation temperature for the backup resistance element equal to the set temperature minus an additional delta before the resistance element engages
-
-end_initialization = time.time()
-print('Initializing the model took {} seconds.'.format(end_initialization - end_inlet))
+Run.checkpoint('Reading inputs')
+
+#Reads the CBECC-Res draw profile, converts the event-based draws into hot water volume and inlet temperature in each
+#timestep bin, fills in remaining values for mains temperature and converts to SI units. When Folder_Cache_DrawProfiles
+#is set, repeat runs with the same file and settings read the result from the cache instead
+Model = get_draw_profile(Path_DrawProfile, Timestep, vary_inlet_temp, Temperature_Water_Inlet,
+                         Folder_Cache_DrawProfiles)
+
+Run.checkpoint('Draw profile creation', len(Model))
+
+Model = initialize_model(Model, Timestep, Simulation_Start, Temperature_Tank_Set, Temperature_Ambient,
+                         Installation_Configuration, Temperature_Tank_Initial, Threshold_Activation_Backup,
+                         Shift_On_Weekends)
+
+Run.checkpoint('Initializing the model', len(Model))
 
 #The following code simulates the performance of the gas HPWH
-Model = HPWH.Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Adjust_Tamb)
+if Integrator == 'event':
+    Model = HPWH.Model_HPWH_MixedTank_EventDriven(Model, Parameters, Regression_COP, Regression_COP_Adjust_Tamb)
+else:
+    Model = HPWH.Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Adjust_Tamb, \
+                                      backend = Model_Backend, integrator = Integrator, counters = Run.Counters)
+
+Run.checkpoint('Simulating', len(Model))
+print('Model counters: {}'.format(Run.Counters))
 
-end_simulation = time.time()
-print('Simulating took {} seconds.'.format(end_simulation - end_initialization))
+Model['Electricity CO2 Multiplier (lb/kWh)'] = Rates.rates(Model)[0]
+Model = Rates.add_columns(Model)
+print('Totals: {}'.format(Rates.totals(Model).to_dict()))
+if Learn_Occupant_Behavior == True:
+    Model = learn(Model, Peak_Start = Peak_Start, Peak_End = Peak_End)
+    Run.checkpoint('Learning occupant behavior', len(Model))
 
 #%%--------------------------WRITE RESULTS TO FILE-----------------------------------------
-Model.to_csv(Path_Output, index = False) #Save the model to the declared file.
+save_output(Model, Path_Output, Output_Columns, Output_Downcast) #Save the model to the declared file.
 
-ET = time.time() #begin to time the script
-print('Saving results took {0} seconds'.format((ET - end_simulation)))
+Run.checkpoint('Saving results', len(Model))
+if Path_Instrumentation is not None:
+    Run.save(Path_Instrumentation)
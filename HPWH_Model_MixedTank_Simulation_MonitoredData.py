@@ -47,13 +47,16 @@ import numpy as np
 from bokeh.plotting import figure, output_file, save, gridplot
 from bokeh.models import LassoSelectTool, WheelZoomTool, BoxZoomTool, ResetTool
 import os
-import time
 import HPWH_Model as HPWH
+from Calibration import calibrate_parameters
+from Monitored_Data import prepare_monitored_data, simulate_monitored_data_chunked, simulate_segments, Columns_Output
+from Output_Files import save_output
+from Plot_Decimation import decimate
 from Set_Temperature_Profiles import get_profile
-from Installation_Configuration import get_temperatures
+from Instrumentation import Instrumentation, print_phase
 
 #%%--------------------------HPWH PARAMETERS------------------------------
-Time_At_Start_Of_Simulation = time.time()
+Run = Instrumentation(Callback = print_phase, Trace_Memory = False) #Times each phase of the script and collects the model counters. Trace_Memory = True also measures the peak memory of each phase, but slows the script down. See Instrumentation
 #These inputs are a series of constants describing the conditions of the simulation. Many of them are overwritten with measurements
 #if Compare_To_MeasuredData = 1
 
@@ -96,26 +99,36 @@ cwd = os.getcwd()
 Path_DrawProfile = cwd + r'\Input\Creekside Data for 3D8C.csv'
 
 Filename = Path_DrawProfile.split('Input\\')[1]
-Path_Output = os.path.dirname(__file__) + os.sep + 'Output' + os.sep + 'Output_' + Filename
+Output_Format = '.csv' #Format of the results file: '.csv', '.npz', '.parquet', '.feather' or '' for a folder of .npy files. See Output_Files for details. Streaming (Chunk_Size) always writes .csv
+Output_Downcast = False #True saves float columns as float32, halving the file size
+Path_Output = os.path.splitext(os.path.dirname(__file__) + os.sep + 'Output' + os.sep + 'Output_' + Filename)[0] + Output_Format
+Path_Instrumentation = None #.json file to save the phase timings and model counters to. None only prints them
 
 print('Path_DrawProfile is {}'.format(Path_DrawProfile))
 print('Filename is {}'.format(Filename))
 print('Path_Output is {}'.format(Path_Output))
 
 Shift_On_Weekends = True # True if load shifting on weekends, false if not
+Model_Backend = 'auto' #Backend used for the timestep loop in HPWH_Model.Model_HPWH_MixedTank. See HPWH_Model for the options
+Chunk_Size = None #Number of rows of monitored data read and simulated at a time. None reads the whole file at once. Set it for data sets too large to fit in memory
+Calibrate_Parameters = False #True to replace Coefficient_JacketLoss, HeatAddition_HeatPump and Threshold_Activation_Backup with the values best matching the monitored data. See Calibration.py
 
 #Set this = 1 if you want to compare model predictions to measured data results. This is useful for model validation and error
 #checking. If you want to only input the draw profile and see what the data predicts, set this = 0. Note that =1 mode causes the
 #calculations to take much longer
 Compare_To_MeasuredData = 0
+Decimation = 'minmax' #Points plotted when Compare_To_MeasuredData = 1. 'minmax' or 'lttb' reduce each series to the plot's width, see Plot_Decimation. None plots every row. Use Time_Filtering to see a short window at full resolution
+Plot_Width = 1200 #Width of the validation plots, in pixels
 
 #Time filetering inputs. Use these if you want to look at a specified portion of the data set
 Time_Filtering = 0 #Tells the program that time filtering is active
 Start_Time = 35 #Hours
 End_Time = 90 #Hours
+Gap_Threshold = 5 #Minutes. Longer timesteps are flagged as data collection outages, starting a new 'Segment'
+Reinitialize_After_Outages = False #True re-initializes the tank at the measured temperature after every outage and simulates the segments in parallel. See Monitored_Data.simulate_segments
+Processes = 1 #Number of worker processes used when Reinitialize_After_Outages = True. 1 simulates the segments in this process. Larger values only work on Linux and Mac, because Windows starts the workers by re-running this script
 
-Reading_Inputs = time.time()
-print('Reading inputs takes {} seconds'.format(Reading_Inputs - Time_At_Start_Of_Simulation))
+Run.checkpoint('Reading inputs')
 
 #%%---------------CONSTANT DECLARATIONS AND CALCULATIONS-----------------------
 #Constants used in water-based calculations
@@ -152,8 +165,7 @@ Parameters = [Coefficient_JacketLoss, #0
                 COP_Adjust_Reference_Temperature, #6
                 Cutoff_Temperature] #7
 
-Constant_Declarations = time.time()
-print('Declaring constants takes {} seconds'.format(Constant_Declarations - Reading_Inputs))
+Run.checkpoint('Declaring constants')
 
 #%%--------------------------MODELING-----------------------------------------
 
@@ -165,123 +177,71 @@ Coefficients_COP_Derate_Tamb = [Coefficient_2ndOrder_COP_Adjust_Tamb, Coefficien
                                 Constant_COP_Adjust_Tamb] #combines the coefficient and the constant into an array
 Regression_COP_Derate_Tamb = np.poly1d(Coefficients_COP_Derate_Tamb) #Creates a 1-d linear regression stating the COP of the heat pump as a function of the temperature of water in the tank
 
-Draw_Profile = pd.read_csv(Path_DrawProfile, index_col = 0) #Reads the input data, setting the first row (measurement name) of the .csv file as the header
-Draw_Profile['Timestamp'] = Draw_Profile.index
-Draw_Profile.index = pd.to_datetime(Draw_Profile.index)
-Draw_Profile['Time (s)'] = (Draw_Profile.index - Draw_Profile.index[0]).total_seconds()
-Draw_Profile['Time (min)'] = Draw_Profile['Time (s)'] / 60.
-Draw_Profile['Hour'] = pd.DatetimeIndex(Draw_Profile['Timestamp']).hour
-
-Model = Draw_Profile[['Timestamp', 'Time (s)', 'Time (min)', 'Hour', 'Power_PowerSum_W', 'Power_EnergySum_kWh', 
-                      'Water_FlowRate_gpm', 'Water_FlowTotal_gal', 'Water_FlowTemp_F', 'Water_RemoteTemp_F', 
-                      'T_Setpoint_F', 'T_Ambient_EcoNet_F', 'T_Cabinet_F', 'T_TankUpper_F', 'T_TankLower_F',
-                      ]].copy() 
-Model = Model.fillna(method='ffill') #Fills empty cells by projecting the most recent reading forward to the next reading
-Model = Model.fillna(method='bfill') #Fills empty cells by copying the following reading into these cells. Note that this only happens for cells at the start of the data set because all other cells were filled by the previous line
-#Model = Model.drop([0, 1]) #This line removes the first x (As defined by user) lines of code from the dataframe. It can be used if there are issues with the first few rows
-#These two lines of code can be used to force data points to exist if no monitored data is available. Use with caution as this will introduce errors into the calculations!
-#Model['T_TankUpper_F'] = 125
-#Model['T_TankLower_F'] = 125
-
-Model['Time (hr)'] = Model['Time (min)'] / Minutes_In_Hour #Creates new column representing the simulation time in hours instead of minutes
-
-#This filter is ONLY for working with Creekside, 3FCA data. Comment out and/or delete as needed
-if Time_Filtering == 1:
-    Model = Model[Model['Time (hr)'] > Start_Time]
-    Model = Model[Model['Time (hr)'] < End_Time]
-
-#These lines calculate the time change between two rows in the data set and calculate the timestep for use in calculations
-Model['Time shifted (min)'] = Model['Time (min)'].shift(1)
-Model['Time shifted (min)'].iloc[0] = Model['Time (min)'].iloc[0]
-Model['Timestep (min)'] =  Model['Time (min)'] - Model['Time shifted (min)']
-Model = Model[Model['Timestep (min)'] != 0]
-Model = Model.reset_index() #Do not delete this when removing the Creekside, 3FCA filter
-del Model['index'] #Do not delete this when removing the Creekside, 3FCA filter
-
-Model['Water_FlowRate_LPerMin'] = Model['Water_FlowRate_gpm'] * Liters_In_Gallon #Creates a new column representing the measured water flow rate, converted from gal/min to L/min
-Model['Water_FlowTotal_L'] = Model['Water_FlowTotal_gal'] * Liters_In_Gallon #Creates a new column representing the total measured water flow, converted from gal to L
-Model['Water_FlowTemp_C'] = (Model['Water_FlowTemp_F']-32) * 1/K_To_F_MagnitudeOnly #Creates a new column representing the outlet water temperature, converted from F to C
-Model['Water_RemoteTemp_C'] = (Model['Water_RemoteTemp_F']-32) * 1/K_To_F_MagnitudeOnly #Creates a new column representing the inlet water temperature, converted from F to C
-Model['Set Temperature (deg C)'] = (Model['T_Setpoint_F']-32) * 1/K_To_F_MagnitudeOnly #Create a column in the model representing the user-supplied, possibly varying, set temperature in deg C. If Variable_Set_Temperature == 1 this will be the set temperature used in the model
-Model['Power_EnergySum_kWh'] = Model['Power_EnergySum_kWh'] - Model.loc[0, 'Power_EnergySum_kWh'] #Resets the cumulative electricity consumption column to use 0 as the value at the start of the monitoring period
-Model['T_Ambient_EcoNet_C'] = (Model['T_Ambient_EcoNet_F']-32) * 1/K_To_F_MagnitudeOnly #Creates a new column representing the ambient temperature, converted from F to C
-Model['T_Cabinet_C'] = (Model['T_Cabinet_F']-32) * 1/K_To_F_MagnitudeOnly #Creates a new column representing the air temperature in the cabinet, converted from F to C
-Model['T_Tank_Upper_C'] = (Model['T_TankUpper_F']-32) * 1/K_To_F_MagnitudeOnly #Creates a new column representing the water temperature reported by the upper thermostat in the tank, converted from F to C
-Model['T_Tank_Lower_C'] = (Model['T_TankLower_F']-32) * 1/K_To_F_MagnitudeOnly #Creates a new column representing the water temperature reported by the lower thermostat in the tank, converted from F to C
-Model['Timestamp'] = pd.to_datetime(Model['Timestamp'])
-
-if Set_Temperature_Model == 'Simulated': #If the user has opted to use an assumed set temperature
-    Model['Hour'] = Model['Hour'].astype(str)
-    Model['Set Temperature (deg C)'] = Model['Hour'].map(Temperature_Tank_Set)
-    Model['Weekday?'] = Model['Timestamp'].dt.weekday
-    Model['Weekday?'] = Model['Weekday?'] < 5
-    if Shift_On_Weekends == False:
-        Model.loc[Model['Weekday?'] == False, 'Set Temperature (deg C)'] = Temperature_Tank_Set['0']
-
-Model['Temperature Activation Backup (deg C)'] = Model['Set Temperature (deg C)'] - Threshold_Activation_Backup #Set the activation temperature for the backup resistance element equal to the set temperature minus an additional delta before the resistance element engages
-
-Preparing_Inputs = time.time()
-print('Preparing inputs takes {} seconds'.format(Preparing_Inputs - Constant_Declarations))
-
-#Fill the model dataframe with 0s so the cells are filled. Also specify specific initial values for a few specific cells, as initial values are available
-Model['Tank Temperature (deg C)'] = 0 #Creates a row for the temperature of water in the tank, all cells set to 0 deg C
-Model.loc[0, 'Tank Temperature (deg C)'] = Temperature_Tank_Initial #Sets the first row of water temperature to the user-specified initial water temperature
-Model.loc[1, 'Tank Temperature (deg C)'] = Temperature_Tank_Initial #Sets the second row of water temperature to the user-specified initial water temperature
-Model['Jacket Losses (J)'] = 0 #Creates a column for the jacket losses and sets all cells equal to 0 J
-Model['Energy Withdrawn (J)'] = 0 #Creates a column for the energy withdrawn from the tank and sets all cells equal to 0 J
-Model['Energy Added Backup (J)'] = 0 #Creates a column for the energy provided by the backup electric resistance elements and sets all cells to 0 J
-Model['Energy Added Heat Pump (J)'] = 0 #Creates a column for the energy added by the heat pump and sets all cells to 0 J
-Model['Energy Added Total (J)'] = 0 #Creates a column for the energy added by all sources and sets all cells to 0 J
-Model['COP'] = 0 #Creates a column representing the calculated coefficient of performance of the heat pump and sets all cells to 0 J
-Model['Total Energy Change (J)'] = 0 #Creates a column representing the total energy change in the storage tank over each timestep and sets all cells to 0 J
-Model['COP Adjust Tamb'] = 0 # Adjustment for the COP based on how T_Amb differs from 67.5 deg C
-
-#Sets the following two parameters equal to the monitored data for the entire simulation
-Model['Ambient Temperature (deg C)'] = Model['T_Cabinet_C'] #Sets ambient temperature in the simulation model equal to the monitored temperature in the cabinet
-# Identify the impacts of the installation configuration
-Model = get_temperatures(Model, Installation_Configuration)
-Model['Inlet Water Temperature (deg C)'] = Model['Water_RemoteTemp_C'] #Set the inlet water temperature in the model equal to the monitored inlet water temperature
-
-#This section calculates the volume of hot water removed from the tank during
-#each timestep. First it creates a new column showing the cumulative water flow
-#shifted by one timestep and fills the initial value of that new column. Then
-#it creates another column equal to the difference between those two columns
-#and representing the volume of water withdrawn during each timestep. The final
-#line calculates the estimated hot water flow based on the calculated total
-#water draw volume and assumed hot water temperatures. See the comments at the
-#top for more comments about this
-Model['Water_FlowTotal_L shifted'] = Model['Water_FlowTotal_L'].shift(1)
-Model['Water_FlowTotal_L shifted'].iloc[0] = Model['Water_FlowTotal_L'].iloc[0]
-Model['Water Draw Volume (L)'] =  Model['Water_FlowTotal_L'] - Model['Water_FlowTotal_L shifted']
-Model['Hot Water Draw Volume (L)'] = (Model['Water Draw Volume (L)'] * Model['Water_RemoteTemp_C'] - 
-     Model['Water Draw Volume (L)'] * Temperature_MixingValve_Set) / (Model['Water_RemoteTemp_C'] - 
-     Model['T_Tank_Upper_C'])
-
-Model = HPWH.Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb) #Passes the data to the mixed tank HPWH simulation model
-
-Model['Timestamp'] = pd.to_datetime(Model['Timestamp'])
-Model = Model.set_index('Timestamp')
-
-Simulation_End = time.time() #Identify the time at the end of the simulation
-
-Simulated = Model['Electricity Consumed (kWh)'].sum()
-Measured = Model.loc[Model.index[-1], 'Power_EnergySum_kWh']
-PercentError = (Simulated - Measured) / Measured * 100
-
-print('Simulation time is {} seconds'.format(Simulation_End - Preparing_Inputs)) #Print the total time elapsed during the simulation for diagnostic purposes
-
-Model_Reduced = Model[['Time (s)', 'Timestep (min)', 'Set Temperature (deg C)', 'Tank Temperature (deg C)', 
-                       'Energy Withdrawn (kWh)', 'Energy Added Total (kWh)', 'Ambient Temperature (deg C)', 
-                       'Inlet Water Temperature (deg C)', 'Water Draw Volume (L)', 
-                       'Hot Water Draw Volume (L)', 'Electricity Consumed (kWh)',
-                       'Energy Added Backup (kWh)', 'Energy Added Heat Pump (kWh)', 'Power_PowerSum_W', 'COP',
-                       'Power_EnergySum_kWh']]
+if Set_Temperature_Model == 'Monitored':
+    Temperature_Tank_Set = None #prepare_monitored_data reads the set temperature from the monitored data
+Time_Filter = (Start_Time, End_Time) if Time_Filtering == 1 else None #This filter is ONLY for working with Creekside, 3FCA data
+
+if Chunk_Size is None:
+    Draw_Profile = pd.read_csv(Path_DrawProfile, index_col = 0) #Reads the input data, setting the first row (measurement name) of the .csv file as the header
+    Model = prepare_monitored_data(Draw_Profile, {}, Temperature_Tank_Initial, Threshold_Activation_Backup,
+                                   Installation_Configuration, Temperature_MixingValve_Set, Temperature_Tank_Set,
+                                   Shift_On_Weekends, Time_Filter, Gap_Threshold,
+                                   Validation = Compare_To_MeasuredData == 1)
+
+    Run.checkpoint('Preparing inputs', len(Model))
+
+    if Calibrate_Parameters == True:
+        Calibration = calibrate_parameters(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb,
+                                           Threshold_Activation_Backup)
+        Coefficient_JacketLoss = Calibration['Parameters']['Coefficient_JacketLoss']
+        HeatAddition_HeatPump = Calibration['Parameters']['HeatAddition_HeatPump']
+        Threshold_Activation_Backup = Calibration['Parameters']['Threshold_Activation_Backup']
+        Parameters[0] = Coefficient_JacketLoss
+        Parameters[2] = HeatAddition_HeatPump
+        Model['Temperature Activation Backup (deg C)'] = Model['Set Temperature (deg C)'] - Threshold_Activation_Backup
+        print('Calibrated parameters are {}, with an energy error of {} % and a tank temperature RMSE of {} deg C'.format(
+            Calibration['Parameters'], Calibration['Energy Error (%)'], Calibration['Temperature RMSE (deg C)']))
+        Run.checkpoint('Calibrating parameters', len(Model))
+
+    if Reinitialize_After_Outages == True:
+        Model = simulate_segments(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, Processes,
+                                  Model_Backend, counters = Run.Counters)
+    else:
+        Model = HPWH.Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, 
+                                          backend = Model_Backend, counters = Run.Counters) #Passes the data to the mixed tank HPWH simulation model
+
+    Model['Timestamp'] = pd.to_datetime(Model['Timestamp'])
+    Model = Model.set_index('Timestamp')
+
+    Run.checkpoint('Simulation', len(Model))
+
+    Simulated = Model['Electricity Consumed (kWh)'].sum()
+    Measured = Model.loc[Model.index[-1], 'Power_EnergySum_kWh']
+
+    save_output(Model, Path_Output, Columns_Output, Output_Downcast) #Save the model to the declared file
+    Run.checkpoint('Saving results', len(Model))
+else: #Streaming mode. Each chunk is prepared, simulated and appended to Path_Output before the next one is read
+    Path_Output = os.path.splitext(Path_Output)[0] + '.csv'
+    if Calibrate_Parameters == True or Compare_To_MeasuredData == 1:
+        print('Calibration and validation plots need the whole data set in memory. They are skipped when Chunk_Size is set')
+        Calibrate_Parameters = False
+        Compare_To_MeasuredData = 0
+    if Reinitialize_After_Outages == True:
+        print('Re-initializing the tank after outages needs the whole data set in memory. It is skipped when Chunk_Size is set')
+    Summary = simulate_monitored_data_chunked(Path_DrawProfile, Path_Output, Chunk_Size, Parameters, Regression_COP,
+                                              Regression_COP_Derate_Tamb, Temperature_Tank_Initial,
+                                              Threshold_Activation_Backup, Installation_Configuration,
+                                              Temperature_MixingValve_Set, Temperature_Tank_Set, Shift_On_Weekends,
+                                              Time_Filter, Model_Backend, Run.Counters,
+                                              Gap_Threshold = Gap_Threshold)
+    Simulated = Summary['Simulated']
+    Measured = Summary['Measured']
+    Run.checkpoint('Preparing inputs, simulating and saving results in {} chunks'.format(Summary['Chunks']),
+                   Summary['Rows'])
 
-Model_Reduced.to_csv(Path_Output) #Save the model to the declared file
+PercentError = (Simulated - Measured) / Measured * 100
 print('Results saved to {}'.format(Path_Output))
-
-Saving_Results = time.time()
-print('Saving results takes {} seconds'.format(Saving_Results - Simulation_End))
+print('Model counters: {}'.format(Run.Counters))
 print('PercentError is {}'.format(PercentError))
 
 #%%--------------------------MODEL COMPARISON-----------------------------------------
@@ -296,11 +256,11 @@ if Compare_To_MeasuredData == 1:
     tools = [LassoSelectTool(), WheelZoomTool(), BoxZoomTool(), ResetTool()]    
     
     #The rest of the code creates and saves plots comparing the HPWH model to the monitored data. Detailed comments will not be provided.
-    p1 = figure(width=1200, height= 600, x_axis_label='Time (hr)', y_axis_label = 'Electric Power (W)', tools = tools)
+    p1 = figure(width=Plot_Width, height= 600, x_axis_label='Time (hr)', y_axis_label = 'Electric Power (W)', tools = tools)
     p1.title.text_font_size = '12pt'
-    p1.line(x = Model['Time (hr)'], y = Model['Electric Power (W)'], legend = 'Model', color = 'red')
-    p1.circle(x = Model['Time (hr)'], y = Model['Power_PowerSum_W'], legend = 'Data', color = 'blue')   
-    p1.circle(x = Model['Time (hr)'], y = Model['Set Temperature (deg C)'], legend = 'Set Temperature', color = 'orange')
+    p1.line(**decimate(Model, 'Time (hr)', 'Electric Power (W)', Plot_Width, Decimation), legend = 'Model', color = 'red')
+    p1.circle(**decimate(Model, 'Time (hr)', 'Power_PowerSum_W', Plot_Width, Decimation), legend = 'Data', color = 'blue')   
+    p1.circle(**decimate(Model, 'Time (hr)', 'Set Temperature (deg C)', Plot_Width, Decimation), legend = 'Set Temperature', color = 'orange')
     p1.legend.label_text_font_size = '18pt'
     p1.legend.location = 'bottom_right'
     p1.xaxis.axis_label_text_font_size = '18pt'
@@ -308,21 +268,21 @@ if Compare_To_MeasuredData == 1:
     p1.xaxis.major_label_text_font_size = '12pt'
     p1.yaxis.major_label_text_font_size = '12pt'
 
-    p2 = figure(width=1200, height= 600, x_axis_label='Time (hr)', y_axis_label = 
+    p2 = figure(width=Plot_Width, height= 600, x_axis_label='Time (hr)', y_axis_label = 
                 'Cumulative Electricity Consumption (kWh)', tools = tools)
     p2.title.text_font_size = '12pt'
-    p2.line(x = Model['Time (hr)'], y = Model['Total Electricity Consumption (kWh)'], legend = 'Model', 
+    p2.line(**decimate(Model, 'Time (hr)', 'Total Electricity Consumption (kWh)', Plot_Width, Decimation), legend = 'Model', 
                       color = 'red')
-    p2.circle(x = Model['Time (hr)'], y = Model['Power_EnergySum_kWh'], legend = 'Data', color = 'blue')    
+    p2.circle(**decimate(Model, 'Time (hr)', 'Power_EnergySum_kWh', Plot_Width, Decimation), legend = 'Data', color = 'blue')    
 
-    p3 = figure(width=1200, height= 600, x_axis_label='Time (hr)', y_axis_label = 'Water Temperature (deg C)', 
+    p3 = figure(width=Plot_Width, height= 600, x_axis_label='Time (hr)', y_axis_label = 'Water Temperature (deg C)', 
                 tools = tools)
     p3.title.text_font_size = '12pt'
-    p3.line(x = Model['Time (hr)'], y = Model['Tank Temperature (deg C)'], legend = 'Model, Tank Average', 
+    p3.line(**decimate(Model, 'Time (hr)', 'Tank Temperature (deg C)', Plot_Width, Decimation), legend = 'Model, Tank Average', 
                       color = 'red')
-    p3.circle(x = Model['Time (hr)'], y = Model['T_Tank_Upper_C'], legend = 'Data, Upper', color = 'blue') 
-    p3.circle(x = Model['Time (hr)'], y = Model['T_Tank_Lower_C'], legend = 'Data, Lower', color = 'purple') 
-    p3.circle(x = Model['Time (hr)'], y = Model['Set Temperature (deg C)'], legend = 'Set Temperature', 
+    p3.circle(**decimate(Model, 'Time (hr)', 'T_Tank_Upper_C', Plot_Width, Decimation), legend = 'Data, Upper', color = 'blue') 
+    p3.circle(**decimate(Model, 'Time (hr)', 'T_Tank_Lower_C', Plot_Width, Decimation), legend = 'Data, Lower', color = 'purple') 
+    p3.circle(**decimate(Model, 'Time (hr)', 'Set Temperature (deg C)', Plot_Width, Decimation), legend = 'Set Temperature', 
                         color = 'orange')
     p3.legend.label_text_font_size = '18pt'
     p3.legend.location = 'bottom_right'
@@ -331,41 +291,41 @@ if Compare_To_MeasuredData == 1:
     p3.xaxis.major_label_text_font_size = '12pt'
     p3.yaxis.major_label_text_font_size = '12pt'    
 
-#    p4 = figure(width=1200, height= 600, x_axis_label='Time (hr)', y_axis_label = 
-#                'Cumulative Water Consumption (L)', tools = tools)
-#    p4.title.text_font_size = '12pt'
-#    p4.circle(x = Model['Time (hr)'], y = Model['Water_FlowTotal_L'], legend = 'Water', color = 'blue') 
-#
-#    p5 = figure(width=1200, height= 600, x_axis_label='Time (hr)', y_axis_label = 
-#                'Water Consumption Each Timestep (L)', tools = tools)
-#    p5.title.text_font_size = '12pt'
-#    p5.circle(x = Model['Time (hr)'], y = Model['Water Draw Volume (L)'], legend = 'From MV', color = 'blue') 
-#    p5.circle(x = Model['Time (hr)'], y = Model['Hot Water Draw Volume (L)'], legend = 
-#                        'From WH - Calculated', color = 'red') 
-#
-#    p6 = figure(width=1200, height= 600, x_axis_label='Time (hr)', y_axis_label = 
-#                'Water Temperatures (deg C)', tools = tools)
-#    p6.title.text_font_size = '12pt'
-#    p6.circle(x = Model['Time (hr)'], y = Model['T_Tank_Upper_C'], legend = 'T_Tank_Upper_C', color = 'red') 
-#    p6.circle(x = Model['Time (hr)'], y = Model['Water_FlowTemp_C'], legend = 'Water_FlowTemp_C', 
-#                        color = 'purple') 
-#    p6.circle(x = Model['Time (hr)'], y = Model['Water_RemoteTemp_C'], legend = 'Water_RemoteTemp_C', 
-#                        color = 'blue') 
-#
-#    p7 = figure(width=1200, height= 600, x_axis_label='Time (hr)', y_axis_label = 
-#                'Monitored Ambient Temperature (deg C)', tools = tools)
-#    p7.title.text_font_size = '12pt'
-#    p7.circle(x = Model['Time (hr)'], y = Model['T_Cabinet_C'], legend = 'T_Cabinet_C', color = 'blue') 
-#    p7.circle(x = Model['Time (hr)'], y = Model['T_Ambient_EcoNet_C'], legend = 'T_Ambient_EcoNet_C', 
-#                        color = 'red') 
-#
-#    p8 = figure(width=1200, height= 600, x_axis_label='Time (hr)', y_axis_label = 
-#                'Error in Electricity Consumption (%)', tools = tools)
-#    p8.title.text_font_size = '12pt'
-#    p8.circle(x = Model['Time (hr)'], y = Model['Cumulative Percent Error (%)'], legend = 'Error', 
-#                        color = 'black') 
-
-    p = gridplot([[p1],[p2],[p3]])#,[p4],[p5],[p6],[p7], [p8]])
+    p4 = figure(width=Plot_Width, height= 600, x_axis_label='Time (hr)', y_axis_label = 
+                'Cumulative Water Consumption (L)', tools = tools)
+    p4.title.text_font_size = '12pt'
+    p4.circle(**decimate(Model, 'Time (hr)', 'Water_FlowTotal_L', Plot_Width, Decimation), legend = 'Water', color = 'blue') 
+
+    p5 = figure(width=Plot_Width, height= 600, x_axis_label='Time (hr)', y_axis_label = 
+                'Water Consumption Each Timestep (L)', tools = tools)
+    p5.title.text_font_size = '12pt'
+    p5.circle(**decimate(Model, 'Time (hr)', 'Water Draw Volume (L)', Plot_Width, Decimation), legend = 'From MV', color = 'blue') 
+    p5.circle(**decimate(Model, 'Time (hr)', 'Hot Water Draw Volume (L)', Plot_Width, Decimation), legend = 
+                        'From WH - Calculated', color = 'red') 
+
+    p6 = figure(width=Plot_Width, height= 600, x_axis_label='Time (hr)', y_axis_label = 
+                'Water Temperatures (deg C)', tools = tools)
+    p6.title.text_font_size = '12pt'
+    p6.circle(**decimate(Model, 'Time (hr)', 'T_Tank_Upper_C', Plot_Width, Decimation), legend = 'T_Tank_Upper_C', color = 'red') 
+    p6.circle(**decimate(Model, 'Time (hr)', 'Water_FlowTemp_C', Plot_Width, Decimation), legend = 'Water_FlowTemp_C', 
+                        color = 'purple') 
+    p6.circle(**decimate(Model, 'Time (hr)', 'Water_RemoteTemp_C', Plot_Width, Decimation), legend = 'Water_RemoteTemp_C', 
+                        color = 'blue') 
+
+    p7 = figure(width=Plot_Width, height= 600, x_axis_label='Time (hr)', y_axis_label = 
+                'Monitored Ambient Temperature (deg C)', tools = tools)
+    p7.title.text_font_size = '12pt'
+    p7.circle(**decimate(Model, 'Time (hr)', 'T_Cabinet_C', Plot_Width, Decimation), legend = 'T_Cabinet_C', color = 'blue') 
+    p7.circle(**decimate(Model, 'Time (hr)', 'T_Ambient_EcoNet_C', Plot_Width, Decimation), legend = 'T_Ambient_EcoNet_C', 
+                        color = 'red') 
+
+    p8 = figure(width=Plot_Width, height= 600, x_axis_label='Time (hr)', y_axis_label = 
+                'Error in Electricity Consumption (%)', tools = tools)
+    p8.title.text_font_size = '12pt'
+    p8.circle(**decimate(Model, 'Time (hr)', 'Cumulative Percent Error (%)', Plot_Width, Decimation), legend = 'Error', 
+                        color = 'black') 
+
+    p = gridplot([[p1],[p2],[p3],[p4],[p5],[p6],[p7],[p8]])
     if Time_Filtering == 0:
         output_file(os.path.dirname(__file__) + os.sep + 'Validation Data\Validation Plots_' + 
                     Filename + '.html', title = 'Validation Data')
@@ -374,5 +334,7 @@ if Compare_To_MeasuredData == 1:
                     '_Start=' + str(Start_Time) + '_End=' + str(End_Time) + '.html', title = 'Validation Data')
     save(p)
 
-Validation_Results = time.time()
-print('Creating validation plots takes {} seconds'.format(Validation_Results - Saving_Results))
\ No newline at end of file
+    Run.checkpoint('Creating validation plots')
+
+if Path_Instrumentation is not None:
+    Run.save(Path_Instrumentation)
\ No newline at end of file
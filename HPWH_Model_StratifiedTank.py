@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 10:05:47 2026
+
+This module contains a stratified, multi-node model of a HPWH. It is the model described in the notes of
+HPWH_Model_ExternalHP.py: the tank is split into equal volume nodes, water is withdrawn from a user specified node,
+passed through the heat pump and returned to a second user specified node. Nodes are numbered from the bottom of the
+tank (node 0, where the cold inlet water enters) to the top (node Nodes - 1, where hot water is drawn).
+
+Each timestep is solved implicitly (backward Euler). Conduction between nodes, jacket losses, plug flow of the hot
+water draw, and the flow through the heat pump loop all enter a single linear system. Every node only exchanges heat
+with the nodes above and below it, except for the heat pump return node, which receives water from the draw-off node.
+The system is therefore tridiagonal plus one extra entry. It is solved in O(Nodes) time with the Thomas algorithm and a
+Sherman-Morrison correction for that extra entry. After the solve, any temperature inversions are removed by mixing
+the inverted nodes. The scheme is stable at any timestep and conserves energy.
+
+The node temperatures are kept in a (timesteps x Nodes) array instead of adding one column per node to the data frame.
+The data frame returned has the same columns as HPWH_Model.Model_HPWH_MixedTank, with 'Tank Temperature (deg C)'
+holding the average of the nodes, plus the outlet and heat pump inlet water temperatures.
+
+The control logic matches the mixed tank model. The heat pump uses the temperature of the thermostat node in place of
+the tank temperature, and the backup element uses the temperature of the node it is installed in. The COP is calculated from the temperature of the water delivered to the heat pump.
+"""
+
+import numpy as np
+import HPWH_Model as HPWH
+
+try: #numba is optional. When it is installed the timestep kernel below is compiled, otherwise it runs as plain Python
+    from numba import njit
+except ImportError:
+    njit = None
+
+Seconds_In_Minute = 60 #Conversion between minutes and seconds
+SpecificHeat_Water = 4.190 #J/g-C
+Density_Water = 1000 #g/L
+Conductivity_Water = 0.6 #W/m-K
+
+def Model_HPWH_StratifiedTank(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, Nodes = 12,
+                              Height_Tank = 1.5, Conductivity_Effective = Conductivity_Water,
+                              Node_ToHeatPump = 0, Node_FromHeatPump = None, Node_Thermostat = None,
+                              Node_Backup = None, FlowRate_Volumetric_CirculationPump = 15.1416, backend = 'auto'):
+    #Parameters is the same list used by HPWH_Model.Model_HPWH_MixedTank. The remaining inputs describe the tank:
+    #   Nodes - number of equal volume nodes
+    #   Height_Tank - m, height of the water column, used with the tank volume to find the conductance between nodes
+    #   Conductivity_Effective - W/m-K, conductivity between nodes. Increase it to account for conduction in the tank wall
+    #   Node_ToHeatPump - node from which water is delivered to the heat pump. Default is the bottom of the tank
+    #   Node_FromHeatPump - node to which heated water is returned. Default is the top of the tank. Set it equal to
+    #       Node_ToHeatPump to add the heat pump output directly to that node (E.g. A wrapped condenser)
+    #   Node_Thermostat - node read by the thermostat. Default is Node_ToHeatPump
+    #   Node_Backup - node holding the backup resistance element and its thermostat. Default is the top of the tank
+    #   FlowRate_Volumetric_CirculationPump - L/min, flow rate of the pump circulating water through the heat pump
+    #   backend - 'python', 'numba' or 'auto', as in HPWH_Model.Model_HPWH_MixedTank
+    #Returns the model data frame and a (timesteps x Nodes) array of node temperatures at the start of each timestep
+    Coefficient_JacketLoss = Parameters[0]
+    Power_Backup = Parameters[1]
+    HeatAddition_HeatPump = Parameters[2]
+    Temperature_Tank_Set_Deadband = Parameters[3]
+    ThermalMass_Tank = Parameters[4]
+    COP_Adjust_Reference_Temperature = Parameters[6]
+    Cutoff_Temperature = Parameters[7]
+
+    if Node_FromHeatPump is None:
+        Node_FromHeatPump = Nodes - 1
+    if Node_Thermostat is None:
+        Node_Thermostat = Node_ToHeatPump
+    if Node_Backup is None:
+        Node_Backup = Nodes - 1
+    for Node in [Node_ToHeatPump, Node_FromHeatPump, Node_Thermostat, Node_Backup]:
+        if not 0 <= Node < Nodes:
+            raise ValueError('Node {} is outside of the tank. Nodes are numbered 0 to {}'.format(Node, Nodes - 1))
+
+    Volume_Tank = ThermalMass_Tank / (Density_Water * SpecificHeat_Water) #L
+    Conductance_Node = Conductivity_Effective * (Volume_Tank / 1000 / Height_Tank) / (Height_Tank / Nodes) #W/K, k * A / dz between neighbouring nodes
+    CapacityRate_CirculationPump = FlowRate_Volumetric_CirculationPump / Seconds_In_Minute * Density_Water * \
+        SpecificHeat_Water #W/K
+
+    Temperature_Ambient, Timestep, Volume_Draw, Temperature_Inlet, Temperature_Set = \
+        [np.ascontiguousarray(Model[column].to_numpy(dtype = np.float64)) for column in HPWH.Kernel_Inputs]
+    Temperature_Activation_Backup = Model['Temperature Activation Backup (deg C)'].to_numpy(dtype = np.float64,
+                                                                                         copy = True)
+    Length = len(Model)
+    Node_Temperatures = np.zeros((Length, Nodes))
+    Node_Temperatures[:2] = Model['Tank Temperature (deg C)'].iloc[0]
+    Jacket_Losses, Energy_Added_Backup, Energy_Withdrawn, Energy_Added_HeatPump, Total_Energy_Change, \
+        Temperature_Outlet = [np.zeros(Length) for column in range(6)]
+
+    kernel = _get_kernel(backend)
+    kernel(Temperature_Ambient, Timestep, Volume_Draw, Temperature_Inlet, Temperature_Set,
+           Temperature_Activation_Backup, Node_Temperatures, Jacket_Losses, Energy_Added_Backup, Energy_Withdrawn,
+           Energy_Added_HeatPump, Total_Energy_Change, Temperature_Outlet, float(Coefficient_JacketLoss),
+           float(Power_Backup), float(HeatAddition_HeatPump), float(Temperature_Tank_Set_Deadband),
+           float(ThermalMass_Tank), float(Cutoff_Temperature), float(Conductance_Node),
+           float(CapacityRate_CirculationPump), Node_ToHeatPump, Node_FromHeatPump, Node_Thermostat, Node_Backup)
+
+    Model = Model.copy()
+    Model['Tank Temperature (deg C)'] = Node_Temperatures.mean(axis = 1)
+    Model['Outlet Water Temperature (deg C)'] = Temperature_Outlet
+    Model['Heat Pump Inlet Temperature (deg C)'] = Node_Temperatures[:, Node_ToHeatPump]
+    Model['Temperature Activation Backup (deg C)'] = Temperature_Activation_Backup
+    Model['Jacket Losses (J)'] = Jacket_Losses
+    Model['Energy Added Backup (J)'] = Energy_Added_Backup
+    Model['Energy Withdrawn (J)'] = Energy_Withdrawn
+    Model['Energy Added Heat Pump (J)'] = Energy_Added_HeatPump
+    Model['Total Energy Change (J)'] = Total_Energy_Change
+    Model = HPWH._calculate_outputs(Model, Regression_COP, Regression_COP_Derate_Tamb,
+                                    COP_Adjust_Reference_Temperature,
+                                    Temperature_COP = 'Heat Pump Inlet Temperature (deg C)')
+    return Model, Node_Temperatures
+
+def _stratified_tank_kernel(Temperature_Ambient, Timestep, Volume_Draw, Temperature_Inlet, Temperature_Set,
+                            Temperature_Activation_Backup, Node_Temperatures, Jacket_Losses, Energy_Added_Backup,
+                            Energy_Withdrawn, Energy_Added_HeatPump, Total_Energy_Change, Temperature_Outlet,
+                            Coefficient_JacketLoss, Power_Backup, HeatAddition_HeatPump,
+                            Temperature_Tank_Set_Deadband, ThermalMass_Tank, Cutoff_Temperature, Conductance_Node,
+                            CapacityRate_CirculationPump, Node_ToHeatPump, Node_FromHeatPump, Node_Thermostat,
+                            Node_Backup):
+    Nodes = Node_Temperatures.shape[1]
+    ThermalMass_Node = ThermalMass_Tank / Nodes
+    Coefficient_JacketLoss_Node = Coefficient_JacketLoss / Nodes
+    Lower = np.zeros(Nodes)
+    Diagonal = np.zeros(Nodes)
+    Upper = np.zeros(Nodes)
+    RightHandSide = np.zeros(Nodes)
+    Solution = np.zeros(Nodes)
+    Correction = np.zeros(Nodes)
+    Work = np.zeros(Nodes)
+    Block_Sum = np.zeros(Nodes)
+    Block_Count = np.zeros(Nodes, dtype = np.int64)
+    Temperature_Outlet[0] = Node_Temperatures[0, Nodes - 1]
+
+    for i in range(1, len(Timestep)):
+        Duration = Timestep[i] * Seconds_In_Minute
+        Temperature = Node_Temperatures[i]
+        Temperature_Outlet[i] = Temperature[Nodes - 1]
+        Temperature_Thermostat = Temperature[Node_Thermostat]
+        # 1 - Controls, based on the thermostat temperatures at the start of the timestep. Same logic as the mixed
+        #tank model
+        if Temperature_Ambient[i] < Cutoff_Temperature:
+            Temperature_Activation_Backup[i] = Temperature_Set[i] - Temperature_Tank_Set_Deadband
+        if Energy_Added_Backup[i-1] == 0:
+            Backup_Active = Temperature[Node_Backup] < Temperature_Activation_Backup[i]
+        else:
+            Backup_Active = Temperature[Node_Backup] < int(Temperature_Set[i])
+        if Temperature_Ambient[i] < Cutoff_Temperature:
+            HeatPump_Active = False
+        else:
+            HeatPump_Active = Temperature_Thermostat < (Temperature_Set[i] - Temperature_Tank_Set_Deadband) or \
+                Energy_Added_HeatPump[i-1] > 0 and Temperature_Thermostat < Temperature_Set[i]
+        Energy_Added_Backup[i] = Power_Backup * Duration if Backup_Active else 0.
+        Energy_Added_HeatPump[i] = HeatAddition_HeatPump * Duration if HeatPump_Active else 0.
+
+        # 2 - Build the implicit system. Every row is the energy balance on one node, in W/K
+        CapacityRate_Draw = Volume_Draw[i] * Density_Water * SpecificHeat_Water / Duration if Duration > 0 else 0.
+        Storage = ThermalMass_Node / Duration if Duration > 0 else 0.
+        for j in range(Nodes):
+            Lower[j] = 0.
+            Upper[j] = 0.
+            Diagonal[j] = Storage + Coefficient_JacketLoss_Node + CapacityRate_Draw
+            RightHandSide[j] = Storage * Temperature[j] + Coefficient_JacketLoss_Node * Temperature_Ambient[i]
+            if j > 0: #Conduction to the node below, and the draw pushing water up from it
+                Diagonal[j] += Conductance_Node
+                Lower[j] -= Conductance_Node + CapacityRate_Draw
+            if j < Nodes - 1: #Conduction to the node above
+                Diagonal[j] += Conductance_Node
+                Upper[j] -= Conductance_Node
+        RightHandSide[0] += CapacityRate_Draw * Temperature_Inlet[i] #Cold water enters the bottom node
+        if Backup_Active:
+            RightHandSide[Node_Backup] += Power_Backup
+        Coupling = 0.
+        if HeatPump_Active:
+            RightHandSide[Node_FromHeatPump] += HeatAddition_HeatPump
+            if Node_FromHeatPump != Node_ToHeatPump:
+                #Water flows from the return node toward the draw-off node inside the tank, and the return node
+                #receives the water leaving the draw-off node
+                if Node_FromHeatPump > Node_ToHeatPump:
+                    for j in range(Node_ToHeatPump, Node_FromHeatPump):
+                        Diagonal[j] += CapacityRate_CirculationPump
+                        Upper[j] -= CapacityRate_CirculationPump
+                else:
+                    for j in range(Node_FromHeatPump + 1, Node_ToHeatPump + 1):
+                        Diagonal[j] += CapacityRate_CirculationPump
+                        Lower[j] -= CapacityRate_CirculationPump
+                Diagonal[Node_FromHeatPump] += CapacityRate_CirculationPump
+                if Node_ToHeatPump == Node_FromHeatPump - 1:
+                    Lower[Node_FromHeatPump] -= CapacityRate_CirculationPump
+                elif Node_ToHeatPump == Node_FromHeatPump + 1:
+                    Upper[Node_FromHeatPump] -= CapacityRate_CirculationPump
+                else: #Off the tridiagonal band, handled with the Sherman-Morrison correction below
+                    Coupling = -CapacityRate_CirculationPump
+
+        # 3 - Solve for the node temperatures at the end of the timestep with the Thomas algorithm. When the heat
+        #pump return node is coupled to a node off the band, the same elimination also solves for the Sherman-Morrison
+        #correction, Correction = A^-1 * (Coupling at the return node)
+        Work[0] = Upper[0] / Diagonal[0]
+        Solution[0] = RightHandSide[0] / Diagonal[0]
+        Correction[0] = Coupling / Diagonal[0] if Node_FromHeatPump == 0 else 0.
+        for j in range(1, Nodes):
+            Denominator = Diagonal[j] - Lower[j] * Work[j-1]
+            Work[j] = Upper[j] / Denominator
+            Solution[j] = (RightHandSide[j] - Lower[j] * Solution[j-1]) / Denominator
+            Correction[j] = ((Coupling if j == Node_FromHeatPump else 0.) - Lower[j] * Correction[j-1]) / Denominator
+        for j in range(Nodes - 2, -1, -1):
+            Solution[j] -= Work[j] * Solution[j+1]
+            Correction[j] -= Work[j] * Correction[j+1]
+        if Coupling != 0.:
+            Factor = Solution[Node_ToHeatPump] / (1. + Correction[Node_ToHeatPump])
+            for j in range(Nodes):
+                Solution[j] -= Factor * Correction[j]
+
+        # 4 - Energy flows over the timestep, evaluated at the end of timestep temperatures as in the implicit solve
+        Jacket_Losses[i] = 0.
+        Energy_Change = 0.
+        for j in range(Nodes):
+            Jacket_Losses[i] -= Coefficient_JacketLoss_Node * (Solution[j] - Temperature_Ambient[i]) * Duration
+            Energy_Change += ThermalMass_Node * (Solution[j] - Temperature[j])
+        Energy_Withdrawn[i] = -Volume_Draw[i] * Density_Water * SpecificHeat_Water * (Solution[Nodes - 1] - \
+            Temperature_Inlet[i])
+        Total_Energy_Change[i] = Energy_Change
+
+        # 5 - Mix any node warmer than the node above it with that node, repeating until the tank is stably
+        #stratified. The nodes have equal mass so mixing averages their temperatures. Single pass, merging blocks
+        Blocks = 0
+        for j in range(Nodes):
+            Sum = Solution[j]
+            Count = 1
+            while Blocks > 0 and Block_Sum[Blocks-1] * Count > Sum * Block_Count[Blocks-1]:
+                Blocks -= 1
+                Sum += Block_Sum[Blocks]
+                Count += Block_Count[Blocks]
+            Block_Sum[Blocks] = Sum
+            Block_Count[Blocks] = Count
+            Blocks += 1
+        if i < len(Timestep) - 1: #Store the temperatures for the start of the next timestep
+            j = 0
+            for Block in range(Blocks):
+                for k in range(Block_Count[Block]):
+                    Node_Temperatures[i + 1, j] = Block_Sum[Block] / Block_Count[Block]
+                    j += 1
+
+if njit is not None:
+    _stratified_tank_kernel_compiled = njit(cache = True)(_stratified_tank_kernel)
+else:
+    _stratified_tank_kernel_compiled = None
+
+def _get_kernel(backend):
+    if backend == 'python':
+        return _stratified_tank_kernel
+    elif backend == 'numba':
+        if _stratified_tank_kernel_compiled is None:
+            raise ImportError("backend = 'numba' requires numba to be installed")
+        return _stratified_tank_kernel_compiled
+    elif backend == 'auto':
+        return _stratified_tank_kernel_compiled if _stratified_tank_kernel_compiled is not None else \
+            _stratified_tank_kernel
+    raise ValueError('Unknown backend {}. Use python, numba or auto'.format(backend))
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 18:47:12 2026
+
+This module holds MixedTankSimulator, a reusable version of HPWH_Model.Model_HPWH_MixedTank for code that simulates
+the same tank many times, such as optimizers and calibration. Model_HPWH_MixedTank takes a data frame, copies every
+column to arrays, and builds a new output data frame on every call. For short simulations that overhead costs more
+than the simulation itself.
+
+MixedTankSimulator is built once from a MixedTankParameters object, which names the entries of the positional
+Parameters list, and the COP regressions. It keeps one preallocated array for every input, state and output and reuses
+them on each call to run, as long as the length of the inputs does not change. run returns a dictionary of those
+arrays, keyed by the column names of Model_HPWH_MixedTank, with the same values Model_HPWH_MixedTank calculates. The
+arrays are overwritten by the next call to run, so copy any result that needs to be kept.
+"""
+
+import numpy as np
+import HPWH_Model as HPWH
+
+#Columns read by MixedTankSimulator.run
+Simulator_Inputs = HPWH.Kernel_Inputs + ['Temperature Activation Backup (deg C)', 'Air Inlet Temperature (deg C)']
+#Keys of the dictionary returned by MixedTankSimulator.run
+Simulator_Outputs = ['Tank Temperature (deg C)', 'Temperature Activation Backup (deg C)', 'Jacket Losses (kWh)',
+                     'Energy Added Backup (kWh)', 'Energy Withdrawn (kWh)', 'Energy Added Heat Pump (kWh)',
+                     'Total Energy Change (kWh)', 'Energy Added Total (kWh)', 'COP Adjust Tamb', 'COP',
+                     'Electric Power (W)', 'Electricity Consumed (kWh)']
+
+class MixedTankParameters:
+    #The HPWH parameters read by the mixed tank model, by name instead of by position in the Parameters list.
+    #from_list and to_list convert from and to the list passed to the HPWH_Model functions
+    __slots__ = ('Coefficient_JacketLoss', 'Power_Backup', 'HeatAddition_HeatPump', 'Temperature_Tank_Set_Deadband',
+                 'ThermalMass_Tank', 'CO2_Production_Rate_Electricity', 'COP_Adjust_Reference_Temperature',
+                 'Cutoff_Temperature')
+
+    def __init__(self, Coefficient_JacketLoss: float, Power_Backup: float, HeatAddition_HeatPump: float,
+                 Temperature_Tank_Set_Deadband: float, ThermalMass_Tank: float, COP_Adjust_Reference_Temperature: float,
+                 Cutoff_Temperature: float, CO2_Production_Rate_Electricity: float = 0.):
+        self.Coefficient_JacketLoss = float(Coefficient_JacketLoss) #W/K
+        self.Power_Backup = float(Power_Backup) #W
+        self.HeatAddition_HeatPump = float(HeatAddition_HeatPump) #W
+        self.Temperature_Tank_Set_Deadband = float(Temperature_Tank_Set_Deadband) #deg C
+        self.ThermalMass_Tank = float(ThermalMass_Tank) #J/K
+        self.CO2_Production_Rate_Electricity = float(CO2_Production_Rate_Electricity) #Not used by the model
+        self.COP_Adjust_Reference_Temperature = float(COP_Adjust_Reference_Temperature) #deg C
+        self.Cutoff_Temperature = float(Cutoff_Temperature) #deg C
+
+    @classmethod
+    def from_list(cls, Parameters):
+        return cls(Parameters[0], Parameters[1], Parameters[2], Parameters[3], Parameters[4], Parameters[6],
+                   Parameters[7], Parameters[5])
+
+    def to_list(self):
+        return [self.Coefficient_JacketLoss, self.Power_Backup, self.HeatAddition_HeatPump,
+                self.Temperature_Tank_Set_Deadband, self.ThermalMass_Tank, self.CO2_Production_Rate_Electricity,
+                self.COP_Adjust_Reference_Temperature, self.Cutoff_Temperature]
+
+    def __repr__(self):
+        return 'MixedTankParameters({})'.format(', '.join('{} = {}'.format(name, getattr(self, name))
+                                                          for name in self.__slots__))
+
+def _evaluate_polynomial(Coefficients, x, out):
+    #Evaluates a polynomial into out without allocating, in the same order of operations as np.polyval
+    out.fill(0)
+    for Coefficient in Coefficients:
+        out *= x
+        out += Coefficient
+    return out
+
+class MixedTankSimulator:
+    #Parameters is a MixedTankParameters object or the Parameters list used by HPWH_Model. Regression_COP and
+    #Regression_COP_Derate_Tamb are np.poly1d regressions, as passed to Model_HPWH_MixedTank. backend and integrator
+    #are the same as in Model_HPWH_MixedTank, except that 'legacy' is not available. Length optionally allocates the
+    #arrays for inputs of that length up front
+    __slots__ = ('Parameters', 'Coefficients_COP', 'Coefficients_COP_Derate_Tamb', 'Temperature_Tank_Initial',
+                 'Length', '_kernel', '_Constants', '_Inputs', '_States', '_Counters', '_Seconds', '_Scratch',
+                 '_Outputs')
+
+    def __init__(self, Parameters, Regression_COP, Regression_COP_Derate_Tamb, Temperature_Tank_Initial,
+                 backend = 'auto', integrator = 'euler', Length = 0):
+        if not isinstance(Parameters, MixedTankParameters):
+            Parameters = MixedTankParameters.from_list(Parameters)
+        self.Parameters = Parameters
+        self.Coefficients_COP = np.poly1d(Regression_COP).coeffs.tolist()
+        self.Coefficients_COP_Derate_Tamb = np.poly1d(Regression_COP_Derate_Tamb).coeffs.tolist()
+        self.Temperature_Tank_Initial = float(Temperature_Tank_Initial)
+        self._kernel = HPWH._get_kernel(backend, integrator)
+        self._Constants = (Parameters.Coefficient_JacketLoss, Parameters.Power_Backup, Parameters.HeatAddition_HeatPump,
+                           Parameters.Temperature_Tank_Set_Deadband, Parameters.ThermalMass_Tank,
+                           Parameters.Cutoff_Temperature)
+        self._Counters = np.zeros(len(HPWH.Counter_Names))
+        self.Length = -1
+        self._allocate(Length)
+
+    def _allocate(self, Length):
+        #Creates the arrays for inputs of this length. Only called when the length changes
+        self.Length = Length
+        self._Inputs = [np.zeros(Length) for column in Simulator_Inputs]
+        self._States = [np.zeros(Length) for column in HPWH.Kernel_States]
+        self._Seconds = np.zeros(Length)
+        self._Scratch = np.zeros(Length)
+        self._Outputs = {column: np.zeros(Length) for column in Simulator_Outputs}
+        self._Outputs['Tank Temperature (deg C)'] = self._States[0] #The states in deg C are returned as they are
+        self._Outputs['Temperature Activation Backup (deg C)'] = self._States[1]
+
+    def run(self, Inputs, Temperature_Tank_Initial = None):
+        #Inputs is a data frame or a dictionary of arrays holding every column in Simulator_Inputs. Simulates the tank
+        #from Temperature_Tank_Initial, defaulting to the value given when the simulator was built, and returns the
+        #dictionary of output arrays. Row 0 is not simulated, as in Model_HPWH_MixedTank
+        Length = len(Inputs[Simulator_Inputs[0]])
+        if Length != self.Length:
+            self._allocate(Length)
+        for column, values in zip(Simulator_Inputs, self._Inputs):
+            np.copyto(values, Inputs[column])
+        for values in self._States:
+            values.fill(0)
+        Temperature_Tank, Temperature_Activation_Backup = self._States[0], self._States[1]
+        Temperature_Tank[:2] = self.Temperature_Tank_Initial if Temperature_Tank_Initial is None else \
+            Temperature_Tank_Initial
+        np.copyto(Temperature_Activation_Backup, self._Inputs[5])
+        self._Counters.fill(0)
+        self._kernel(*self._Inputs[:5], *self._States, *self._Constants, self._Counters)
+        self._calculate_outputs()
+        return self._Outputs
+
+    def _calculate_outputs(self):
+        #Same calculations, in the same order, as HPWH_Model._calculate_outputs, writing into the preallocated arrays
+        Temperature_Tank, Temperature_Activation_Backup, Jacket_Losses, Energy_Added_Backup, Energy_Withdrawn, \
+            Energy_Added_HeatPump, Total_Energy_Change = self._States
+        Timestep, Temperature_Air_Inlet = self._Inputs[1], self._Inputs[6]
+        Outputs, Seconds, Scratch = self._Outputs, self._Seconds, self._Scratch
+
+        COP_Adjust, COP = Outputs['COP Adjust Tamb'], Outputs['COP']
+        _evaluate_polynomial(self.Coefficients_COP_Derate_Tamb, Temperature_Tank, COP_Adjust)
+        np.subtract(Temperature_Air_Inlet, self.Parameters.COP_Adjust_Reference_Temperature, out = Scratch)
+        COP_Adjust *= Scratch
+        np.multiply(Temperature_Tank, 1.8, out = Scratch)
+        Scratch += 32
+        _evaluate_polynomial(self.Coefficients_COP, Scratch, COP)
+        COP += COP_Adjust
+
+        Power = Outputs['Electric Power (W)']
+        np.multiply(Timestep, HPWH.Seconds_In_Minute, out = Seconds)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'): #Timesteps of 0 are set to 0 below
+            np.divide(Energy_Added_HeatPump, Seconds, out = Power)
+            Power[Timestep <= 0] = 0
+            Power /= COP
+            np.divide(Energy_Added_Backup, Seconds, out = Scratch)
+        Scratch[Timestep <= 0] = 0
+        Power += Scratch
+        np.multiply(Power, Timestep, out = Outputs['Electricity Consumed (kWh)'])
+        Outputs['Electricity Consumed (kWh)'] /= HPWH.Watts_In_kiloWatt * HPWH.Minutes_In_Hour
+
+        np.add(Energy_Added_HeatPump, Energy_Added_Backup, out = Outputs['Energy Added Total (kWh)'])
+        Outputs['Energy Added Total (kWh)'] *= HPWH.kWh_In_J
+        for column, values in [('Jacket Losses (kWh)', Jacket_Losses), ('Energy Added Backup (kWh)', Energy_Added_Backup),
+                               ('Energy Added Heat Pump (kWh)', Energy_Added_HeatPump),
+                               ('Energy Withdrawn (kWh)', Energy_Withdrawn),
+                               ('Total Energy Change (kWh)', Total_Energy_Change)]:
+            np.multiply(values, HPWH.kWh_In_J, out = Outputs[column])
+
+    def counters(self):
+        #Returns the operating counters of the last run, see HPWH_Model.Counter_Names
+        Counters = {}
+        HPWH._add_counters(Counters, self._Counters, max(self.Length - 1, 0))
+        return Counters
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 20:02:18 2026
+
+This module calculates the CO2 emissions and electricity cost of simulation results from hourly rates, such as the
+long-run CO2 emission factors of each CA climate zone or a time-of-use tariff, without running the model again.
+
+An HourlyRates object holds any number of named rate series, each one value per hour of the year, as the rows of one
+8760 column table. The rates can be given as:
+    - a single value, used for every hour
+    - 24 values, or a dictionary keyed by the hour of the day like the prices in Process_Output.py, optionally with
+    different rates on weekends
+    - 8760 values, such as the CO2 factors read by read_co2_factors
+
+Every series is looked up for every timestep at once with a single index on 'Hour of Year (hr)', and multiplied by
+'Electricity Consumed (kWh)'. totals only needs the annual sums, so it first sums the electricity consumed in each hour
+of the year and multiplies that by the table, which takes the same time however many climate zones and tariffs are
+compared. Results longer than a year, such as 10 year draw profiles, wrap around to the start of the table.
+"""
+
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+Hours_In_Year = 8760
+Hours_In_Day = 24
+Pounds_In_Ton = 2000 #Pounds in a US ton
+kWh_In_MWh = 1000 #kWh in MWh
+Column_Electricity = 'Electricity Consumed (kWh)' #Column the rates are multiplied by
+
+def read_co2_factors(Path, ClimateZones = range(1, 17), Header = 2):
+    #Reads the long-run CO2 emission factors (ton/MWh) of each climate zone from a file such as
+    #CA2019CarbonOnly-Elec.csv and returns a dictionary of {climate zone: 8760 factors in lb/kWh}. Header is the row
+    #holding the column names, which is specific to that file
+    Factors = pd.read_csv(Path, header = Header, usecols = lambda column: 'Long-Run Carbon Emission Factors' in column)
+    return {ClimateZone: Factors['CZ{} Electricity Long-Run Carbon Emission Factors (ton/MWh)'.format(ClimateZone)]
+            .to_numpy(dtype = np.float64)[:Hours_In_Year] * Pounds_In_Ton / kWh_In_MWh for ClimateZone in ClimateZones}
+
+def _hour_of_day_rates(Rates):
+    #Converts 24 rates, or a dictionary keyed by the hour of the day as an int or str, to an array of 24 rates
+    if isinstance(Rates, dict):
+        Rates = [Rates[Hour] if Hour in Rates else Rates[str(Hour)] for Hour in range(Hours_In_Day)]
+    return np.asarray(Rates, dtype = np.float64)
+
+def expand_rates(Rates, Weekend_Rates = None, Start = datetime(2021, 1, 1)):
+    #Returns 8760 hourly rates from a single value, 24 hour of the day rates or 8760 rates. Weekend_Rates optionally
+    #gives the hour of the day rates on Saturdays and Sundays, counting the days from Start, the time at hour 0
+    if np.isscalar(Rates):
+        return np.full(Hours_In_Year, float(Rates))
+    if not isinstance(Rates, dict) and len(Rates) == Hours_In_Year:
+        return np.asarray(Rates, dtype = np.float64)
+    Hours = pd.date_range(Start, periods = Hours_In_Year, freq = 'h')
+    Expanded = _hour_of_day_rates(Rates)[Hours.hour]
+    if Weekend_Rates is not None:
+        Weekend = Hours.dayofweek >= 5
+        Expanded[Weekend] = _hour_of_day_rates(Weekend_Rates)[Hours.hour[Weekend]]
+    return Expanded
+
+def get_hour_of_year(Model):
+    #Index of each row in the 8760 table. Uses 'Hour of Year (hr)', set by Model_Initialization.initialize_model, or
+    #the hours since the start of the year of 'Timestamp' for results without it, such as monitored data
+    if 'Hour of Year (hr)' in Model:
+        Hours = np.asarray(Model['Hour of Year (hr)'], dtype = np.int64)
+    else:
+        Timestamp = pd.DatetimeIndex(Model['Timestamp'])
+        Hours = ((Timestamp - pd.to_datetime(Timestamp.year.astype(str))) // pd.Timedelta(hours = 1)).to_numpy()
+    return Hours % Hours_In_Year
+
+class HourlyRates:
+    #Rates is an optional dictionary of {name: rates}, see add. The names are the columns or totals reported, for
+    #example 'CO2 Produced (lb)' for rates in lb/kWh or 'Electricity Cost ($)' for rates in $/kWh
+    def __init__(self, Rates = None, Start = datetime(2021, 1, 1)):
+        self.Start = Start
+        self.Names = []
+        self.Table = np.zeros((0, Hours_In_Year))
+        for Name, Series in (Rates or {}).items():
+            self.add(Name, Series)
+
+    def add(self, Name, Rates, Weekend_Rates = None):
+        #Adds or replaces a rate series, given in any form accepted by expand_rates. Returns self
+        Expanded = expand_rates(Rates, Weekend_Rates, self.Start)
+        if Name in self.Names:
+            self.Table[self.Names.index(Name)] = Expanded
+        else:
+            self.Names.append(Name)
+            self.Table = np.vstack([self.Table, Expanded])
+        return self
+
+    def rates(self, Model):
+        #Returns the rate of every series at every timestep, as an array with one row per series
+        return self.Table[:, get_hour_of_year(Model)]
+
+    def calculate(self, Model, Column = Column_Electricity):
+        #Returns a data frame, with the index of Model, of Column multiplied by the rate of each series at each timestep
+        Values = self.rates(Model) * np.asarray(Model[Column], dtype = np.float64)
+        return pd.DataFrame(Values.T, index = getattr(Model, 'index', None), columns = self.Names)
+
+    def add_columns(self, Model, Column = Column_Electricity):
+        #Adds the columns of calculate to Model and returns it
+        Values = self.calculate(Model, Column)
+        for Name in self.Names:
+            Model[Name] = Values[Name].to_numpy()
+        return Model
+
+    def totals(self, Model, Column = Column_Electricity):
+        #Returns a series with the total of Column multiplied by each rate series, summed over the whole of Model
+        Hourly = np.bincount(get_hour_of_year(Model), weights = np.asarray(Model[Column], dtype = np.float64),
+                             minlength = Hours_In_Year)
+        return pd.Series(self.Table @ Hourly, index = self.Names)
@@ -9,6 +9,9 @@ based on the type of ducting used.
 @author: Peter Grant
 """
 
+#Names of every installation configuration available in get_temperatures
+Installations = ['Open_Area', 'Unducted_Closet', 'Ducted_Exhaust', 'Ducted_Both']
+
 def get_temperatures(Model, Installation):
     
     if Installation == 'Open_Area':
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 18:05:41 2026
+
+This module records how long each phase of a run takes and what the model did during it, so a slow run can be told
+apart from a run where the model did more work.
+
+An Instrumentation object collects one record per phase with:
+    'Phase' - the name of the phase
+    'Wall Time (s)' - elapsed time
+    'CPU Time (s)' - processor time used by this process. Much lower than the wall time means the phase waited on
+    the disk or on other processes
+    'Peak Memory (MB)' - with Trace_Memory = True, the most memory allocated by Python during the phase, measured by
+    tracemalloc. tracemalloc slows everything down, so by default this is the peak resident memory of the process
+    so far, where the operating system reports it, and None otherwise
+    'Rows' - the number of rows processed, when given
+
+Phases are recorded either with a with block around the code, using phase, or by calling checkpoint at the end of
+each phase, which records the time since the previous checkpoint, including any phase blocks in between. The scripts
+use checkpoint so their steps do not need to be indented.
+
+The Counters dictionary can be passed to HPWH_Model.Model_HPWH_MixedTank as counters, which adds the heat pump
+cycles, backup element activations, hours below the cutoff temperature and timesteps below the deadband counted while
+simulating. Every record is passed to Callback as it is made, and save writes the records and counters to a .json
+file.
+"""
+
+import os
+import sys
+import time
+import json
+import tracemalloc
+from contextlib import contextmanager
+
+try: #resource only exists on Unix. Elsewhere the peak memory is only available with Trace_Memory = True
+    import resource
+except ImportError:
+    resource = None
+
+def print_phase(Record):
+    #Callback printing each phase the way the simulation scripts always have
+    print('{} took {} seconds.'.format(Record['Phase'], Record['Wall Time (s)']))
+
+def _peak_memory_process():
+    #Peak resident memory of this process so far in MB, or None where it is not available
+    if resource is None:
+        return None
+    Peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return Peak / 2**20 if sys.platform == 'darwin' else Peak / 2**10 #bytes on macOS, kB on Linux
+
+class Instrumentation:
+    #Collects phase records and model counters for one run. Callback is called with each record as it is made, for
+    #example print_phase or a function sending it to a log. Trace_Memory = True measures the peak memory of each
+    #phase with tracemalloc
+    def __init__(self, Callback = None, Trace_Memory = False):
+        self.Callback = Callback
+        self.Trace_Memory = Trace_Memory
+        self.Phases = []
+        self.Counters = {}
+        self.Start = time.time()
+        self._Wall_Run = time.perf_counter()
+        self._CPU_Run = time.process_time()
+        if Trace_Memory == True and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._Peak = 0 #Peak traced memory since the previous checkpoint, before any phase reset tracemalloc's peak
+        self._Wall, self._CPU = self._start_phase()
+
+    def _start_phase(self):
+        #Returns the wall and CPU times a phase starts at
+        if self.Trace_Memory == True:
+            self._Peak = max(self._Peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        return time.perf_counter(), time.process_time()
+
+    def _record(self, Phase, Rows, Wall, CPU, Peak):
+        #Records a phase that started at the wall and CPU times Wall and CPU
+        Record = {'Phase': Phase,
+                  'Wall Time (s)': time.perf_counter() - Wall,
+                  'CPU Time (s)': time.process_time() - CPU,
+                  'Peak Memory (MB)': max(Peak, tracemalloc.get_traced_memory()[1]) / 2**20 if \
+                      self.Trace_Memory == True else _peak_memory_process(),
+                  'Rows': Rows}
+        self.Phases.append(Record)
+        if self.Callback is not None:
+            self.Callback(Record)
+        return Record
+
+    def checkpoint(self, Phase, Rows = None):
+        #Records a phase running from the previous checkpoint, or from the start of the run, until now. Phases recorded
+        #with phase in between do not move the start
+        Record = self._record(Phase, Rows, self._Wall, self._CPU, self._Peak)
+        self._Peak = 0
+        self._Wall, self._CPU = self._start_phase()
+        return Record
+
+    @contextmanager
+    def phase(self, Phase, Rows = None):
+        #Records the code in a with block as one phase. Rows can also be set afterwards in the record yielded. The
+        #time since the previous checkpoint keeps running
+        Wall, CPU = self._start_phase()
+        Record = {'Rows': Rows}
+        yield Record
+        Peak = tracemalloc.get_traced_memory()[1] if self.Trace_Memory == True else 0
+        self._Peak = max(self._Peak, Peak)
+        Record.update(self._record(Phase, Record['Rows'], Wall, CPU, Peak))
+
+    def summary(self):
+        #Returns the records, the counters and the wall and CPU time of the run so far as a dictionary that can be saved
+        #as JSON. Phases can fall within a checkpoint, so the totals are measured from the start of the run rather than
+        #summed over the records
+        return {'Start': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.Start)),
+                'Wall Time (s)': time.perf_counter() - self._Wall_Run,
+                'CPU Time (s)': time.process_time() - self._CPU_Run,
+                'Phases': self.Phases,
+                'Counters': self.Counters}
+
+    def save(self, Path):
+        #Writes summary() to Path as JSON
+        Folder = os.path.dirname(Path)
+        if Folder != '':
+            os.makedirs(Folder, exist_ok = True)
+        with open(Path, 'w') as File:
+            json.dump(self.summary(), File, indent = 4)
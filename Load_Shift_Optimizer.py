@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 21:14:07 2026
+
+This module searches for the set temperature schedule that minimizes the electricity cost or CO2 emissions of one
+site, instead of choosing among the hand-picked load shifting profiles in Set_Temperature_Profiles.
+
+A candidate schedule is a base set temperature plus up to Windows shift windows, each (Start hour, End hour, Set
+temperature), the same compact description used by Set_Temperature_Profiles.load_shift_schedule. Set temperatures
+stay between Minimum_Set_Temperature and Maximum_Set_Temperature, and a schedule is only feasible if no more than
+Allowed_Volume_Below liters of hot water are drawn while the tank is below Minimum_Delivery_Temperature.
+
+LoadShiftOptimizer reads the site's initialized model once and evaluates candidates in batches with a compiled loop
+that runs the same calculations as HPWH_Model.Model_HPWH_MixedTank, reading each candidate's set temperature from its
+table by day type and hour, and only keeps the totals: electricity, the cost or CO2 of each rate in an
+Hourly_Rates.HourlyRates, the draw volume below the minimum delivery temperature and the lowest tank temperature.
+The year is split into Segments. After each segment the candidates that are already infeasible, or whose objective
+so far is more than Pruning_Margin above the best feasible candidate, are dropped, so most of the batch never
+simulates the whole year. Dropping infeasible candidates is exact, since the draw volume below the minimum only grows.
+Dropping on the objective is not: more Segments or a smaller Pruning_Margin is faster but can drop a schedule that
+would have caught up later in the year.
+
+optimize runs a beam search. It evaluates every static set temperature and the named profiles within the bounds,
+then repeatedly adds one more window, from every combination of Start_Hours, Durations and set temperature, to the
+Beam best schedules so far. numba is needed for this to take seconds. Without it the same loop runs as plain Python.
+"""
+
+#%%--------------------------IMPORT STATEMENTS--------------------------------
+
+import numpy as np
+import pandas as pd
+import time
+import HPWH_Model as HPWH
+from HPWH_Model import Seconds_In_Minute, Minutes_In_Hour, Watts_In_kiloWatt, Density_Water, SpecificHeat_Water
+from Set_Temperature_Profiles import Profile_Specs, load_shift_schedule
+
+try: #numba is optional, see HPWH_Model
+    from numba import njit
+except ImportError:
+    njit = None
+
+#Columns of the totals calculated for each candidate, followed by one column per rate
+Total_Names = ['Electricity Consumed (kWh)', 'Draw Volume Below Minimum (L)', 'Minimum Tank Temperature (deg C)']
+
+#%%--------------------------FUNCTIONS----------------------------------------
+
+def _schedule_batch_kernel(Temperature_Ambient, Timestep, Volume_Draw, Temperature_Inlet, Temperature_Air_Inlet,
+                           Day_Rows, Slots, Rates, Tables, Active, Start, End, Temperature_Tank,
+                           Energy_Added_Backup_Previous, Energy_Added_HeatPump_Previous, Totals, Coefficient_JacketLoss,
+                           Power_Backup, HeatAddition_HeatPump, Temperature_Tank_Set_Deadband, ThermalMass_Tank,
+                           Cutoff_Temperature, Coefficients_COP, Coefficients_COP_Derate_Tamb,
+                           COP_Adjust_Reference_Temperature, Threshold_Activation_Backup, Minimum_Delivery_Temperature):
+    #Advances each candidate in Active from timestep Start to End. The steps are those of HPWH_Model._mixed_tank_kernel
+    #followed by HPWH_Model._calculate_outputs, in the same order, with the set temperature of candidate c read from
+    #Tables[c, Day_Rows[i], Slots[i]] and the activation temperature of the backup element calculated from it as
+    #Model_Initialization.initialize_model does. Temperature_Tank and the previous energy terms hold each candidate's
+    #state between calls, and Totals its running totals, see Total_Names
+    for j in range(len(Active)):
+        c = Active[j]
+        Tank = Temperature_Tank[c]
+        Backup_Previous = Energy_Added_Backup_Previous[c]
+        HeatPump_Previous = Energy_Added_HeatPump_Previous[c]
+        for i in range(Start, End):
+            Set = Tables[c, Day_Rows[i], Slots[i]]
+            Duration = Timestep[i] * Seconds_In_Minute
+            Jacket_Losses = -Coefficient_JacketLoss * (Tank - Temperature_Ambient[i]) * Duration
+            Activation_Backup = Set - Threshold_Activation_Backup
+            if Temperature_Ambient[i] < Cutoff_Temperature:
+                Activation_Backup = Set - Temperature_Tank_Set_Deadband
+            if Backup_Previous == 0:
+                Backup = Power_Backup * int(Tank < Activation_Backup) * Duration
+            else:
+                Backup = Power_Backup * int(Tank < int(Set)) * Duration
+            Withdrawn = -Volume_Draw[i] * Density_Water * SpecificHeat_Water * (Tank - Temperature_Inlet[i])
+            if Temperature_Ambient[i] < Cutoff_Temperature:
+                HeatPump = 0.
+            else:
+                HeatPump = HeatAddition_HeatPump * int(Tank < (Set - Temperature_Tank_Set_Deadband) or \
+                    HeatPump_Previous > 0 and Tank < Set) * Duration
+
+            if Timestep[i] > 0:
+                COP_Adjust = 0.
+                for Coefficient in Coefficients_COP_Derate_Tamb:
+                    COP_Adjust = COP_Adjust * Tank + Coefficient
+                COP_Adjust = COP_Adjust * (Temperature_Air_Inlet[i] - COP_Adjust_Reference_Temperature)
+                COP = 0.
+                for Coefficient in Coefficients_COP:
+                    COP = COP * (1.8 * Tank + 32) + Coefficient
+                COP = COP + COP_Adjust
+                Power = HeatPump / Duration / COP + Backup / Duration
+                Electricity = (Power * Timestep[i]) / (Watts_In_kiloWatt * Minutes_In_Hour)
+                Totals[c, 0] += Electricity
+                for k in range(Rates.shape[0]):
+                    Totals[c, 3 + k] += Electricity * Rates[k, i]
+            if Volume_Draw[i] > 0 and Tank < Minimum_Delivery_Temperature:
+                Totals[c, 1] += Volume_Draw[i]
+            if Tank < Totals[c, 2]:
+                Totals[c, 2] = Tank
+
+            Tank = (Jacket_Losses + Withdrawn + Backup + HeatPump) / ThermalMass_Tank + Tank
+            Backup_Previous = Backup
+            HeatPump_Previous = HeatPump
+        Temperature_Tank[c] = Tank
+        Energy_Added_Backup_Previous[c] = Backup_Previous
+        Energy_Added_HeatPump_Previous[c] = HeatPump_Previous
+
+#Batch kernel as (plain Python, compiled with numba or None)
+_kernels = (_schedule_batch_kernel, njit(cache = True)(_schedule_batch_kernel) if njit is not None else None)
+
+def _get_batch_kernel(backend):
+    kernel, kernel_compiled = _kernels
+    if backend == 'python':
+        return kernel
+    elif backend == 'numba':
+        if kernel_compiled is None:
+            raise ImportError("backend = 'numba' requires numba to be installed")
+        return kernel_compiled
+    elif backend == 'auto':
+        return kernel_compiled if kernel_compiled is not None else kernel
+    raise ValueError('Unknown backend {}. Use python, numba or auto'.format(backend))
+
+def _window_hours(Window):
+    #Hours of the day covered by a (Start hour, End hour, Set temperature) window, as a boolean array
+    Hours = np.arange(24)
+    Start_Hour, End_Hour = Window[0] % 24, Window[1] % 24
+    if Start_Hour <= End_Hour:
+        return (Hours >= Start_Hour) & (Hours < End_Hour)
+    return (Hours >= Start_Hour) | (Hours < End_Hour)
+
+class LoadShiftOptimizer:
+    #Model is the site's model as returned by Model_Initialization.initialize_model or
+    #Monitored_Data.prepare_monitored_data. Its 'Set Temperature (deg C)' and 'Temperature Activation Backup (deg C)'
+    #columns are replaced by those of each candidate, and the tank starts from its initial 'Tank Temperature (deg C)'.
+    #Parameters, Regression_COP and Regression_COP_Derate_Tamb are those passed to HPWH_Model.Model_HPWH_MixedTank.
+    #Rates is an Hourly_Rates.HourlyRates and Objective the name of the rate to minimize. Holidays and
+    #Shift_On_Weekends are passed to Set_Temperature_Profiles.load_shift_schedule
+    def __init__(self, Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, Rates,
+                 Objective = 'Electricity Cost ($)', Minimum_Delivery_Temperature = 48.9, Minimum_Set_Temperature = None,
+                 Maximum_Set_Temperature = 60, Threshold_Activation_Backup = 15, Allowed_Volume_Below = 0.,
+                 Shift_On_Weekends = True, Holidays = (), Segments = 12, Pruning_Margin = 0.1, backend = 'auto'):
+        if Objective not in Rates.Names:
+            raise ValueError('Objective {} is not one of the rates {}'.format(Objective, Rates.Names))
+        self.Parameters = Parameters
+        self.Objective = Objective
+        self.Rate_Names = list(Rates.Names)
+        self.Minimum_Delivery_Temperature = float(Minimum_Delivery_Temperature)
+        self.Minimum_Set_Temperature = float(Minimum_Delivery_Temperature if Minimum_Set_Temperature is None else
+                                             Minimum_Set_Temperature)
+        self.Maximum_Set_Temperature = float(Maximum_Set_Temperature)
+        self.Threshold_Activation_Backup = float(Threshold_Activation_Backup)
+        self.Allowed_Volume_Below = float(Allowed_Volume_Below)
+        self.Shift_On_Weekends = Shift_On_Weekends
+        self.Holidays = Holidays
+        self.Segments = Segments
+        self.Pruning_Margin = Pruning_Margin
+        self._kernel = _get_batch_kernel(backend)
+        self.Coefficients_COP = np.poly1d(Regression_COP).coeffs.astype(np.float64)
+        self.Coefficients_COP_Derate_Tamb = np.poly1d(Regression_COP_Derate_Tamb).coeffs.astype(np.float64)
+
+        #Inputs shared by every candidate, read once
+        self._Inputs = [Model[column].to_numpy(dtype = np.float64) for column in HPWH.Kernel_Inputs[:4]] + \
+            [Model['Air Inlet Temperature (deg C)'].to_numpy(dtype = np.float64)]
+        self._Day_Rows, self._Slots = load_shift_schedule(self.Minimum_Set_Temperature, [], Shift_On_Weekends,
+                                                          Holidays = Holidays).index(Model['Timestamp'])
+        self._Rates = np.ascontiguousarray(Rates.rates(Model))
+        self.Temperature_Tank_Initial = float(Model['Tank Temperature (deg C)'].iloc[min(1, len(Model) - 1)])
+        self.Timesteps = len(Model)
+
+    def schedule(self, Base_Temperature, Windows = ()):
+        #Returns the SetTemperatureSchedule of a candidate
+        return load_shift_schedule(Base_Temperature, list(Windows), self.Shift_On_Weekends, Holidays = self.Holidays)
+
+    def evaluate(self, Candidates):
+        #Simulates a batch of candidates, each a (Base temperature, Windows) tuple, and returns a data frame with one
+        #row per candidate: its totals, see Total_Names, each rate, whether it is 'Feasible', and 'Completed', which
+        #is False for candidates pruned before the end of the year. The totals of those cover only the part simulated
+        Tables = np.ascontiguousarray(np.stack([self.schedule(Base, Windows).Table for Base, Windows in Candidates]))
+        Count = len(Candidates)
+        Temperature_Tank = np.full(Count, self.Temperature_Tank_Initial)
+        Energy_Added_Backup_Previous = np.zeros(Count)
+        Energy_Added_HeatPump_Previous = np.zeros(Count)
+        Totals = np.zeros((Count, len(Total_Names) + len(self.Rate_Names)))
+        Totals[:, 2] = np.inf
+        Objective = len(Total_Names) + self.Rate_Names.index(self.Objective)
+        Active = np.arange(Count)
+        Completed = np.zeros(Count, dtype = bool)
+
+        Boundaries = np.linspace(1, self.Timesteps, self.Segments + 1).astype(np.int64)
+        for Segment, (Start, End) in enumerate(zip(Boundaries[:-1], Boundaries[1:])):
+            self._kernel(*self._Inputs, self._Day_Rows, self._Slots, self._Rates, Tables, Active, Start, End,
+                         Temperature_Tank, Energy_Added_Backup_Previous, Energy_Added_HeatPump_Previous, Totals,
+                         float(self.Parameters[0]), float(self.Parameters[1]), float(self.Parameters[2]),
+                         float(self.Parameters[3]), float(self.Parameters[4]), float(self.Parameters[7]),
+                         self.Coefficients_COP, self.Coefficients_COP_Derate_Tamb, float(self.Parameters[6]),
+                         self.Threshold_Activation_Backup, self.Minimum_Delivery_Temperature)
+            if Segment == self.Segments - 1:
+                break
+            #Drop the dominated candidates: infeasible ones once a feasible one exists, and those already well above
+            #the best feasible objective. Both only get worse as more of the year is simulated
+            Feasible = Totals[Active, 1] <= self.Allowed_Volume_Below
+            if Feasible.any():
+                Best = Totals[Active[Feasible], Objective].min()
+                Active = Active[Feasible & (Totals[Active, Objective] <= Best + abs(Best) * self.Pruning_Margin)]
+        Completed[Active] = True
+
+        Results = pd.DataFrame(Totals, columns = Total_Names + self.Rate_Names)
+        Results.insert(0, 'Base Temperature (deg C)', [Base for Base, Windows in Candidates])
+        Results.insert(1, 'Windows', [list(Windows) for Base, Windows in Candidates])
+        Results['Feasible'] = Results['Draw Volume Below Minimum (L)'] <= self.Allowed_Volume_Below
+        Results['Completed'] = Completed
+        return Results
+
+    def _temperatures(self, Temperature_Step):
+        #Set temperatures searched, every Temperature_Step from the minimum, always including the maximum
+        Temperatures = np.round(np.arange(self.Minimum_Set_Temperature, self.Maximum_Set_Temperature, Temperature_Step),
+                                2).tolist()
+        return Temperatures + [self.Maximum_Set_Temperature]
+
+    def optimize(self, Windows = 2, Temperature_Step = 2.5, Start_Hours = range(24), Durations = (2, 4, 6, 8),
+                 Beam = 8):
+        #Runs the beam search and returns the best SetTemperatureSchedule and a data frame of every candidate
+        #evaluated, sorted from best to worst, with the 'Stage' it was evaluated in and the 'Runtime (s)' of that stage.
+        #The best schedule is the completed, feasible candidate with the lowest objective, or the one with the least
+        #draw volume below the minimum delivery temperature if none is feasible
+        Temperatures = self._temperatures(Temperature_Step)
+        Candidates = [(Temperature, ()) for Temperature in Temperatures]
+        for Base, Shifts in Profile_Specs.values(): #The named profiles within the bounds
+            if all(self.Minimum_Set_Temperature <= Temperature <= self.Maximum_Set_Temperature for Temperature in
+                   [Base] + [Window[2] for Window in Shifts]):
+                Candidates.append((Base, tuple(Shifts)))
+
+        Evaluated = []
+        Seen = set()
+        for Stage in range(Windows + 1):
+            Unique = []
+            for Candidate in Candidates: #Different descriptions of the same schedule are only simulated once
+                Key = self.schedule(*Candidate).Table.tobytes()
+                if Key not in Seen:
+                    Seen.add(Key)
+                    Unique.append(Candidate)
+            if len(Unique) == 0:
+                break
+            Start = time.time()
+            Results = self.evaluate(Unique)
+            Results['Stage'] = Stage
+            Results['Runtime (s)'] = time.time() - Start
+            Evaluated.append(Results)
+
+            Ranked = self._rank(Results)
+            Candidates = []
+            for Index in Ranked.index[:Beam]: #Add one more window to each of the best schedules
+                Base, Current = Unique[Index]
+                if len(Current) >= Windows or not Ranked.loc[Index, 'Completed']:
+                    continue
+                Covered = np.zeros(24, dtype = bool)
+                for Window in Current:
+                    Covered |= _window_hours(Window)
+                for Start_Hour in Start_Hours:
+                    for Duration in Durations:
+                        for Temperature in Temperatures:
+                            Window = (Start_Hour, (Start_Hour + Duration) % 24, Temperature)
+                            if Temperature != Base and not (Covered & _window_hours(Window)).any():
+                                Candidates.append((Base, tuple(sorted(Current + (Window,)))))
+
+        Results = self._rank(pd.concat(Evaluated, ignore_index = True))
+        Best = Results.iloc[0]
+        return self.schedule(Best['Base Temperature (deg C)'], Best['Windows']), Results.reset_index(drop = True)
+
+    def _rank(self, Results):
+        #Sorts completed before pruned candidates, then feasible before infeasible, then by objective. Infeasible
+        #candidates are sorted by the draw volume below the minimum delivery temperature first
+        Order = Results.assign(_Infeasible = ~Results['Feasible'], _Pruned = ~Results['Completed'],
+                               _Below = np.where(Results['Feasible'], 0, Results['Draw Volume Below Minimum (L)']))
+        Order = Order.sort_values(['_Pruned', '_Infeasible', '_Below', self.Objective], kind = 'mergesort')
+        return Results.loc[Order.index]
+
+#%%--------------------------USER INPUTS------------------------------------------
+
+if __name__ == '__main__':
+    from Hourly_Rates import HourlyRates
+    from Model_Initialization import initialize_model
+    from Scenario_Sweep import Default_Settings, get_parameters, load_draw_profile
+
+    ST = time.time()
+    Path_DrawProfile = r'C:\Users\Peter Grant\Dropbox (Beyond Efficiency)\Peter\Python Scripts\GasHPWH_Model_git\Data\Draw_Profiles\Bldg=Single_CZ=1_Wat=Hot_Prof=1_SDLM=Yes_CFA=800_Inc=FSCDB_Ver=2019.csv'
+    Installation_Configuration = 'Ducted_Exhaust'
+    Prices = {Hour: 0.3 if 16 <= Hour < 21 else 0.2 for Hour in range(24)} #$/kWh by hour of the day
+    Settings = dict(Default_Settings, Timestep = 15)
+
+    Draw_Volume, Inlet_Temperature = load_draw_profile(Path_DrawProfile, Settings)
+    Model = pd.DataFrame({'Time (min)': np.arange(len(Draw_Volume)) * Settings['Timestep'],
+                          'Inlet Water Temperature (deg C)': Inlet_Temperature,
+                          'Hot Water Draw Volume (L)': Draw_Volume})
+    Model = initialize_model(Model, Settings['Timestep'], Settings['Simulation_Start'], 'Static_60',
+                             Settings['Temperature_Ambient'], Installation_Configuration,
+                             Settings['Temperature_Tank_Initial'], Settings['Threshold_Activation_Backup'])
+    Parameters, Regression_COP, Regression_COP_Adjust_Tamb = get_parameters(Settings)
+    Rates = HourlyRates({'Electricity Cost ($)': Prices}, Settings['Simulation_Start'])
+
+    Optimizer = LoadShiftOptimizer(Model, Parameters, Regression_COP, Regression_COP_Adjust_Tamb, Rates,
+                                   Threshold_Activation_Backup = Settings['Threshold_Activation_Backup'])
+    Schedule, Results = Optimizer.optimize()
+    print(Results.head(10).to_string())
+    print('Best schedule: {}'.format(Schedule.to_profile()))
+    print('Evaluating {} candidates took {} seconds'.format(len(Results), time.time() - ST))
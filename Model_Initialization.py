@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 12:02:15 2026
+
+This module contains the code that turns a timestep-based draw profile into the data frame read by the simulation
+models. It sets the ambient and air inlet temperatures for the installation configuration, the initial tank
+temperature, the set temperature from the chosen profile, and creates the columns the model fills in.
+
+It was pulled out of HPWH_Model_MixedTank_Simulation.py so the same setup can be used by scripts that run many
+scenarios without executing that script.
+"""
+
+import pandas as pd
+from Installation_Configuration import get_temperatures
+from Set_Temperature_Profiles import get_schedule
+
+def initialize_model(Model, Timestep, Simulation_Start, Temperature_Tank_Set, Temperature_Ambient,
+                     Installation_Configuration, Temperature_Tank_Initial, Threshold_Activation_Backup,
+                     Shift_On_Weekends = True):
+    #Model must contain 'Time (min)', 'Hot Water Draw Volume (L)' and 'Inlet Water Temperature (deg C)', as returned by
+    #Draw_Profiles.prepare_draw_profile. Temperature_Tank_Set is anything accepted by map_set_temperature
+    Model['Ambient Temperature (deg C)'] = Temperature_Ambient #Sets the ambient temperature in the model equal to the value specified in INPUTS. This value could be replaced with a series of values
+    Model = get_temperatures(Model, Installation_Configuration)
+
+    # Initializes a bunch of values at either 0 or initial temperature. They will be overwritten later as needed
+    Model['Tank Temperature (deg C)'] = 0
+    Model.loc[0, 'Tank Temperature (deg C)'] = Temperature_Tank_Initial
+    Model.loc[1, 'Tank Temperature (deg C)'] = Temperature_Tank_Initial
+    Model['Jacket Losses (J)'] = 0
+    Model['Energy Withdrawn (J)'] = 0
+    Model['Energy Added Backup (J)'] = 0
+    Model['Energy Added Heat Pump (J)'] = 0
+    Model['Energy Added Total (J)'] = 0
+    Model['COP'] = 0
+    Model['COP Adjust Tamb'] = 0 # Adjustment for the COP based on how T_Amb differs from 67.5 deg C
+    Model['Total Energy Change (J)'] = 0
+    Model['Timestep (min)'] = Timestep
+    Model['Hour of Year (hr)'] = (Model['Time (min)']/60).astype(int)
+    Model['Electricity CO2 Multiplier (lb/kWh)'] = 0
+
+    Model['Time Elapsed (timedelta)'] = pd.to_timedelta(Model['Time (min)'], unit = 'm')
+    Model['Timestamp'] = Model['Time Elapsed (timedelta)'] + Simulation_Start
+    Model = map_set_temperature(Model, Temperature_Tank_Set, Shift_On_Weekends)
+
+    Model['Temperature Activation Backup (deg C)'] = Model['Set Temperature (deg C)'] - Threshold_Activation_Backup #Set the activation temperature for the backup resistance element equal to the set temperature minus an additional delta before the resistance element engages
+    return Model
+
+def map_set_temperature(Model, Temperature_Tank_Set, Shift_On_Weekends = True):
+    #Sets 'Set Temperature (deg C)' from 'Timestamp' using Temperature_Tank_Set, a profile name, a profile returned by
+    #Set_Temperature_Profiles.get_profile or a SetTemperatureSchedule. If Shift_On_Weekends is False weekends use the
+    #midnight set temperature all day, unless Temperature_Tank_Set is a schedule, which defines its own weekends. Also
+    #creates 'Hour' and 'Weekday?'
+    Timestamp = pd.DatetimeIndex(Model['Timestamp'])
+    Model['Hour'] = Timestamp.hour
+    Model['Weekday?'] = Timestamp.weekday < 5
+    Model['Set Temperature (deg C)'] = get_schedule(Temperature_Tank_Set, Shift_On_Weekends).evaluate(Timestamp)
+    return Model
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 14:05:47 2026
+
+This module turns the Creekside monitored data into the data frame read by HPWH_Model.Model_HPWH_MixedTank. The
+code was pulled out of HPWH_Model_MixedTank_Simulation_MonitoredData.py so the same preprocessing can be applied to a
+whole data set or, for multi-year logger files too large to hold in memory, one chunk at a time.
+
+prepare_monitored_data processes one chunk of the .csv file. A few calculations depend on the rows before the chunk
+(forward filling missing readings, the timestep, the water drawn since the previous reading and the electricity
+consumed since the start of the data set). The values they need are stored in the Carry dictionary, which is empty
+for the first chunk and is updated by each call, so the chunks produce the same rows as processing the whole file.
+The one exception is the backward fill used for missing readings at the very start of the data set: it only looks
+ahead within the chunk holding the first reading.
+
+The timestamps are parsed once and the readings are filled, filtered and converted to SI units as a single float
+array, so each chunk is copied about once before the model's data frame is built. Timesteps longer than Gap_Threshold
+are data collection outages, and the rows following them are flagged as the start of a new segment.
+
+simulate_monitored_data_chunked reads the file in chunks, prepares and simulates each one, carrying the tank state
+from chunk to chunk with HPWH_Model.Model_HPWH_MixedTank_Chunk, and appends each simulated chunk to the output file
+as soon as it completes. Memory use depends on Chunk_Size, not on the length of the file.
+
+simulate_segments applies the Creekside outage rule left commented out in HPWH_Model.Model_HPWH_MixedTank: when data
+collection resumes after an outage the tank is re-initialized at the average of the two thermostat measurements. The
+heat pump and backup element states are not known after an outage either, so they restart off, as they do at the
+start of the data set. Each segment then depends only on its own rows, so the segments are simulated on a pool of
+worker processes and the results stitched back together in their original order.
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import multiprocessing
+import HPWH_Model as HPWH
+from Installation_Configuration import get_temperatures
+from Set_Temperature_Profiles import get_schedule
+
+#Constants used for unit conversions
+Minutes_In_Hour = 60 #The number of minutes in an hour
+K_To_F_MagnitudeOnly = 1.8/1. #Converting from K/C to F. Only applicable for magnitudes, not actual temperatures
+Liters_In_Gallon = 3.78541 #The number of liters in a gallon
+
+#Monitored readings read from the .csv file, other than the timestamp index. The readings in deg F are converted to
+#deg C, all at once, into the columns given in Columns_Converted
+Columns_MonitoredData = ['Power_PowerSum_W', 'Power_EnergySum_kWh', 'Water_FlowRate_gpm', 'Water_FlowTotal_gal',
+                         'Water_FlowTemp_F', 'Water_RemoteTemp_F', 'T_Setpoint_F', 'T_Ambient_EcoNet_F', 'T_Cabinet_F',
+                         'T_TankUpper_F', 'T_TankLower_F']
+Columns_Converted = {'Water_FlowRate_gpm': 'Water_FlowRate_LPerMin', 'Water_FlowTotal_gal': 'Water_FlowTotal_L',
+                     'Water_FlowTemp_F': 'Water_FlowTemp_C', 'Water_RemoteTemp_F': 'Water_RemoteTemp_C',
+                     'T_Setpoint_F': 'Set Temperature (deg C)', 'T_Ambient_EcoNet_F': 'T_Ambient_EcoNet_C',
+                     'T_Cabinet_F': 'T_Cabinet_C', 'T_TankUpper_F': 'T_Tank_Upper_C', 'T_TankLower_F': 'T_Tank_Lower_C'}
+#Measured columns only kept when Validation is True, for the comparison plots of the monitored data script
+Columns_Validation = ['Water_FlowRate_LPerMin', 'Water_FlowTemp_C', 'Water_RemoteTemp_C', 'T_Ambient_EcoNet_C',
+                      'T_Cabinet_C']
+#Simulation results saved to the output file
+Columns_Output = ['Time (s)', 'Timestep (min)', 'Set Temperature (deg C)', 'Tank Temperature (deg C)',
+                  'Energy Withdrawn (kWh)', 'Energy Added Total (kWh)', 'Ambient Temperature (deg C)',
+                  'Inlet Water Temperature (deg C)', 'Water Draw Volume (L)', 'Hot Water Draw Volume (L)',
+                  'Electricity Consumed (kWh)', 'Energy Added Backup (kWh)', 'Energy Added Heat Pump (kWh)',
+                  'Power_PowerSum_W', 'COP', 'Power_EnergySum_kWh']
+#Timesteps longer than this (min) are data collection outages. See the comments in HPWH_Model.Model_HPWH_MixedTank
+Gap_Threshold = 5
+
+def _fill_readings(Values, Last = None):
+    #Fills missing readings (NaN) in each column of Values by projecting the most recent reading forward, continuing
+    #from Last, the filled readings at the end of the previous chunk. Readings still missing at the start of the data
+    #set are filled by copying the first following reading
+    if Last is not None:
+        Values = np.vstack([Last, Values])
+    Columns = np.arange(Values.shape[1])
+    Rows = np.where(np.isnan(Values), 0, np.arange(len(Values))[:, None])
+    np.maximum.accumulate(Rows, axis = 0, out = Rows)
+    Values = Values[Rows, Columns]
+    Missing = np.isnan(Values)
+    if Missing.any():
+        Values = np.where(Missing, Values[Missing.argmin(axis = 0), Columns], Values)
+    return Values if Last is None else Values[1:]
+
+def prepare_monitored_data(Draw_Profile, Carry, Temperature_Tank_Initial, Threshold_Activation_Backup,
+                           Installation_Configuration, Temperature_MixingValve_Set, Temperature_Tank_Set = None,
+                           Shift_On_Weekends = True, Time_Filter = None, Gap_Threshold = Gap_Threshold,
+                           Validation = False):
+    #Draw_Profile is the monitored data, or one chunk of it, as read by pd.read_csv(Path, index_col = 0). Carry is a
+    #dictionary holding the values needed from previous chunks. Pass an empty dictionary with the first chunk and the
+    #same dictionary with every following chunk. Temperature_Tank_Set is a profile name, a profile returned by
+    #Set_Temperature_Profiles.get_profile or a SetTemperatureSchedule, or None to use the monitored set temperature.
+    #Time_Filter is an optional (Start_Time, End_Time) tuple, in hours, limiting the rows kept. Rows whose timestep is
+    #longer than Gap_Threshold (min) follow a data collection outage. They have 'Outage?' set and start a new
+    #'Segment', numbered from 0 at the start of the data set. Only the columns read by the model, the output and the
+    #calibration are kept, plus Columns_Validation if Validation is True
+    #The readings are processed as one float array, and the data frame is only built once at the end
+    Timestamp = pd.DatetimeIndex(pd.to_datetime(Draw_Profile.index)) #The only time the timestamps are parsed
+    Values = _fill_readings(Draw_Profile[Columns_MonitoredData].to_numpy(dtype = np.float64), Carry.get('Last Row'))
+    Carry['Last Row'] = Values[-1].copy()
+    if 'Timestamp Start' not in Carry:
+        Carry['Timestamp Start'] = Timestamp[0]
+    Seconds = (Timestamp - Carry['Timestamp Start']).total_seconds().to_numpy()
+    Time = Seconds / 60.
+
+    Keep = np.ones(len(Time), dtype = bool)
+    if Time_Filter is not None:
+        Keep = (Time / Minutes_In_Hour > Time_Filter[0]) & (Time / Minutes_In_Hour < Time_Filter[1])
+    if not Keep.any():
+        return pd.DataFrame()
+
+    #The time change between two rows in the data set is the timestep used in calculations. Rows repeating the time
+    #of the previous row are dropped, including the first row of the data set
+    Timestep = np.diff(Time[Keep], prepend = Carry.get('Time (min)', Time[Keep][0]))
+    Carry['Time (min)'] = Time[Keep][-1]
+    Keep[Keep] = Timestep != 0
+    Timestep = Timestep[Timestep != 0]
+    if len(Timestep) == 0:
+        return pd.DataFrame()
+    Timestamp, Seconds, Time, Values = Timestamp[Keep], Seconds[Keep], Time[Keep], Values[Keep]
+
+    #Unit conversions, from gal and gal/min to L and L/min and from deg F to deg C
+    Converted = [Columns_MonitoredData.index(column) for column in Columns_Converted]
+    Volume = np.array([column.endswith(('_gpm', '_gal')) for column in Columns_Converted])
+    Offset = np.where(Volume, 0, 32)
+    Measured = dict(zip(Columns_Converted.values(), ((Values[:, Converted] - Offset) *
+                    np.where(Volume, Liters_In_Gallon, 1) / np.where(Volume, 1, K_To_F_MagnitudeOnly)).T))
+    Energy = Values[:, Columns_MonitoredData.index('Power_EnergySum_kWh')]
+    if 'Energy Start (kWh)' not in Carry:
+        Carry['Energy Start (kWh)'] = Energy[0]
+
+    #The volume of water withdrawn during each timestep is the change in the cumulative water flow since the previous
+    #row. The hot water drawn from the tank is estimated from it and the mixing valve set temperature. See the comments
+    #at the top of HPWH_Model_MixedTank_Simulation_MonitoredData.py for more comments about this
+    Flow_Total = Measured['Water_FlowTotal_L']
+    Volume_Draw = np.diff(Flow_Total, prepend = Carry.get('Water_FlowTotal_L', Flow_Total[0]))
+    Carry['Water_FlowTotal_L'] = Flow_Total[-1]
+    Temperature_Inlet = Measured['Water_RemoteTemp_C']
+    Volume_Draw_Hot = (Volume_Draw * Temperature_Inlet - Volume_Draw * Temperature_MixingValve_Set) / \
+        (Temperature_Inlet - Measured['T_Tank_Upper_C'])
+
+    #Data collection outages start a new segment
+    Outage = Timestep > Gap_Threshold
+    Segment = Carry.get('Segment', 0) + np.cumsum(Outage)
+    Carry['Segment'] = int(Segment[-1])
+
+    if Temperature_Tank_Set is not None: #If the user has opted to use an assumed set temperature
+        Temperature_Set = get_schedule(Temperature_Tank_Set, Shift_On_Weekends).evaluate(Timestamp)
+    else:
+        Temperature_Set = Measured['Set Temperature (deg C)']
+    Temperature_Tank = np.zeros(len(Timestep))
+    Temperature_Tank[:2] = Temperature_Tank_Initial #The first two rows start at the user-specified initial water temperature. Chunks after the first start from the state carried by the model instead
+    Zeros = np.zeros(len(Timestep), dtype = np.int64)
+
+    Model = pd.DataFrame({'Timestamp': Timestamp,
+                          'Time (s)': Seconds,
+                          'Time (min)': Time,
+                          'Time (hr)': Time / Minutes_In_Hour,
+                          'Hour': Timestamp.hour,
+                          'Timestep (min)': Timestep,
+                          'Outage?': Outage,
+                          'Segment': Segment,
+                          'Power_PowerSum_W': Values[:, Columns_MonitoredData.index('Power_PowerSum_W')],
+                          'Power_EnergySum_kWh': Energy - Carry['Energy Start (kWh)'], #Uses 0 as the value at the start of the monitoring period
+                          'Water_FlowTotal_L': Flow_Total,
+                          'Water Draw Volume (L)': Volume_Draw,
+                          'Hot Water Draw Volume (L)': Volume_Draw_Hot,
+                          'T_Tank_Upper_C': Measured['T_Tank_Upper_C'],
+                          'T_Tank_Lower_C': Measured['T_Tank_Lower_C'],
+                          'Set Temperature (deg C)': Temperature_Set,
+                          'Temperature Activation Backup (deg C)': Temperature_Set - Threshold_Activation_Backup, #The backup resistance element engages when the tank is this far below the set temperature
+                          'Tank Temperature (deg C)': Temperature_Tank,
+                          'Jacket Losses (J)': Zeros,
+                          'Energy Withdrawn (J)': Zeros,
+                          'Energy Added Backup (J)': Zeros,
+                          'Energy Added Heat Pump (J)': Zeros,
+                          'Energy Added Total (J)': Zeros,
+                          'COP': Zeros,
+                          'Total Energy Change (J)': Zeros,
+                          'COP Adjust Tamb': Zeros,
+                          'Ambient Temperature (deg C)': Measured['T_Cabinet_C'], #The monitored temperature in the cabinet
+                          'Inlet Water Temperature (deg C)': Temperature_Inlet}) #The monitored inlet water temperature
+    if Validation == True:
+        for column in Columns_Validation:
+            Model[column] = Measured[column]
+    return get_temperatures(Model, Installation_Configuration) #Identify the impacts of the installation configuration
+
+def simulate_monitored_data_chunked(Path_DrawProfile, Path_Output, Chunk_Size, Parameters, Regression_COP,
+                                    Regression_COP_Derate_Tamb, Temperature_Tank_Initial, Threshold_Activation_Backup,
+                                    Installation_Configuration, Temperature_MixingValve_Set,
+                                    Temperature_Tank_Set = None, Shift_On_Weekends = True, Time_Filter = None,
+                                    backend = 'auto', counters = None, Aggregator = None,
+                                    Gap_Threshold = Gap_Threshold):
+    #Reads Path_DrawProfile Chunk_Size rows at a time, simulates each chunk and appends the Columns_Output of the
+    #results to Path_Output, indexed by timestamp, as each chunk completes. Path_Output can be None when only
+    #Aggregator, an Aggregation.Aggregator, is needed, which has each chunk added to it. The remaining inputs are passed to
+    #prepare_monitored_data and HPWH_Model.Model_HPWH_MixedTank_Chunk. Returns a dictionary with the 'Simulated' and
+    #'Measured' electricity consumption (kWh), the number of 'Rows' simulated and the number of 'Chunks' read. If
+    #counters is a dictionary the operating counters of the whole data set are added to it, see HPWH_Model.Counter_Names
+    Carry = {}
+    State = None
+    Summary = {'Simulated': 0., 'Measured': np.nan, 'Rows': 0, 'Chunks': 0}
+    if Path_Output is not None and os.path.exists(Path_Output): #Results are appended, so start from an empty file
+        os.remove(Path_Output)
+
+    for Draw_Profile in pd.read_csv(Path_DrawProfile, index_col = 0, chunksize = Chunk_Size):
+        Summary['Chunks'] += 1
+        Model = prepare_monitored_data(Draw_Profile, Carry, Temperature_Tank_Initial, Threshold_Activation_Backup,
+                                       Installation_Configuration, Temperature_MixingValve_Set, Temperature_Tank_Set,
+                                       Shift_On_Weekends, Time_Filter, Gap_Threshold)
+        if len(Model) == 0:
+            continue
+        Model, State = HPWH.Model_HPWH_MixedTank_Chunk(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb,
+                                                       State, backend, counters = counters)
+        Summary['Simulated'] += Model['Electricity Consumed (kWh)'].sum()
+        Summary['Measured'] = Model['Power_EnergySum_kWh'].iloc[-1]
+        Summary['Rows'] += len(Model)
+        if Aggregator is not None:
+            Aggregator.add(Model)
+        if Path_Output is not None:
+            Model = Model.set_index('Timestamp')
+            Model[Columns_Output].to_csv(Path_Output, mode = 'a', header = Summary['Rows'] == len(Model))
+    return Summary
+
+def _simulate_batch(Batch):
+    #Simulates consecutive segments in a worker process. Batch holds the kernel inputs and states of the rows, as
+    #float64 arrays in the order of HPWH_Model.Kernel_Inputs and Kernel_States, the first row of each segment, the
+    #tank temperature each segment is re-initialized at, NaN for the first segment of the data set, and the settings.
+    #Returns the simulated states and the operating counters of the batch
+    Inputs, States, Starts, Temperatures_Reset, Parameters, backend, integrator = Batch
+    kernel = HPWH._get_kernel(backend, integrator)
+    Counters = np.zeros(len(HPWH.Counter_Names))
+    Ends = list(Starts[1:]) + [len(Inputs[0])]
+    for Start, End, Temperature_Reset in zip(Starts, Ends, Temperatures_Reset):
+        #A re-initialized segment gets a leading element standing in for the outage, with the heat pump and backup
+        #element off, so its first row is simulated too. The first segment of the data set starts like
+        #HPWH_Model.Model_HPWH_MixedTank instead
+        Lead = 0 if np.isnan(Temperature_Reset) else 1
+        inputs = [np.concatenate([np.zeros(Lead), values[Start:End]]) for values in Inputs]
+        states = [np.concatenate([np.zeros(Lead), values[Start:End]]) for values in States]
+        if Lead == 1:
+            states[0][1] = Temperature_Reset
+        kernel(*inputs, *states, float(Parameters[0]), float(Parameters[1]), float(Parameters[2]),
+               float(Parameters[3]), float(Parameters[4]), float(Parameters[7]), Counters)
+        for values, simulated in zip(States, states):
+            values[Start:End] = simulated[Lead:]
+    return States, Counters
+
+def simulate_segments(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, Processes = None,
+                      backend = 'auto', integrator = 'euler', counters = None, Gap_Threshold = Gap_Threshold,
+                      Batches_Per_Process = 4):
+    #Simulates monitored data prepared by prepare_monitored_data, re-initializing the tank after every data collection
+    #outage, and returns the same columns as HPWH_Model.Model_HPWH_MixedTank. The outages are the rows with 'Outage?'
+    #set, or with a timestep longer than Gap_Threshold (min) when Model has no 'Outage?' column. Processes is the
+    #number of worker processes, defaulting to the number of CPUs. Processes = 1 simulates every segment in this
+    #process and gives identical results. The rows are split at segment starts into about Batches_Per_Process batches
+    #per process, so short segments are not sent to the workers one at a time. backend, integrator and counters are
+    #the same as in HPWH_Model.Model_HPWH_MixedTank
+    if backend == 'legacy':
+        backend = 'python'
+    Outage = Model['Outage?'] if 'Outage?' in Model else Model['Timestep (min)'] > Gap_Threshold
+    Starts = np.concatenate([[0], np.flatnonzero(Outage.to_numpy()[1:]) + 1])
+    Temperatures_Reset = 0.5 * (Model['T_Tank_Upper_C'].to_numpy(dtype = np.float64)[Starts] +
+                                Model['T_Tank_Lower_C'].to_numpy(dtype = np.float64)[Starts])
+    Temperatures_Reset[0] = np.nan
+    Inputs = [Model[column].to_numpy(dtype = np.float64) for column in HPWH.Kernel_Inputs]
+    States = [Model[column].to_numpy(dtype = np.float64, copy = True) for column in HPWH.Kernel_States]
+
+    Processes = Processes or multiprocessing.cpu_count()
+    Targets = np.linspace(0, len(Model), Processes * Batches_Per_Process + 1)[1:-1]
+    Splits = np.unique(np.concatenate([[0], Starts[np.searchsorted(Starts, Targets) - 1], [len(Model)]]))
+    Batches = []
+    for Begin, End in zip(Splits[:-1], Splits[1:]):
+        Segments = (Starts >= Begin) & (Starts < End)
+        Batches.append(([values[Begin:End] for values in Inputs], [values[Begin:End] for values in States],
+                        Starts[Segments] - Begin, Temperatures_Reset[Segments], Parameters, backend, integrator))
+    if Processes == 1 or len(Batches) == 1:
+        Results = [_simulate_batch(Batch) for Batch in Batches]
+    else:
+        with multiprocessing.Pool(min(Processes, len(Batches))) as Pool:
+            Results = Pool.map(_simulate_batch, Batches, chunksize = 1)
+
+    Model = Model.copy()
+    for index, column in enumerate(HPWH.Kernel_States): #Stitch the batches back together in their original order
+        Model[column] = np.concatenate([States[index] for States, Counters in Results])
+    if counters is not None:
+        HPWH._add_counters(counters, sum(Counters for States, Counters in Results), max(len(Model) - 1, 0))
+    return HPWH._calculate_outputs(Model, Regression_COP, Regression_COP_Derate_Tamb, Parameters[6])
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:03:45 2026
+
+This module holds the occupant behavior learning algorithm described at the top of HPWH_Model.py. It learns how much
+electricity the water heater uses over a full day, during the peak period and outside it, so load shifting controls
+can be tailored to each site.
+
+OccupantBehaviorLearner is updated with one timestep at a time, in constant time and memory, so it can run alongside
+a simulation or on streamed monitored data and be asked for its current estimates at any step. Each timestep's
+electricity is spread evenly over the interval it covers, from its time to its time plus its timestep, and split at
+midnight and at Peak_Start and Peak_End. The timesteps therefore do not need to land on midnight or on the peak
+boundaries, or to be regular. A day's totals are learned once the day is over. Days that were only partly observed,
+such as the first day of a simulation starting at noon or days with gaps in monitored data, count in proportion to
+the time observed, and their totals are scaled up to the whole period.
+
+The estimates are the average of the days learned so far until Memory_Days days have been learned, and after that an
+exponentially weighted average that forgets older days with a time constant of about Memory_Days days.
+"""
+
+import math
+import numpy as np
+import pandas as pd
+
+Minutes_In_Hour = 60
+Minutes_In_Day = 1440
+#Columns added by learn, holding the estimates available at the start of each timestep
+Learned_Columns = ['Learned Daily Electricity (kWh)', 'Learned Peak Electricity (kWh)',
+                   'Learned Off Peak Electricity (kWh)']
+
+class OccupantBehaviorLearner:
+    #Start is the time of 'Time (min)' = 0, only used for its time of day. Peak_Start and Peak_End are hours of the
+    #day. A peak period ending before it starts runs past midnight
+    __slots__ = ('Peak_Start', 'Peak_End', 'Memory_Days', '_Offset', '_Boundaries', '_Length', '_Day', '_Today',
+                 '_Observed', '_Estimates', '_Weights', 'Days_Learned')
+
+    def __init__(self, Start, Peak_Start = 16, Peak_End = 21, Memory_Days = 7):
+        Start = pd.Timestamp(Start)
+        self.Peak_Start = Peak_Start
+        self.Peak_End = Peak_End
+        self.Memory_Days = Memory_Days
+        self._Offset = (Start - Start.normalize()) / pd.Timedelta(minutes = 1)
+        #Minutes of the day where the period changes, ending with midnight
+        self._Boundaries = sorted({Peak_Start * Minutes_In_Hour % Minutes_In_Day,
+                                   Peak_End * Minutes_In_Hour % Minutes_In_Day} - {0}) + [Minutes_In_Day]
+        Peak_Length = (Peak_End - Peak_Start) * Minutes_In_Hour % Minutes_In_Day
+        self._Length = [Minutes_In_Day - Peak_Length, Peak_Length] #Minutes in the off peak and peak periods of a day
+        self._Day = None #Day being accumulated, counted from the day of Start
+        self._Today = [0., 0.] #Electricity so far today, off peak and peak (kWh)
+        self._Observed = [0., 0.] #Minutes observed so far today, off peak and peak
+        self._Estimates = [math.nan, math.nan] #Learned off peak and peak electricity per day (kWh)
+        self._Weights = [0., 0.] #Days learned for each period, counting partly observed days as fractions
+        self.Days_Learned = 0. #Days learned, counting partly observed days as fractions
+
+    def _is_peak(self, Minute):
+        #1 if the minute of the day is in the peak period, 0 otherwise
+        Start, End = self.Peak_Start * Minutes_In_Hour, self.Peak_End * Minutes_In_Hour
+        if Start <= End:
+            return int(Start <= Minute < End)
+        return int(Minute >= Start or Minute < End)
+
+    def _learn_day(self):
+        #Updates the estimates with the day just finished and starts a new day
+        for Period in range(2):
+            Fraction = self._Observed[Period] / self._Length[Period] if self._Length[Period] > 0 else 0.
+            if Fraction > 0:
+                self._Weights[Period] += Fraction
+                Total = self._Today[Period] / Fraction #Scaled up to the whole period
+                if math.isnan(self._Estimates[Period]):
+                    self._Estimates[Period] = Total
+                else:
+                    self._Estimates[Period] += Fraction / min(self._Weights[Period], self.Memory_Days) * \
+                        (Total - self._Estimates[Period])
+        self.Days_Learned += (self._Observed[0] + self._Observed[1]) / Minutes_In_Day
+        self._Today = [0., 0.]
+        self._Observed = [0., 0.]
+
+    def update(self, Time, Timestep, Electricity):
+        #Adds one timestep. Time is its start in minutes since Start, like 'Time (min)', Timestep its length in minutes
+        #and Electricity the electricity consumed over it (kWh). Timesteps must be added in order. A timestep of 0 adds
+        #its electricity at Time. Each call takes constant time, except for timesteps spanning several days
+        Begin = Time + self._Offset
+        End = Begin + max(Timestep, 0)
+        Rate = Electricity / Timestep if Timestep > 0 else 0.
+        while True:
+            Day = math.floor(Begin / Minutes_In_Day)
+            if Day != self._Day:
+                if self._Day is not None:
+                    self._learn_day()
+                self._Day = Day
+            Minute = Begin - Day * Minutes_In_Day
+            Period = self._is_peak(Minute)
+            if End <= Begin: #Timestep of 0
+                self._Today[Period] += Electricity
+                return self
+            for Boundary in self._Boundaries: #End of the period holding Begin
+                if Boundary > Minute:
+                    break
+            Split = min(End, Day * Minutes_In_Day + Boundary)
+            self._Today[Period] += Rate * (Split - Begin)
+            self._Observed[Period] += Split - Begin
+            if Split >= End:
+                if Split == (Day + 1) * Minutes_In_Day: #Ends exactly at midnight, so the day is already over
+                    self._learn_day()
+                    self._Day = Day + 1
+                return self
+            Begin = Split
+
+    def estimates(self):
+        #Returns the current estimates of the electricity used (kWh) over a full day, in the peak period and outside
+        #it, NaN until a day has been learned, along with the days learned and the electricity used so far today
+        Off_Peak, Peak = self._Estimates
+        return {'Daily Electricity (kWh)': Off_Peak + Peak,
+                'Peak Electricity (kWh)': Peak,
+                'Off Peak Electricity (kWh)': Off_Peak,
+                'Peak Fraction': Peak / (Off_Peak + Peak) if Off_Peak + Peak > 0 else math.nan,
+                'Days Learned': self.Days_Learned,
+                'Electricity Today (kWh)': self._Today[0] + self._Today[1]}
+
+def learn(Model, Learner = None, Peak_Start = 16, Peak_End = 21, Memory_Days = 7,
+          Column = 'Electricity Consumed (kWh)'):
+    #Runs a learner over simulation results, or monitored data, with 'Time (min)', 'Timestep (min)' and Column.
+    #Learner defaults to a new OccupantBehaviorLearner starting at the first 'Timestamp', or at midnight when Model
+    #has no 'Timestamp'. Adds the Learned_Columns, holding the estimates available at the start of each timestep, the
+    #values a controller would have had, and returns Model. The learner is updated with every row
+    Time = Model['Time (min)'].to_numpy(dtype = np.float64)
+    if Learner is None:
+        Start = pd.Timestamp(Model['Timestamp'].iloc[0]) - pd.Timedelta(minutes = Time[0]) if 'Timestamp' in Model \
+            else pd.Timestamp(0)
+        Learner = OccupantBehaviorLearner(Start, Peak_Start, Peak_End, Memory_Days)
+    Learned = np.empty((len(Model), 3))
+    for i, (Time_Step, Timestep, Electricity) in enumerate(zip(Time.tolist(), Model['Timestep (min)'].tolist(),
+                                                                Model[Column].tolist())):
+        Off_Peak, Peak = Learner._Estimates
+        Learned[i] = Off_Peak + Peak, Peak, Off_Peak
+        Learner.update(Time_Step, Timestep, Electricity)
+    for column, values in zip(Learned_Columns, Learned.T):
+        Model[column] = values
+    return Model
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 15:02:19 2026
+
+This module saves simulation results and reads them back. Writing the full data frame with to_csv is slow and the
+files are large, so save_output can instead write a subset of the columns in a binary format. The format is chosen
+from the extension of Path:
+
+    .csv - the previous to_csv output, for compatibility with existing files and spreadsheets
+    .npz - a numpy archive with one array per column. np.load only reads an array when it is accessed. Pass
+    Compress = True to trade write time for disk space
+    .parquet or .feather - columnar files written by pandas. These need pyarrow installed
+    no extension - a folder holding one .npy file per column. Columns are memory mapped when read, so reading a
+    column costs nothing until its values are used. This is the fastest format to write
+
+Float columns can be downcast to float32, halving their size. Columns that are not numeric, boolean, datetime or
+timedelta are stored as strings. If the data frame has an index other than the default 0, 1, 2, ... it is saved as a
+column, named 'Index' when the index has no name.
+
+read_output_columns lists the columns in a file, read_output_column reads one of them and read_output reads several
+into a data frame, so scripts processing the results only load what they use.
+"""
+
+import numpy as np
+import pandas as pd
+import os
+import json
+
+Name_ColumnList = 'Columns.json' #File listing the columns in a .npy folder
+
+def _get_format(Path):
+    Extension = os.path.splitext(Path)[1].lower()
+    if Extension in ['.csv', '.npz', '.parquet', '.feather']:
+        return Extension[1:]
+    elif Extension == '':
+        return 'npy'
+    raise ValueError('Unknown output format {}. Use .csv, .npz, .parquet, .feather or no extension'.format(Extension))
+
+def _to_array(Series):
+    #Converts a column to an array that numpy can save without pickling
+    Values = Series.to_numpy()
+    if Values.dtype.kind in 'biufcMm':
+        return Values
+    return Series.astype(str).to_numpy(dtype = str)
+
+def save_output(Model, Path, Columns = None, Downcast = False, Compress = False):
+    #Saves Columns of Model, or every column if Columns is None, to Path. See the top of this module for the formats
+    Format = _get_format(Path)
+    Index = []
+    if not isinstance(Model.index, pd.RangeIndex): #The index is saved as the first column
+        Index = [Model.index.name if Model.index.name is not None else 'Index']
+        Model = Model.rename_axis(Index[0]).reset_index()
+    Columns = list(Model.columns) if Columns is None else Index + [column for column in Columns if column not in Index]
+    Model = Model[Columns]
+    if Downcast == True:
+        Model = Model.astype({column: np.float32 for column in Columns if Model[column].dtype.kind == 'f'})
+
+    if Format == 'csv':
+        Model.to_csv(Path, index = False)
+    elif Format == 'parquet':
+        Model.to_parquet(Path, index = False)
+    elif Format == 'feather':
+        Model.reset_index(drop = True).to_feather(Path)
+    elif Format == 'npz':
+        Arrays = {'Column_{}'.format(i): _to_array(Model[column]) for i, column in enumerate(Columns)}
+        Arrays['Columns'] = np.array(Columns, dtype = str)
+        (np.savez_compressed if Compress == True else np.savez)(Path, **Arrays)
+    else: #One .npy file per column. The files are numbered because column names are not always valid file names
+        os.makedirs(Path, exist_ok = True)
+        for i, column in enumerate(Columns):
+            np.save(os.path.join(Path, 'Column_{}.npy'.format(i)), _to_array(Model[column]))
+        with open(os.path.join(Path, Name_ColumnList), 'w') as File:
+            json.dump(Columns, File)
+
+def read_output_columns(Path):
+    #Returns the names of the columns saved in Path, without reading their values
+    Format = _get_format(Path)
+    if Format == 'csv':
+        return list(pd.read_csv(Path, nrows = 0).columns)
+    elif Format == 'parquet': #pyarrow is only needed for these formats, so it is imported here
+        import pyarrow.parquet
+        return pyarrow.parquet.read_schema(Path).names
+    elif Format == 'feather':
+        import pyarrow.ipc
+        return pyarrow.ipc.open_file(Path).schema.names
+    elif Format == 'npz':
+        with np.load(Path) as Archive:
+            return [str(column) for column in Archive['Columns']]
+    with open(os.path.join(Path, Name_ColumnList)) as File:
+        return json.load(File)
+
+def read_output_column(Path, Column):
+    #Returns the values of one column saved in Path as an array. Columns in a .npy folder are memory mapped
+    Format = _get_format(Path)
+    if Format == 'csv':
+        return pd.read_csv(Path, usecols = [Column])[Column].to_numpy()
+    elif Format == 'parquet':
+        return pd.read_parquet(Path, columns = [Column])[Column].to_numpy()
+    elif Format == 'feather':
+        return pd.read_feather(Path, columns = [Column])[Column].to_numpy()
+    Columns = read_output_columns(Path)
+    if Column not in Columns:
+        raise KeyError('{} is not saved in {}'.format(Column, Path))
+    if Format == 'npz':
+        with np.load(Path) as Archive:
+            return Archive['Column_{}'.format(Columns.index(Column))]
+    return np.load(os.path.join(Path, 'Column_{}.npy'.format(Columns.index(Column))), mmap_mode = 'r')
+
+def read_output(Path, Columns = None):
+    #Returns a data frame holding Columns, or every column if Columns is None. Text and pandas formats are read in one
+    #pass, numpy formats one column at a time
+    Format = _get_format(Path)
+    if Columns is None:
+        Columns = read_output_columns(Path)
+    if Format == 'csv':
+        return pd.read_csv(Path, usecols = Columns)[Columns]
+    elif Format == 'parquet':
+        return pd.read_parquet(Path, columns = Columns)
+    elif Format == 'feather':
+        return pd.read_feather(Path, columns = Columns)
+    return pd.DataFrame({column: read_output_column(Path, column) for column in Columns})
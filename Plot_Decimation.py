@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 00:04:27 2026
+
+This module reduces the number of points sent to the bokeh validation plots. A plot cannot show more detail than it
+has pixels, but every point passed to a glyph is written into the .html file, so a month of 1 minute data makes the
+file huge and the browser slow. Each series is decimated to a number of points sized to the plot's width:
+
+    - 'minmax' splits the x axis into one bin per pixel and keeps the first, lowest, highest and last point of each
+    bin, in their original order. Every peak and dip is kept, so the plot looks the same as one with every point
+    - 'lttb' (Largest Triangle Three Buckets, Steinarsson 2013) keeps one point per pixel, choosing in each bucket the
+    point forming the largest triangle with the points chosen around it. It keeps the visual shape with fewer points
+    but can miss short spikes
+
+Series with fewer points than the decimated size are returned unchanged, so a short window, such as the one selected
+with Time_Filtering in HPWH_Model_MixedTank_Simulation_MonitoredData.py, is always plotted at full resolution.
+NaN points are dropped before decimating.
+"""
+
+import numpy as np
+
+#Decimation methods available in decimate, with the number of points kept per pixel
+Methods = {'minmax': 4, 'lttb': 1}
+
+def min_max_indices(x, y, Bins):
+    #Returns the sorted indices of the first, lowest, highest and last point in each of Bins equal width bins of x.
+    #x must be sorted
+    Span = x[-1] - x[0]
+    if Span <= 0:
+        return np.unique([0, np.argmin(y), np.argmax(y), len(x) - 1])
+    Bin = np.minimum(((x - x[0]) / Span * Bins).astype(np.int64), Bins - 1)
+    Starts = np.flatnonzero(np.diff(Bin, prepend = -1)) #First point of each bin holding any points
+    Ends = np.append(Starts[1:], len(x)) - 1 #Last point of each bin
+    Counts = np.diff(np.append(Starts, len(x)))
+    Lowest = np.flatnonzero(y == np.repeat(np.minimum.reduceat(y, Starts), Counts))
+    Highest = np.flatnonzero(y == np.repeat(np.maximum.reduceat(y, Starts), Counts))
+    #Ties keep the first point in the bin
+    Lowest = Lowest[np.unique(Bin[Lowest], return_index = True)[1]]
+    Highest = Highest[np.unique(Bin[Highest], return_index = True)[1]]
+    return np.unique(np.concatenate([Starts, Lowest, Highest, Ends]))
+
+def lttb_indices(x, y, Points):
+    #Returns the sorted indices of the Points points chosen by Largest Triangle Three Buckets. The first and last
+    #points are always kept and the rest are split into Points - 2 buckets of about equal size
+    Count = len(x)
+    if Points >= Count or Points < 3:
+        return np.arange(Count)
+    Edges = (np.arange(Points - 1) * ((Count - 2) / (Points - 2))).astype(np.int64) + 1
+    Edges[-1] = Count - 1
+    Selected = np.empty(Points, dtype = np.int64)
+    Selected[0] = 0
+    Selected[-1] = Count - 1
+    Previous = 0
+    for Bucket in range(Points - 2):
+        Start, End = Edges[Bucket], Edges[Bucket + 1]
+        if Bucket < Points - 3: #The third point of the triangle is the average of the next bucket
+            x_Next = x[End:Edges[Bucket + 2]].mean()
+            y_Next = y[End:Edges[Bucket + 2]].mean()
+        else:
+            x_Next, y_Next = x[-1], y[-1]
+        Area = np.abs((x[Previous] - x_Next) * (y[Start:End] - y[Previous]) -
+                      (x[Previous] - x[Start:End]) * (y_Next - y[Previous]))
+        Previous = Start + int(np.argmax(Area))
+        Selected[Bucket + 1] = Previous
+    return Selected
+
+def decimate(Model, x, y, Width = 1200, Method = 'minmax'):
+    #Returns {'x': values, 'y': values} of columns x and y of Model, decimated for a plot Width pixels wide, to pass
+    #to a bokeh glyph as p.line(**decimate(Model, 'Time (hr)', 'Tank Temperature (deg C)'), ...). x must be sorted.
+    #Method is a key of Methods, or None to keep every point
+    if Method is not None and Method not in Methods:
+        raise ValueError('Unknown decimation method {}. Use {}'.format(Method, ' or '.join(Methods)))
+    x = np.asarray(Model[x], dtype = np.float64)
+    y = np.asarray(Model[y], dtype = np.float64)
+    Finite = np.isfinite(x) & np.isfinite(y)
+    if not Finite.all():
+        x, y = x[Finite], y[Finite]
+    if Method is None or len(x) <= Methods[Method] * Width:
+        return {'x': x, 'y': y}
+    Index = min_max_indices(x, y, Width) if Method == 'minmax' else lttb_indices(x, y, Width)
+    return {'x': x[Index], 'y': y[Index]}
@@ -5,10 +5,10 @@ Created on Tue May 25 19:48:38 2021
 @author: Peter Grant
 """
 
-import pandas as pd
 import os
+from Output_Files import read_output_columns, read_output
+from Aggregation import Aggregator
 
-Minutes_In_Hour = 60
 prices = {'0': 0.20, '1': 0.20, '2': 0.20, '3': 0.20, '4': 0.20, '5': 0.20, 
               '6': 0.20, '7': 0.20, '8': 0.20, '9': 0.20, '10': 0.25, '11': 
                0.25, '12': 0.25, '13': 0.25, '14': 0.25, '15': 0.25, '16':
@@ -18,19 +18,18 @@ prices = {'0': 0.20, '1': 0.20, '2': 0.20, '3': 0.20, '4': 0.20, '5': 0.20,
 cwd = os.getcwd()
 File = cwd + r'\Output\Output_Creekside Data for 3CFA.csv'
 
-Data = pd.read_csv(File, index_col = 'Timestamp')
-Data.index = pd.to_datetime(Data.index)
-
-# Calculate a weighted average for parameters as necessary
+# Calculate a time-weighted average for these columns, and sum the others
 columns = ['Set Temperature (deg C)', 'Tank Temperature (deg C)', 
            'Ambient Temperature (deg C)', 'Inlet Water Temperature (deg C)']
 
-for column in columns:
-    Data[column] = Data[column] * (Data['Timestep (min)'] / Minutes_In_Hour)
-
 # It's possible the file does not contain all of these columns. Edit this line
 # as necessary
-Data = Data.drop(columns=['Time (s)', 'Timestep (min)', 'COP', 
-                          'Power_PowerSum_W', 'Power_EnergySum_kWh'])
+columns_dropped = ['Time (s)', 'COP', 'Power_PowerSum_W', 'Power_EnergySum_kWh']
+
+# Only the columns used are read. File can be any format written by Output_Files.save_output
+Data = read_output(File, [column for column in read_output_columns(File) if column not in columns_dropped])
+columns_summed = [column for column in Data if column not in columns + ['Timestamp', 'Timestep (min)']]
 
-Hourly = Data.resample('H').sum()
+# Hourly holds the sums, time-weighted means and time-of-use cost of each hour
+Hourly = Aggregator(Prices = prices, Sum_Columns = columns_summed,
+                    Mean_Columns = [column for column in columns if column in Data]).add(Data).hourly()
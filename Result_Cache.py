@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 02:31:44 2026
+
+This module caches the results of HPWH_Model.Model_HPWH_MixedTank so sweeps and scripts repeating the same simulation,
+with the same draw profile, Parameters, set temperature profile and installation, get the results back in milliseconds
+instead of simulating again.
+
+Every simulation is identified by a fingerprint, a SHA-256 hash of:
+    - the name, type and values of every column of the input data frame, and its index
+    - every entry of Parameters, as float64
+    - the coefficients of Regression_COP and Regression_COP_Derate_Tamb
+    - the integrator and the columns kept. The backend is not included because every backend gives identical results
+
+A ResultCache keeps the most recently used results in memory, up to Size_Memory bytes, and optionally every result in
+a folder of .npz files, up to Size_Cache bytes, deleting the least recently used entries like the draw profile cache
+in Draw_Profiles. Several processes can share the folder. Results found on disk are also kept in memory. Statistics
+counts the memory hits, disk hits, misses and entries on disk that could not be read.
+
+get and put store any data frame under any key, so aggregates such as a one row summary of a simulation can be cached
+as well, with a key from fingerprint and its Extra argument.
+"""
+
+import numpy as np
+import pandas as pd
+import os
+import json
+import hashlib
+from collections import OrderedDict
+import HPWH_Model as HPWH
+from Draw_Profiles import _evict_cache
+from Output_Files import _to_array
+
+Version_Cache = 1 #Part of every fingerprint. Increase it when HPWH_Model changes results
+
+def fingerprint(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, Extra = None):
+    #Returns the hexadecimal fingerprint of a simulation of Model. Extra is anything else changing the results, such
+    #as the integrator, and must have a repr that identifies it
+    Hash = hashlib.sha256(repr((Version_Cache, list(Model.columns), [str(Type) for Type in Model.dtypes],
+                                Extra)).encode())
+    if isinstance(Model.index, pd.RangeIndex):
+        Hash.update(repr((Model.index.start, Model.index.stop, Model.index.step)).encode())
+    else:
+        Hash.update(pd.util.hash_pandas_object(Model.index).to_numpy())
+    for column in Model.columns:
+        Values = Model[column].to_numpy()
+        if Values.dtype.kind not in 'biufcMm': #Strings and other objects are hashed by pandas
+            Values = pd.util.hash_pandas_object(Model[column], index = False).to_numpy()
+        Hash.update(np.ascontiguousarray(Values).view(np.uint8))
+    Hash.update(np.asarray(Parameters, dtype = np.float64).tobytes())
+    for Regression in [Regression_COP, Regression_COP_Derate_Tamb]:
+        Hash.update(np.asarray(np.poly1d(Regression).coeffs, dtype = np.float64).tobytes())
+    return Hash.hexdigest()
+
+class ResultCache:
+    #Folder is the optional on-disk store. Size_Memory and Size_Cache are the largest total size, in bytes, of the
+    #results kept in memory and on disk
+    def __init__(self, Folder = None, Size_Memory = 500e6, Size_Cache = 2e9):
+        self.Folder = Folder
+        self.Size_Memory = Size_Memory
+        self.Size_Cache = Size_Cache
+        self._Memory = OrderedDict() #{Key: (Result, Counters, Size)}, least recently used first
+        self._Size = 0
+        self.Statistics = {'Memory Hits': 0, 'Disk Hits': 0, 'Misses': 0, 'Failed Reads': 0}
+        if Folder is not None:
+            os.makedirs(Folder, exist_ok = True)
+
+    def _remember(self, Key, Result, Counters):
+        #Keeps a result in memory, evicting the least recently used results beyond Size_Memory
+        Size = int(Result.memory_usage(index = True).sum())
+        if Key in self._Memory:
+            self._Size -= self._Memory.pop(Key)[2]
+        self._Memory[Key] = (Result, Counters, Size)
+        self._Size += Size
+        while self._Size > self.Size_Memory and len(self._Memory) > 1:
+            self._Size -= self._Memory.popitem(last = False)[1][2]
+
+    def _read(self, Key):
+        #Reads a result from the folder, or returns None if it is missing or damaged. Damaged entries are reported and
+        #counted in Statistics, and replaced when the result is put again
+        Path = os.path.join(self.Folder, Key + '.npz')
+        try:
+            with np.load(Path) as Archive:
+                Columns = json.loads(str(Archive['Columns']))
+                Result = pd.DataFrame({column: Archive['Column_{}'.format(i)] for i, column in enumerate(Columns)},
+                                      index = Archive['Index'] if 'Index' in Archive else None)
+                Counters = json.loads(str(Archive['Counters']))
+            os.utime(Path) #Marks the entry as recently used
+            return Result, Counters
+        except FileNotFoundError: #Never cached, or evicted by another process
+            return None
+        except (OSError, ValueError, KeyError) as Error:
+            self.Statistics['Failed Reads'] += 1
+            print('Could not read the cached result {}: {}'.format(Path, Error))
+            return None
+
+    def _write(self, Key, Result, Counters):
+        #Writes a result to the folder under a temporary name first, so other processes never read a partial file
+        Arrays = {'Column_{}'.format(i): _to_array(Result[column]) for i, column in enumerate(Result.columns)}
+        Arrays['Columns'] = np.array(json.dumps(list(Result.columns)))
+        Arrays['Counters'] = np.array(json.dumps(Counters))
+        if not isinstance(Result.index, pd.RangeIndex) or Result.index.start != 0 or Result.index.step != 1:
+            Arrays['Index'] = _to_array(Result.index.to_series())
+        Path = os.path.join(self.Folder, Key + '.npz')
+        Path_Temporary = '{}.{}.tmp.npz'.format(Path[:-4], os.getpid())
+        np.savez(Path_Temporary, **Arrays)
+        os.replace(Path_Temporary, Path)
+        _evict_cache(self.Folder, self.Size_Cache)
+
+    def get(self, Key):
+        #Returns a copy of the result stored under Key and the counters stored with it, or None if it is not cached
+        if Key in self._Memory:
+            self._Memory.move_to_end(Key)
+            self.Statistics['Memory Hits'] += 1
+            Result, Counters, Size = self._Memory[Key]
+            return Result.copy(), dict(Counters)
+        Found = self._read(Key) if self.Folder is not None else None
+        if Found is None:
+            self.Statistics['Misses'] += 1
+            return None
+        self.Statistics['Disk Hits'] += 1
+        self._remember(Key, *Found)
+        return Found[0].copy(), dict(Found[1])
+
+    def put(self, Key, Result, Counters = None):
+        #Stores a copy of the data frame Result, and an optional dictionary of counters, under Key
+        Result = Result.copy()
+        Counters = dict(Counters or {})
+        self._remember(Key, Result, Counters)
+        if self.Folder is not None:
+            self._write(Key, Result, Counters)
+
+    def simulate(self, Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb, backend = 'auto',
+                 integrator = 'euler', counters = None, Columns = None):
+        #Returns the results of HPWH_Model.Model_HPWH_MixedTank, or of Model_HPWH_MixedTank_EventDriven when
+        #integrator is 'event', from the cache when the same simulation was run before. Columns optionally limits the
+        #columns cached and returned, to save memory and disk space. If counters is a dictionary the operating
+        #counters of the simulation are added to it, whether or not it was cached
+        Key = fingerprint(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb,
+                          ('Model_HPWH_MixedTank', integrator, None if Columns is None else list(Columns)))
+        Found = self.get(Key)
+        if Found is None:
+            Counters = {}
+            if integrator == 'event':
+                Result = HPWH.Model_HPWH_MixedTank_EventDriven(Model, Parameters, Regression_COP,
+                                                               Regression_COP_Derate_Tamb)
+            else:
+                Result = HPWH.Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Derate_Tamb,
+                                                   backend = backend, integrator = integrator, counters = Counters)
+            if Columns is not None:
+                Result = Result[list(Columns)]
+            self.put(Key, Result, Counters)
+            Found = Result, Counters
+        Result, Counters = Found
+        if counters is not None:
+            for name, value in Counters.items():
+                counters[name] = counters.get(name, 0) + value
+        return Result
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 12:40:52 2026
+
+This script runs HPWH_Model.Model_HPWH_MixedTank for every combination of climate zone, set temperature profile
+and installation configuration, instead of editing and executing HPWH_Model_MixedTank_Simulation.py once per
+scenario. It performs the following:
+
+    1. Reads and bins the draw profile for each climate zone once, in this process, and saves the binned hot water
+    draw volume and inlet temperature as .npy files in a temporary folder
+    2. Runs the scenarios on a pool of worker processes. Each worker memory maps the .npy files read-only, so all
+    workers share one copy of each draw profile and nothing is parsed more than once
+    3. Collects the annual results of every scenario in one table and saves it to Path_Output. When the
+    'Path_CO2_Factors' setting is given, the table includes the CO2 produced using each climate zone's factors. When the
+    'Folder_TimeSeries' setting is given, each worker also saves its scenario's time series there using
+    Output_Files.save_output, in a file named after the scenario with every '.' replaced by '_'
+
+The HPWH parameters default to the values in HPWH_Model_MixedTank_Simulation.py. Override any of them by passing
+a Settings dictionary using the same names.
+"""
+
+#%%--------------------------IMPORT STATEMENTS--------------------------------
+
+import pandas as pd
+import numpy as np
+import os
+import time
+import tempfile
+import itertools
+import multiprocessing
+from datetime import datetime
+import HPWH_Model as HPWH
+from Set_Temperature_Profiles import Profiles
+from Installation_Configuration import Installations
+from Draw_Profiles import get_draw_profile
+from Model_Initialization import initialize_model
+from Output_Files import save_output
+from Aggregation import Aggregator
+from Hourly_Rates import HourlyRates, read_co2_factors
+from Result_Cache import ResultCache
+
+#%%--------------------------HPWH PARAMETERS------------------------------
+
+#Defaults for every scenario. These match HPWH_Model_MixedTank_Simulation.py, see that script for descriptions
+Default_Settings = {'Temperature_Tank_Initial': 50.5, #deg C
+                    'Temperature_Tank_Set_Deadband': 3.5, #deg C
+                    'Temperature_Water_Inlet': 4.4, #only used if vary_inlet_temp = False
+                    'Temperature_Ambient': 20, #deg C
+                    'Volume_Tank': 290, #L
+                    'Coefficient_JacketLoss': 2.8, #W/K
+                    'Power_Backup': 3800, #W
+                    'Threshold_Activation_Backup': 15, #deg C
+                    'Cutoff_Temperature': 2.8, #deg C
+                    'HeatAddition_HeatPump': 1230.9, #W
+                    'Coefficient_2ndOrder_COP': 0,
+                    'Coefficient_1stOrder_COP': -0.037,
+                    'Constant_COP': 7.67,
+                    'Coefficient_2ndOrder_COP_Adjust_Tamb': 0.000055,
+                    'Coefficient_1stOrder_COP_Adjust_Tamb': -0.0077,
+                    'Constant_COP_Adjust_Tamb': 0.2874,
+                    'COP_Adjust_Reference_Temperature': 19.7222, #deg C
+                    'Simulation_Start': datetime(2021, 1, 1, 0, 0),
+                    'Timestep': 5, #min
+                    'Peak_Start': 12 + 4, #hr
+                    'Peak_End': 12 + 9, #hr
+                    'vary_inlet_temp': True,
+                    'Shift_On_Weekends': True,
+                    'Model_Backend': 'auto',
+                    'Integrator': 'euler', #'euler', 'exponential' or 'event'. See HPWH_Model_MixedTank_Simulation.py
+                    'Folder_Cache_DrawProfiles': None, #Folder caching binned draw profiles between runs. See Draw_Profiles.get_draw_profile
+                    'Folder_Cache_Results': None, #Folder caching simulation results between runs, so repeated scenarios are not simulated again. None does not cache. See Result_Cache
+                    'Folder_TimeSeries': None, #Folder to save the time series of every scenario in. None only saves the results table
+                    'Output_Format': '.npz', #Format of the time series files: '.csv', '.npz', '.parquet', '.feather' or '' for a folder of .npy files. See Output_Files
+                    'Output_Columns': None, #Columns saved in the time series files. None saves every column
+                    'Output_Downcast': True, #True saves float columns as float32
+                    'TimeSeries_Resolution': 'Full', #'Full' saves every timestep. 'Hourly' saves the hourly sums and time-weighted means from Aggregation.Aggregator instead, a small fraction of the size
+                    'Path_CO2_Factors': None, #File of long-run CO2 emission factors by climate zone, such as CA2019CarbonOnly-Elec.csv. When given, the CO2 produced in each scenario's climate zone is added to the results table. See Hourly_Rates.read_co2_factors
+                    'Prices': None} #Electricity prices in $/kWh keyed by the hour of the day, as in Process_Output.py. Adds the time-of-use cost to the results table
+
+#Constants used in water-based calculations
+SpecificHeat_Water = 4.190 #J/g-C
+Density_Water = 1000 #g/L
+Watts_In_kiloWatt = 1000 #Conversion between W and kW
+
+#%%--------------------------FUNCTIONS----------------------------------------
+
+def get_parameters(Settings):
+    #Returns the Parameters list and COP regressions used by HPWH_Model.Model_HPWH_MixedTank
+    ThermalMass_Tank = Settings['Volume_Tank'] * Density_Water * SpecificHeat_Water
+    Parameters = [Settings['Coefficient_JacketLoss'], #0
+                  Settings['Power_Backup'], #1
+                  Settings['HeatAddition_HeatPump'], #2
+                  Settings['Temperature_Tank_Set_Deadband'], #3
+                  ThermalMass_Tank, #4
+                  0, #5 CO2_Production_Rate_Electricity, not used by the model
+                  Settings['COP_Adjust_Reference_Temperature'], #6
+                  Settings['Cutoff_Temperature']] #7
+    Regression_COP = np.poly1d([Settings['Coefficient_2ndOrder_COP'], Settings['Coefficient_1stOrder_COP'],
+                                Settings['Constant_COP']])
+    Regression_COP_Adjust_Tamb = np.poly1d([Settings['Coefficient_2ndOrder_COP_Adjust_Tamb'],
+                                            Settings['Coefficient_1stOrder_COP_Adjust_Tamb'],
+                                            Settings['Constant_COP_Adjust_Tamb']])
+    return Parameters, Regression_COP, Regression_COP_Adjust_Tamb
+
+#Settings used to read and bin the draw profiles, which are shared by every scenario of a climate zone
+Draw_Profile_Settings = ['Timestep', 'vary_inlet_temp', 'Temperature_Water_Inlet', 'Folder_Cache_DrawProfiles']
+
+def load_draw_profile(Path_DrawProfile, Settings):
+    #Reads and bins a CBECC-Res draw profile. Returns the hot water draw volume (L) and inlet temperature (deg C) arrays
+    Model = get_draw_profile(Path_DrawProfile, Settings['Timestep'], Settings['vary_inlet_temp'],
+                             Settings['Temperature_Water_Inlet'], Settings['Folder_Cache_DrawProfiles'])
+    return Model['Hot Water Draw Volume (L)'].to_numpy(dtype = np.float64), \
+        Model['Inlet Water Temperature (deg C)'].to_numpy(dtype = np.float64)
+
+#Result caches opened by this process, keyed by folder
+_Result_Caches = {}
+
+def _get_result_cache(Folder):
+    if Folder not in _Result_Caches:
+        _Result_Caches[Folder] = ResultCache(Folder)
+    return _Result_Caches[Folder]
+
+def simulate_scenario(Draw_Volume, Inlet_Temperature, Set_Temperature_Profile, Installation_Configuration, Settings):
+    #Simulates one scenario from binned draw profile arrays and returns the simulated data frame
+    Timestep = Settings['Timestep']
+    Model = pd.DataFrame({'Time (min)': np.arange(len(Draw_Volume)) * Timestep,
+                          'Inlet Water Temperature (deg C)': np.array(Inlet_Temperature),
+                          'Hot Water Draw Volume (L)': np.array(Draw_Volume)})
+    Model = initialize_model(Model, Timestep, Settings['Simulation_Start'], Set_Temperature_Profile,
+                             Settings['Temperature_Ambient'], Installation_Configuration,
+                             Settings['Temperature_Tank_Initial'], Settings['Threshold_Activation_Backup'],
+                             Settings['Shift_On_Weekends'])
+    Parameters, Regression_COP, Regression_COP_Adjust_Tamb = get_parameters(Settings)
+    if Settings['Folder_Cache_Results'] is not None:
+        return _get_result_cache(Settings['Folder_Cache_Results']).simulate(
+            Model, Parameters, Regression_COP, Regression_COP_Adjust_Tamb, backend = Settings['Model_Backend'],
+            integrator = Settings['Integrator'])
+    if Settings['Integrator'] == 'event':
+        return HPWH.Model_HPWH_MixedTank_EventDriven(Model, Parameters, Regression_COP, Regression_COP_Adjust_Tamb)
+    return HPWH.Model_HPWH_MixedTank(Model, Parameters, Regression_COP, Regression_COP_Adjust_Tamb,
+                                     backend = Settings['Model_Backend'], integrator = Settings['Integrator'])
+
+def summarize_scenario(Model, Settings):
+    #Annual totals reported for each scenario in the sweep results
+    Hour = Model['Timestamp'].dt.hour
+    Peak = (Hour >= Settings['Peak_Start']) & (Hour < Settings['Peak_End'])
+    Electricity = Model['Electricity Consumed (kWh)'].astype(float)
+    return {'Electricity Consumed (kWh)': Electricity.sum(),
+            'Peak Electricity Consumed (kWh)': Electricity[Peak].sum(),
+            'Energy Added Heat Pump (kWh)': Model['Energy Added Heat Pump (kWh)'].astype(float).sum(),
+            'Energy Added Backup (kWh)': Model['Energy Added Backup (kWh)'].astype(float).sum(),
+            'Backup Element Hours (hr)': Model['Energy Added Backup (kWh)'].astype(float).sum() * Watts_In_kiloWatt /
+                Settings['Power_Backup'], #The backup element always runs at Power_Backup
+            'Energy Withdrawn (kWh)': Model['Energy Withdrawn (kWh)'].astype(float).sum(),
+            'Jacket Losses (kWh)': Model['Jacket Losses (kWh)'].astype(float).sum(),
+            'Minimum Tank Temperature (deg C)': Model['Tank Temperature (deg C)'].astype(float).min()}
+
+#Read-only draw profiles opened by each worker process, keyed by climate zone
+_Folder_DrawProfiles = None
+_Draw_Profiles = {}
+
+def _initialize_worker(Folder_DrawProfiles):
+    global _Folder_DrawProfiles
+    _Folder_DrawProfiles = Folder_DrawProfiles
+    _Draw_Profiles.clear()
+
+def _get_shared_draw_profile(ClimateZone):
+    if ClimateZone not in _Draw_Profiles:
+        Path = os.path.join(_Folder_DrawProfiles, 'CZ{}_'.format(ClimateZone))
+        _Draw_Profiles[ClimateZone] = (np.load(Path + 'Volume.npy', mmap_mode = 'r'),
+                                       np.load(Path + 'Inlet.npy', mmap_mode = 'r'))
+    return _Draw_Profiles[ClimateZone]
+
+def _run_scenario(Scenario):
+    ClimateZone, Set_Temperature_Profile, Installation_Configuration, Settings = Scenario
+    Start = time.time()
+    Draw_Volume, Inlet_Temperature = _get_shared_draw_profile(ClimateZone)
+    Model = simulate_scenario(Draw_Volume, Inlet_Temperature, Set_Temperature_Profile, Installation_Configuration,
+                              Settings)
+    Results = {'Climate Zone': ClimateZone, 'Set Temperature Profile': Set_Temperature_Profile,
+               'Installation Configuration': Installation_Configuration}
+    Results.update(summarize_scenario(Model, Settings))
+    if Settings['Path_CO2_Factors'] is not None:
+        CO2_Factors = np.load(os.path.join(_Folder_DrawProfiles, 'CZ{}_CO2.npy'.format(ClimateZone)), mmap_mode = 'r')
+        Results.update(HourlyRates({'CO2 Produced (lb)': CO2_Factors}, Settings['Simulation_Start']).totals(Model))
+    if Settings['Prices'] is not None or Settings['TimeSeries_Resolution'] == 'Hourly':
+        Hourly = Aggregator(Prices = Settings['Prices']).add(Model).hourly()
+        if Settings['Prices'] is not None:
+            Results['Electricity Cost ($)'] = Hourly['Electricity Cost ($)'].sum()
+    if Settings['Folder_TimeSeries'] is not None:
+        #The profile names contain '.', which Output_Files would read as the extension, so they are replaced
+        Name = 'CZ{}_{}_{}'.format(ClimateZone, Set_Temperature_Profile, Installation_Configuration).replace('.', '_')
+        Path = os.path.join(Settings['Folder_TimeSeries'], Name) + Settings['Output_Format']
+        if Settings['TimeSeries_Resolution'] == 'Hourly': #Output_Columns names full resolution columns, so save them all
+            save_output(Hourly, Path, Downcast = Settings['Output_Downcast'])
+        else:
+            save_output(Model, Path, Settings['Output_Columns'], Settings['Output_Downcast'])
+    Results['Runtime (s)'] = time.time() - Start
+    return Results
+
+def run_sweep(Paths_DrawProfile, Set_Temperature_Profiles = Profiles, Installation_Configurations = Installations,
+              Path_Output = None, Processes = None, Settings = None, Grid = None):
+    #Paths_DrawProfile is a dictionary of {climate zone: path to the CBECC-Res draw profile}. Every combination of
+    #climate zone, set temperature profile and installation configuration is simulated. Grid is an optional dictionary
+    #of {setting name: values}, such as {'Volume_Tank': [190, 290]}. Every combination of its values is simulated for
+    #each scenario, and the values are added to the results table. Processes is the number of worker processes,
+    #defaulting to the number of CPUs. Returns the results table and saves it to Path_Output if given
+    Settings = dict(Default_Settings, **(Settings or {}))
+    Grid = Grid or {}
+    if set(Grid) & set(Draw_Profile_Settings):
+        raise ValueError('Grid cannot vary the settings used to read the draw profiles: {}'.format(Draw_Profile_Settings))
+    Grid_Points = [dict(zip(Grid, Values)) for Values in itertools.product(*Grid.values())]
+    Scenarios = [(ClimateZone, Profile, Installation, dict(Settings, **Point)) for ClimateZone, Profile, Installation,
+                 Point in itertools.product(Paths_DrawProfile, Set_Temperature_Profiles, Installation_Configurations,
+                                            Grid_Points)]
+
+    if Settings['Folder_TimeSeries'] is not None:
+        os.makedirs(Settings['Folder_TimeSeries'], exist_ok = True)
+    with tempfile.TemporaryDirectory() as Folder_DrawProfiles:
+        for ClimateZone, Path_DrawProfile in Paths_DrawProfile.items(): #Parse each draw profile once
+            Draw_Volume, Inlet_Temperature = load_draw_profile(Path_DrawProfile, Settings)
+            Path = os.path.join(Folder_DrawProfiles, 'CZ{}_'.format(ClimateZone))
+            np.save(Path + 'Volume.npy', Draw_Volume)
+            np.save(Path + 'Inlet.npy', Inlet_Temperature)
+        if Settings['Path_CO2_Factors'] is not None: #Read the CO2 factors of every climate zone once, like the draw profiles
+            for ClimateZone, CO2_Factors in read_co2_factors(Settings['Path_CO2_Factors'], Paths_DrawProfile).items():
+                np.save(os.path.join(Folder_DrawProfiles, 'CZ{}_CO2.npy'.format(ClimateZone)), CO2_Factors)
+
+        if Processes == 1: #Run in this process. Useful for debugging
+            _initialize_worker(Folder_DrawProfiles)
+            Results = [_run_scenario(Scenario) for Scenario in Scenarios]
+            _Draw_Profiles.clear()
+        else:
+            with multiprocessing.Pool(Processes, initializer = _initialize_worker,
+                                      initargs = (Folder_DrawProfiles,)) as Pool:
+                Results = Pool.map(_run_scenario, Scenarios, chunksize = 1)
+
+    for Row, Scenario in zip(Results, Scenarios): #Pool.map keeps the order of the scenarios
+        Row.update({name: Scenario[3][name] for name in Grid})
+    Results = pd.DataFrame(Results)
+    if Path_Output is not None:
+        Results.to_csv(Path_Output, index = False)
+    return Results
+
+#%%--------------------------USER INPUTS------------------------------------------
+
+if __name__ == '__main__':
+    ST = time.time()
+    Climate_Zones = range(1, 17) #CA climate zones to simulate
+    Path_DrawProfile_Template = r'C:\Users\Peter Grant\Dropbox (Beyond Efficiency)\Peter\Python Scripts\GasHPWH_Model_git\Data\Draw_Profiles\Bldg=Single_CZ={}_Wat=Hot_Prof=1_SDLM=Yes_CFA=800_Inc=FSCDB_Ver=2019.csv'
+    Path_Output = os.path.dirname(os.path.abspath(__file__)) + os.sep + 'Output' + os.sep + 'Scenario_Sweep.csv'
+
+    Results = run_sweep({ClimateZone: Path_DrawProfile_Template.format(ClimateZone) for ClimateZone in Climate_Zones},
+                        Path_Output = Path_Output)
+    print(Results.to_string(index = False))
+    print('Simulating {} scenarios took {} seconds'.format(len(Results), time.time() - ST))
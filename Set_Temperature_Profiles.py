@@ -2,71 +2,148 @@
 """
 Created on Thu Jul 15 18:38:32 2021
 
-# This script contains a single function used to implement different forms of 
-# load shifting controls in heat pump water heaters (HPWHs). The profiles can
-# be read by the simulation models to use as needed.
+# This module defines the set temperature profiles used to implement different
+# forms of load shifting controls in heat pump water heaters (HPWHs). The
+# profiles can be read by the simulation models to use as needed.
+
+# Profile_Specs is the table of available profiles. Each entry is a base set
+# temperature and a list of (Start hour, End hour, Set temperature) load
+# shifting periods, and load_shift_schedule generates the profile it describes.
+# Add an entry to Profile_Specs to make a new profile available by name.
+
+# get_profile returns a profile as a dictionary of set temperatures keyed by the
+# hour of the day, '0' to '23'. get_schedule returns the same profile as a
+# SetTemperatureSchedule, which stores the set temperatures in a numeric table
+# of day types by time of day at any resolution and looks up the set temperature
+# of every timestep at once with integer indexing. Use a schedule to define
+# profiles finer than an hour, weekends and holidays.
 
 @author: Peter Grant
 """
 
+import numpy as np
+import pandas as pd
+
+Minutes_In_Day = 1440
+Nanoseconds_In_Day = 86400 * 10**9
+
+#Base set temperature (deg C) and load shifting periods of every profile available in get_profile. Each period is
+#(Start hour, End hour, Set temperature). Add an entry here to make a new profile available by name
+Profile_Specs = {'Static_48.9': (48.9, []),
+                 'Static_54.4': (54.4, []),
+                 'Static_60': (60, []),
+                 '8A-4P LoadShift, 48.9 & 60 deg C': (48.9, [(8, 16, 60)]),
+                 '8A-2P LoadShift, 48.9 & 60 deg C': (48.9, [(8, 14, 60)]),
+                 '8A-4P LoadShift, 48.9 & 56.1 deg C': (48.9, [(8, 16, 56.1)])}
+
+#Names of every profile available in get_profile
+Profiles = list(Profile_Specs)
+
+def _day_profile(Base_Temperature, Shifts = (), Resolution = 60):
+    #Set temperatures for one day in Resolution minute slots. Periods ending before they start run past midnight
+    Start = np.arange(0, Minutes_In_Day, Resolution) / 60.
+    Profile = np.full(len(Start), float(Base_Temperature))
+    for Start_Hour, End_Hour, Temperature in Shifts:
+        if Start_Hour <= End_Hour:
+            Profile[(Start >= Start_Hour) & (Start < End_Hour)] = Temperature
+        else:
+            Profile[(Start >= Start_Hour) | (Start < End_Hour)] = Temperature
+    return Profile
+
+class SetTemperatureSchedule:
+    #Weekday and Weekend are the set temperatures of one day, split into equal time of day slots: 24 values for an
+    #hourly profile, 96 for 15 minutes and so on. Weekend defaults to Weekday. Holidays are dates using the Weekend
+    #profile. Special_Days is an optional dictionary of {date: set temperatures of that day} for any other days with
+    #their own profile, such as vacations, making the schedule a full calendar. Profiles of different resolutions are
+    #repeated to the finest one
+    def __init__(self, Weekday, Weekend = None, Holidays = (), Special_Days = None, Name = None):
+        Days = [np.asarray(Weekday, dtype = np.float64)]
+        Days.append(Days[0] if Weekend is None else np.asarray(Weekend, dtype = np.float64))
+        Special_Days = Special_Days or {}
+        Days.extend(np.asarray(Profile, dtype = np.float64) for Profile in Special_Days.values())
+        Slots = max(len(Profile) for Profile in Days)
+        if any(Slots % len(Profile) != 0 for Profile in Days):
+            raise ValueError('Each profile must divide the day into a factor of {} slots'.format(Slots))
+        self.Name = Name
+        self.Slots = Slots
+        self.Table = np.vstack([np.repeat(Profile, Slots // len(Profile)) for Profile in Days]) #One row per day type
+        #Dates with their own row in Table, sorted so they can be found with searchsorted
+        Calendar = {pd.Timestamp(Date).to_datetime64().astype('datetime64[D]'): 1 for Date in Holidays}
+        Calendar.update({pd.Timestamp(Date).to_datetime64().astype('datetime64[D]'): 2 + Row
+                         for Row, Date in enumerate(Special_Days)})
+        self.Dates = np.array(sorted(Calendar), dtype = 'datetime64[D]').astype(np.int64)
+        self.Rows = np.array([Calendar[Date] for Date in sorted(Calendar)], dtype = np.int64)
+
+    def index(self, Timestamp):
+        #Returns the row and column of Table holding the set temperature at each timestamp, as int64 arrays.
+        #Timestamp is anything pd.DatetimeIndex accepts, such as the 'Timestamp' column
+        Nanoseconds = pd.DatetimeIndex(Timestamp).asi8
+        Days = Nanoseconds // Nanoseconds_In_Day
+        Rows = ((Days + 3) % 7 >= 5).astype(np.int64) #Day 0, 1970-01-01, was a Thursday. Saturday and Sunday are 5 and 6
+        if len(self.Dates) > 0:
+            Index = np.minimum(np.searchsorted(self.Dates, Days), len(self.Dates) - 1)
+            Found = self.Dates[Index] == Days
+            Rows[Found] = self.Rows[Index[Found]]
+        Slots = (Nanoseconds - Days * Nanoseconds_In_Day) * self.Slots // Nanoseconds_In_Day
+        return Rows, Slots
+
+    def evaluate(self, Timestamp):
+        #Returns the set temperature at each timestamp as a float64 array, ready to use as the set temperature column
+        #of the HPWH_Model kernels
+        Rows, Slots = self.index(Timestamp)
+        return self.Table[Rows, Slots]
+
+    def to_profile(self):
+        #Returns the weekday profile as a get_profile dictionary, using the set temperature at the start of each hour
+        Hourly = self.Table[0, np.arange(24) * self.Slots // 24]
+        return {str(Hour): float(Temperature) for Hour, Temperature in enumerate(Hourly)}
+
+    def __repr__(self):
+        return 'SetTemperatureSchedule({}, {} slots per day, {} calendar days)'.format(self.Name, self.Slots,
+                                                                                       len(self.Dates))
+
+def load_shift_schedule(Base_Temperature, Shifts = (), Shift_On_Weekends = True, Resolution = 60, Holidays = (),
+                        Name = None):
+    #Builds a schedule from a compact description. Shifts is a list of (Start hour, End hour, Set temperature)
+    #periods, with hours that can be fractional, such as (7.5, 9.25, 60). Resolution is the length of each time of day
+    #slot in minutes. If Shift_On_Weekends is False weekends and Holidays use the midnight set temperature all day
+    Weekday = _day_profile(Base_Temperature, Shifts, Resolution)
+    Weekend = None if Shift_On_Weekends == True else np.full(len(Weekday), Weekday[0])
+    return SetTemperatureSchedule(Weekday, Weekend, Holidays, Name = Name)
+
+def get_schedule(profile, Shift_On_Weekends = True, Resolution = 60):
+    #Returns profile as a SetTemperatureSchedule. profile is a name in Profile_Specs, a (Base temperature, Shifts)
+    #tuple, a dictionary returned by get_profile, or a schedule, which is returned unchanged. If Shift_On_Weekends is
+    #False the schedule uses the midnight set temperature all day on weekends
+    if isinstance(profile, SetTemperatureSchedule):
+        return profile
+    if isinstance(profile, dict):
+        Weekday = np.array([profile[str(Hour)] for Hour in range(24)], dtype = np.float64)
+        Weekend = None if Shift_On_Weekends == True else np.full(24, Weekday[0])
+        return SetTemperatureSchedule(Weekday, Weekend)
+    Base_Temperature, Shifts = Profile_Specs[profile] if isinstance(profile, str) else profile
+    return load_shift_schedule(Base_Temperature, Shifts, Shift_On_Weekends, Resolution,
+                               Name = profile if isinstance(profile, str) else None)
+
 def get_profile(profile):
-    if profile == 'Static_48.9':
-        set_temperatures = {'0': 48.9, '1': 48.9, '2': 48.9, '3': 48.9, '4': 
-            48.9, '5': 48.9, '6': 48.9, '7': 48.9, '8': 48.9, '9': 48.9, '10': 
-            48.9, '11': 48.9, '12': 48.9, '13': 48.9, '14': 48.9, '15': 48.9, 
-            '16': 48.9, '17': 48.9, '18': 48.9, '19': 48.9, '20': 48.9, '21': 
-            48.9, '22': 48.9, '23': 48.9}
-    elif profile == 'Static_54.4':
-        set_temperatures = {'0': 54.4, '1': 54.4, '2': 54.4, '3': 54.4, '4': 
-            54.4, '5': 54.4, '6': 54.4, '7': 54.4, '8': 54.4, '9': 54.4, '10': 
-            54.4, '11': 54.4, '12': 54.4, '13': 54.4, '14': 54.4, '15': 54.4, 
-            '16': 54.4, '17': 54.4, '18': 54.4, '19': 54.4, '20': 54.4, '21': 
-            54.4, '22': 54.4, '23': 54.4}        
-    elif profile == 'Static_60':
-        set_temperatures = {'0': 60, '1': 60, '2': 60, '3': 60, '4': 
-            60, '5': 60, '6': 60, '7': 60, '8': 60, '9': 60, '10': 
-            60, '11': 60, '12': 60, '13': 60, '14': 60, '15': 60, 
-            '16': 60, '17': 60, '18': 60, '19': 60, '20': 60, '21': 
-            60, '22': 60, '23': 60}
-    elif profile == '8A-4P LoadShift, 48.9 & 60 deg C':
-        set_temperatures = {'0': 48.9, '1': 48.9, '2': 48.9, '3': 48.9, '4': 
-            48.9, '5': 48.9, '6': 48.9, '7': 48.9, '8': 60, '9': 60, '10': 
-            60, '11': 60, '12': 60, '13': 60, '14': 60, '15': 60, 
-            '16': 48.9, '17': 48.9, '18': 48.9, '19': 48.9, '20': 48.9, '21': 
-            48.9, '22': 48.9, '23': 48.9}
-    elif profile == '8A-2P LoadShift, 48.9 & 60 deg C':
-        set_temperatures = {'0': 48.9, '1': 48.9, '2': 48.9, '3': 48.9, '4': 
-            48.9, '5': 48.9, '6': 48.9, '7': 48.9, '8': 60, '9': 60, '10': 
-            60, '11': 60, '12': 60, '13': 60, '14': 48.9, '15': 48.9, 
-            '16': 48.9, '17': 48.9, '18': 48.9, '19': 48.9, '20': 48.9, '21': 
-            48.9, '22': 48.9, '23': 48.9}        
-    elif profile == '8A-4P LoadShift, 48.9 & 56.1 deg C':
-        set_temperatures = {'0': 48.9, '1': 48.9, '2': 48.9, '3': 48.9, '4': 
-            48.9, '5': 48.9, '6': 48.9, '7': 48.9, '8': 56.1, '9': 56.1, '10': 
-            56.1, '11': 56.1, '12': 56.1, '13': 56.1, '14': 56.1, '15': 56.1, 
-            '16': 48.9, '17': 48.9, '18': 48.9, '19': 48.9, '20': 48.9, '21': 
-            48.9, '22': 48.9, '23': 48.9}        
+    Base_Temperature, Shifts = Profile_Specs[profile]
+    set_temperatures = {str(Hour): Temperature for Hour, Temperature in enumerate(_day_profile(Base_Temperature, Shifts))}
     return set_temperatures
 
 if __name__ == '__main__':
     import matplotlib.pyplot as plt
     plt.figure(figsize = (12, 5))
-    profiles = ['Static_48.9', 'Static_54.4', 'Static_60', 
-                '8A-4P LoadShift, 48.9 & 60 deg C', 
-                '8A-2P LoadShift, 48.9 & 60 deg C',
-                '8A-4P LoadShift, 48.9 & 56.1 deg C']
-    
-    for profile in profiles:
+    for profile in Profiles:
         output = get_profile(profile)
         print(profile)
         print(output)
         print(output.keys())
         print(output.values)
         plt.plot(list(output.keys()), list(output.values()), label = profile)
-    
-    plt.legend()    
+
+    plt.legend()
     plt.xlabel ('Time of Day (hr)')
     plt.ylabel('Set Temperature (deg C)')
-        
-    
-    
+
+
+
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 01:15:52 2026
+
+This module answers questions about annual totals, such as the electricity consumed, its cost or the hours the backup
+element runs, without running HPWH_Model.Model_HPWH_MixedTank for every question. A Surrogate is built once, offline,
+from a grid of full simulations run by Scenario_Sweep.run_sweep:
+
+    - the categorical inputs are the draw profile, keyed by climate zone as in Scenario_Sweep, the set temperature
+    profile and the installation configuration. Only the combinations simulated can be answered from the grid
+    - the continuous inputs are any settings of Scenario_Sweep.Default_Settings, such as Volume_Tank and
+    Coefficient_JacketLoss, each simulated at a list of grid values
+
+The totals of every simulation are stored in one array with an axis per input, saved compressed with save. A query
+looks up its categories and interpolates linearly along each continuous axis between the grid values around it, which
+takes microseconds. The error estimate is the error of linear interpolation, half the distance to each grid value
+times the curvature of the totals along that axis, estimated from the neighbouring grid values. It is NaN along axes
+with only two grid values. Queries outside the grid, or for categories not simulated, fall back to a full simulation
+with the same settings, which is slower but exact.
+"""
+
+import numpy as np
+import pandas as pd
+import json
+from datetime import datetime
+from Scenario_Sweep import (Default_Settings, run_sweep, load_draw_profile, simulate_scenario, summarize_scenario)
+from Set_Temperature_Profiles import Profiles
+from Installation_Configuration import Installations
+from Aggregation import Aggregator
+from Hourly_Rates import HourlyRates, read_co2_factors
+
+#Columns of the run_sweep results identifying the categorical inputs, in the order of the axes of the stored array
+Categorical_Axes = ['Climate Zone', 'Set Temperature Profile', 'Installation Configuration']
+#Totals stored by default, when they are in the run_sweep results
+Default_Outputs = ['Electricity Consumed (kWh)', 'Peak Electricity Consumed (kWh)', 'Energy Added Backup (kWh)',
+                   'Backup Element Hours (hr)', 'Minimum Tank Temperature (deg C)', 'CO2 Produced (lb)',
+                   'Electricity Cost ($)']
+
+def _to_json(Value):
+    #Converts the values json cannot write: numpy scalars, such as climate zones read from the results table, and
+    #datetimes, such as Simulation_Start
+    if isinstance(Value, np.generic):
+        return Value.item()
+    if isinstance(Value, datetime):
+        return {'datetime': Value.isoformat()}
+    raise TypeError('{} cannot be saved in a surrogate'.format(type(Value).__name__))
+
+def _from_json(Object):
+    #Reverses _to_json for datetimes
+    if list(Object) == ['datetime']:
+        return datetime.fromisoformat(Object['datetime'])
+    return Object
+
+def _curvature(Values, Grid, Axis):
+    #Second derivative of Values along Axis, with grid values Grid, from the three point formula for uneven spacing.
+    #The end values use the curvature of their neighbour. NaN when there are fewer than three grid values
+    if len(Grid) < 3:
+        return np.full(Values.shape, np.nan)
+    Values = np.moveaxis(Values, Axis, 0)
+    Spacing = np.diff(Grid).reshape((-1,) + (1,) * (Values.ndim - 1))
+    Slope = np.diff(Values, axis = 0) / Spacing
+    Curvature = 2 * np.diff(Slope, axis = 0) / (Spacing[1:] + Spacing[:-1])
+    Curvature = np.concatenate([Curvature[:1], Curvature, Curvature[-1:]])
+    return np.moveaxis(Curvature, 0, Axis)
+
+class Surrogate:
+    #Categories is a dictionary of {categorical axis: labels}, with the keys of Categorical_Axes. Axes is a dictionary
+    #of {setting name: increasing grid values}. Values holds the Outputs of every simulation, with one axis per
+    #category, then one per setting in Axes, then one for Outputs. Settings and Paths_DrawProfile are the settings and
+    #draw profiles the grid was simulated with, used to fall back to a full simulation outside the grid
+    def __init__(self, Categories, Axes, Outputs, Values, Settings = None, Paths_DrawProfile = None):
+        self.Categories = {name: list(Categories[name]) for name in Categorical_Axes}
+        self.Axes = {name: np.asarray(Grid, dtype = np.float64) for name, Grid in Axes.items()}
+        self.Outputs = list(Outputs)
+        self.Values = np.asarray(Values, dtype = np.float64)
+        self.Settings = dict(Default_Settings, **(Settings or {}))
+        self.Paths_DrawProfile = Paths_DrawProfile or {}
+        self._Index = {name: {Label: Index for Index, Label in enumerate(Labels)}
+                       for name, Labels in self.Categories.items()}
+        #Absolute curvature along each continuous axis, stacked on a leading axis
+        self._Curvature = np.abs(np.array([_curvature(self.Values, Grid, len(Categorical_Axes) + Axis)
+                                           for Axis, Grid in enumerate(self.Axes.values())]).reshape(
+                                               (len(self.Axes),) + self.Values.shape))
+        self._Draw_Profiles = {} #Draw profiles read by the fallback simulations, keyed by climate zone
+        self.Statistics = {'Surrogate': 0, 'Simulation': 0}
+
+    @classmethod
+    def from_results(cls, Results, Axes, Outputs = None, Settings = None, Paths_DrawProfile = None):
+        #Builds a surrogate from a run_sweep results table with a row for every combination of the categories and
+        #the grid values of the settings named in Axes
+        Outputs = Outputs or [column for column in Default_Outputs if column in Results]
+        Categories = {name: list(pd.unique(Results[name])) for name in Categorical_Axes}
+        Axes = {name: np.unique(Results[name].to_numpy(dtype = np.float64)) for name in Axes}
+        Values = np.full([len(Labels) for Labels in Categories.values()] + [len(Grid) for Grid in Axes.values()] +
+                         [len(Outputs)], np.nan)
+        Index = tuple([pd.Index(Labels).get_indexer(Results[name]) for name, Labels in Categories.items()] +
+                      [np.searchsorted(Grid, Results[name].to_numpy(dtype = np.float64)) for name, Grid in Axes.items()])
+        Values[Index] = Results[Outputs].to_numpy(dtype = np.float64)
+        if np.isnan(Values).any():
+            raise ValueError('Results must hold every combination of the categories and grid values')
+        return cls(Categories, Axes, Outputs, Values, Settings, Paths_DrawProfile)
+
+    def save(self, Path):
+        #Saves the surrogate to a compressed .npz file. The categories, settings and draw profiles are stored as a json
+        #string, so loading a shared file never unpickles anything. The draw profiles are stored as pairs because json
+        #would turn integer climate zones into strings
+        Definition = json.dumps({'Categories': self.Categories, 'Settings': self.Settings,
+                                 'Paths_DrawProfile': list(self.Paths_DrawProfile.items())}, default = _to_json)
+        np.savez_compressed(Path, Values = self.Values, Outputs = np.array(self.Outputs),
+                            Axes = np.array(list(self.Axes)), **{'Axis_' + name: Grid for name, Grid in self.Axes.items()},
+                            Definition = np.array(Definition))
+
+    @classmethod
+    def load(cls, Path):
+        #Reads a surrogate saved with save
+        with np.load(Path) as File:
+            Definition = json.loads(str(File['Definition']), object_hook = _from_json)
+            Categories, Settings = Definition['Categories'], Definition['Settings']
+            Paths_DrawProfile = {ClimateZone: Path_DrawProfile for ClimateZone, Path_DrawProfile in
+                                 Definition['Paths_DrawProfile']}
+            Axes = {name: File['Axis_' + name] for name in File['Axes'].tolist()}
+            return cls(Categories, Axes, File['Outputs'].tolist(), File['Values'], Settings, Paths_DrawProfile)
+
+    def _locate(self, Point):
+        #Returns the cell of the grid holding Point, as one slice per continuous axis, and the fraction of the way
+        #across the cell along each axis. Returns None outside the grid
+        Cell, Fractions, Spacing = [], [], []
+        for name, Grid in self.Axes.items():
+            Value = Point[name]
+            if not Grid[0] <= Value <= Grid[-1]:
+                return None
+            if len(Grid) == 1:
+                Cell.append(slice(0, 1))
+                Fractions.append(0.)
+                Spacing.append(0.)
+                continue
+            Lower = min(int(np.searchsorted(Grid, Value, side = 'right')) - 1, len(Grid) - 2)
+            Cell.append(slice(Lower, Lower + 2))
+            Spacing.append(Grid[Lower + 1] - Grid[Lower])
+            Fractions.append((Value - Grid[Lower]) / Spacing[-1])
+        return Cell, Fractions, Spacing
+
+    def interpolate(self, Climate_Zone, Set_Temperature_Profile, Installation_Configuration, **Settings):
+        #Returns the interpolated Outputs and their error estimates as two arrays, or None if the query is outside the
+        #grid. Settings gives the value of each continuous axis, defaulting to the value in self.Settings
+        try:
+            Categories = (self._Index['Climate Zone'][Climate_Zone],
+                          self._Index['Set Temperature Profile'][Set_Temperature_Profile],
+                          self._Index['Installation Configuration'][Installation_Configuration])
+        except KeyError:
+            return None
+        Located = self._locate({name: Settings.get(name, self.Settings[name]) for name in self.Axes})
+        if Located is None:
+            return None
+        Cell, Fractions, Spacing = Located
+        Values = self.Values[Categories + tuple(Cell)]
+        Curvature = self._Curvature[(slice(None),) + Categories + tuple(Cell)]
+        Error = np.zeros(len(self.Outputs))
+        for Axis, Fraction in enumerate(Fractions):
+            if Fraction == 0 or Fraction == 1: #On a grid value, where the interpolation is exact
+                continue
+            Corners = Curvature[Axis].reshape(-1, len(self.Outputs)).max(axis = 0)
+            Error += 0.5 * Fraction * (1 - Fraction) * Spacing[Axis] ** 2 * Corners
+        for Fraction in Fractions: #Interpolate along each axis in turn, each time removing the leading axis
+            Values = Values[0] if len(Values) == 1 else Values[0] * (1 - Fraction) + Values[1] * Fraction
+        return Values, Error
+
+    def simulate(self, Climate_Zone, Set_Temperature_Profile, Installation_Configuration, **Settings):
+        #Returns the Outputs of a full simulation with the same settings as the grid, changed by Settings
+        if Climate_Zone not in self.Paths_DrawProfile:
+            raise ValueError('No draw profile for climate zone {}. Pass Paths_DrawProfile to simulate outside the grid'
+                             .format(Climate_Zone))
+        Settings = dict(self.Settings, **Settings)
+        if Climate_Zone not in self._Draw_Profiles:
+            self._Draw_Profiles[Climate_Zone] = load_draw_profile(self.Paths_DrawProfile[Climate_Zone], Settings)
+        Model = simulate_scenario(*self._Draw_Profiles[Climate_Zone], Set_Temperature_Profile,
+                                  Installation_Configuration, Settings)
+        Results = summarize_scenario(Model, Settings)
+        if 'CO2 Produced (lb)' in self.Outputs:
+            CO2_Factors = read_co2_factors(Settings['Path_CO2_Factors'], [Climate_Zone])[Climate_Zone]
+            Results.update(HourlyRates({'CO2 Produced (lb)': CO2_Factors}, Settings['Simulation_Start']).totals(Model))
+        if 'Electricity Cost ($)' in self.Outputs:
+            Results['Electricity Cost ($)'] = Aggregator(Prices = Settings['Prices']).add(Model).hourly()[
+                'Electricity Cost ($)'].sum()
+        return np.array([Results[Output] for Output in self.Outputs], dtype = np.float64)
+
+    def predict(self, Climate_Zone, Set_Temperature_Profile, Installation_Configuration, Fallback = True,
+                **Settings):
+        #Returns a dictionary with each of the Outputs, its error estimate, named by adding ' Error', and the
+        #'Source' of the answer, 'Surrogate' or 'Simulation'. Queries outside the grid are simulated if Fallback is
+        #True and raise a ValueError otherwise. Statistics counts the answers from each source
+        Interpolated = self.interpolate(Climate_Zone, Set_Temperature_Profile, Installation_Configuration, **Settings)
+        if Interpolated is not None:
+            Source = 'Surrogate'
+            Values, Error = Interpolated
+        elif Fallback == True:
+            Source = 'Simulation'
+            Values = self.simulate(Climate_Zone, Set_Temperature_Profile, Installation_Configuration, **Settings)
+            Error = np.zeros(len(self.Outputs))
+        else:
+            raise ValueError('The query is outside the grid of the surrogate')
+        self.Statistics[Source] += 1
+        Prediction = dict(zip(self.Outputs, Values.tolist()))
+        Prediction.update(zip([Output + ' Error' for Output in self.Outputs], Error.tolist()))
+        Prediction['Source'] = Source
+        return Prediction
+
+def build_surrogate(Paths_DrawProfile, Grid, Set_Temperature_Profiles = Profiles,
+                    Installation_Configurations = Installations, Path_Output = None, Processes = None,
+                    Settings = None, Outputs = None):
+    #Simulates every combination of the draw profiles in Paths_DrawProfile, the set temperature profiles, the
+    #installation configurations and the values of each setting in Grid, such as {'Volume_Tank': [190, 250, 290],
+    #'Coefficient_JacketLoss': [2, 2.8, 4]}, with Scenario_Sweep.run_sweep. Returns the Surrogate and saves it to
+    #Path_Output if given. Outputs defaults to the Default_Outputs in the results
+    Settings = dict(Default_Settings, **(Settings or {}))
+    Results = run_sweep(Paths_DrawProfile, Set_Temperature_Profiles, Installation_Configurations, None, Processes,
+                        Settings, Grid)
+    Model = Surrogate.from_results(Results, list(Grid), Outputs, Settings, Paths_DrawProfile)
+    if Path_Output is not None:
+        Model.save(Path_Output)
+    return Model